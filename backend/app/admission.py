@@ -0,0 +1,212 @@
+"""Admission control for write requests.
+
+SQLite has a single writer. Without a gate, a long bulk operation makes
+every other write wait on the database lock inside a threadpool thread
+until it times out with "database is locked". The admission controller
+queues write requests before they reach a handler instead:
+
+- at most ``ADMISSION_WRITE_CONCURRENCY`` writes run at once per worker,
+  and at most ``ADMISSION_BULK_CONCURRENCY`` of them are bulk operations;
+- a freed slot goes to waiting interactive (single-row) writes before bulk
+  ones;
+- a request that cannot start within its class's queue-time budget, or
+  arrives when the queue is full, is rejected at once with
+  ``503 Service Unavailable`` and a ``Retry-After`` estimate.
+
+Reads are never queued.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from app.metrics import (
+    admission_active,
+    admission_queue_depth,
+    admission_queue_seconds,
+    admission_rejected_total,
+)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") != "0"
+ADMISSION_WRITE_CONCURRENCY = int(os.getenv("ADMISSION_WRITE_CONCURRENCY", "4"))
+ADMISSION_BULK_CONCURRENCY = int(os.getenv("ADMISSION_BULK_CONCURRENCY", "1"))
+ADMISSION_QUEUE_LIMIT = int(os.getenv("ADMISSION_QUEUE_LIMIT", "100"))
+ADMISSION_INTERACTIVE_BUDGET_MS = float(os.getenv("ADMISSION_INTERACTIVE_BUDGET_MS", "2000"))
+ADMISSION_BULK_BUDGET_MS = float(os.getenv("ADMISSION_BULK_BUDGET_MS", "10000"))
+
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+# POST endpoints that only read
+READ_ONLY_PATHS = frozenset(("/orders/print",))
+
+# Longest Retry-After ever suggested, in seconds
+MAX_RETRY_AFTER = 60
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Operation class of a request: ``interactive``, ``bulk``, or None for reads."""
+    if method not in WRITE_METHODS or path in READ_ONLY_PATHS:
+        return None
+    if "/bulk" in path or path.startswith("/admin/"):
+        return "bulk"
+    return "interactive"
+
+
+class Rejected(Exception):
+    """A request was refused admission."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Lane:
+    """Queue and limits of one operation class."""
+
+    def __init__(self, name: str, limit: int, budget: float) -> None:
+        self.name = name
+        self.limit = max(limit, 1)
+        self.budget = budget
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long an admitted request runs
+        self.service_seconds = 0.05
+
+
+class AdmissionController:
+    """Grants write slots to requests in priority order.
+
+    Runs on the event loop, so its state needs no locking. Lanes are listed
+    in priority order: a freed slot goes to the first lane with a waiter
+    that is under its own limit.
+    """
+
+    def __init__(
+        self,
+        total: int = ADMISSION_WRITE_CONCURRENCY,
+        bulk: int = ADMISSION_BULK_CONCURRENCY,
+        queue_limit: int = ADMISSION_QUEUE_LIMIT,
+        interactive_budget: float = ADMISSION_INTERACTIVE_BUDGET_MS / 1000,
+        bulk_budget: float = ADMISSION_BULK_BUDGET_MS / 1000,
+    ) -> None:
+        self.total = max(total, 1)
+        self.queue_limit = queue_limit
+        self.lanes: Dict[str, _Lane] = {
+            "interactive": _Lane("interactive", self.total, interactive_budget),
+            "bulk": _Lane("bulk", min(bulk, self.total), bulk_budget),
+        }
+        self.active = 0
+
+    def _can_start(self, lane: _Lane) -> bool:
+        return self.active < self.total and lane.active < lane.limit
+
+    def _start(self, lane: _Lane) -> None:
+        self.active += 1
+        lane.active += 1
+        admission_active.labels(lane.name).inc()
+
+    def _grant_waiters(self) -> None:
+        for lane in self.lanes.values():
+            while lane.waiters and self._can_start(lane):
+                waiter = lane.waiters.popleft()
+                if not waiter.done():
+                    self._start(lane)
+                    waiter.set_result(None)
+
+    def retry_after(self, lane: _Lane) -> int:
+        """Seconds until the lane's current queue is likely to drain."""
+        estimate = lane.service_seconds * (len(lane.waiters) + lane.active + 1) / lane.limit
+        return min(max(1, math.ceil(estimate)), MAX_RETRY_AFTER)
+
+    def _reject(self, lane: _Lane, reason: str) -> Rejected:
+        admission_rejected_total.labels(lane.name, reason).inc()
+        return Rejected(reason, self.retry_after(lane))
+
+    async def acquire(self, name: str) -> None:
+        """Wait for a slot in lane ``name``; raises Rejected when over budget."""
+        lane = self.lanes[name]
+        # Nobody may overtake requests already waiting in a lane
+        if not lane.waiters and self._can_start(lane):
+            self._start(lane)
+            admission_queue_seconds.labels(name).observe(0)
+            return
+        if len(lane.waiters) >= self.queue_limit:
+            raise self._reject(lane, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        admission_queue_depth.labels(name).inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, lane.budget)
+        except asyncio.TimeoutError:
+            raise self._reject(lane, "timeout")
+        except asyncio.CancelledError:
+            # The client went away; hand back a slot granted meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)
+            raise
+        finally:
+            admission_queue_depth.labels(name).dec()
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    lane.waiters.remove(waiter)
+                except ValueError:
+                    pass
+        admission_queue_seconds.labels(name).observe(time.perf_counter() - start)
+
+    def release(self, name: str, service_seconds: Optional[float] = None) -> None:
+        """Free the slot held by a finished request of lane ``name``."""
+        lane = self.lanes[name]
+        self.active -= 1
+        lane.active -= 1
+        admission_active.labels(name).dec()
+        if service_seconds is not None:
+            lane.service_seconds += (service_seconds - lane.service_seconds) * 0.2
+        self._grant_waiters()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"active": lane.active, "queued": len(lane.waiters), "limit": lane.limit}
+            for name, lane in self.lanes.items()
+        }
+
+
+controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware passing write requests through the admission controller."""
+
+    def __init__(self, app, controller: AdmissionController = controller) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send) -> None:
+        name = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(name)
+        except Rejected as e:
+            response = JSONResponse(
+                {"detail": f"Server busy ({e.reason}), retry later"},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name, time.perf_counter() - start)
@@ -0,0 +1,191 @@
+"""Move old, settled orders into a separate archive database.
+
+The archive is a second SQLite file attached to a connection as ``archive``.
+Orders older than a cutoff whose status is final are copied into
+``archive.orders`` and deleted from the hot table in batches, each in its
+own transaction, so the hot database stays small and a run can be stopped
+and resumed at any point. Reads that opt in see both tables through the
+``all_orders`` view.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Callable, Iterable, List, Optional
+
+from app import database
+from app.routes.orders.storage import EPOCH_ORDINAL, order_statuses
+
+# Defaults to "<database>-archive.db" next to each shard's file; "off" disables.
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_STATUSES = [s.strip() for s in os.getenv("ARCHIVE_STATUSES", "Completed,Refunded").split(",") if s.strip()]
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+
+# Columns copied between the hot and archive tables, in storage form.
+ORDER_FIELDS = (
+    "id, order_number, customer_id, order_day, status_id, total_cents, payment_status_id, created_at, updated_at"
+)
+
+# Same output columns as crud.ORDER_COLUMNS, over both tables. Each arm joins
+# customers itself so an outer ORDER BY id can be merged from the two
+# primary keys instead of sorting a materialized union.
+_ALL_ORDERS_VIEW = """
+CREATE TEMP VIEW IF NOT EXISTS all_orders AS
+SELECT o.id, o.order_number, o.customer_id, c.name AS customer_name, c.email AS customer_email,
+       c.avatar AS customer_avatar, o.order_day, o.status_id, o.total_cents, o.payment_status_id,
+       o.created_at, o.updated_at
+FROM main.orders o JOIN customers c ON c.id = o.customer_id
+UNION ALL
+SELECT o.id, o.order_number, o.customer_id, c.name AS customer_name, c.email AS customer_email,
+       c.avatar AS customer_avatar, o.order_day, o.status_id, o.total_cents, o.payment_status_id,
+       o.created_at, o.updated_at
+FROM archive.orders o JOIN customers c ON c.id = o.customer_id
+"""
+
+
+def default_archive_path(shard: int = 0) -> Optional[str]:
+    """Location of a shard's archive database, or None when archiving is off.
+
+    Every shard archives into its own file, so archived orders keep living
+    on the shard their ID belongs to.
+    """
+    if ARCHIVE_PATH == "off":
+        return None
+    if not ARCHIVE_PATH:
+        return os.path.splitext(database.shard_path(shard))[0] + "-archive.db"
+    if shard == 0:
+        return ARCHIVE_PATH
+    base, ext = os.path.splitext(ARCHIVE_PATH)
+    return f"{base}-shard{shard}{ext}"
+
+
+def is_attached(conn: sqlite3.Connection) -> bool:
+    """Whether ``conn`` already has the archive attached."""
+    return any(row[1] == "archive" for row in conn.execute("PRAGMA database_list").fetchall())
+
+
+def attach(conn: sqlite3.Connection, path: Optional[str] = None, create: bool = False, shard: int = 0) -> bool:
+    """Attach the archive database as ``archive`` and define ``all_orders``.
+
+    Returns False, leaving the connection untouched, when archiving is
+    disabled or the archive file does not exist yet and ``create`` is off.
+    Must be called outside a transaction.
+    """
+    path = path or default_archive_path(shard)
+    if not path or (not create and not os.path.exists(path)):
+        return False
+    if not is_attached(conn):
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive.orders (
+                id INTEGER PRIMARY KEY,
+                order_number TEXT NOT NULL,
+                customer_id INTEGER NOT NULL,
+                order_day INTEGER NOT NULL,
+                status_id INTEGER NOT NULL,
+                total_cents INTEGER NOT NULL,
+                payment_status_id INTEGER NOT NULL,
+                created_at TEXT,
+                updated_at TEXT
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_orders_status_id ON orders (status_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_orders_customer_day ON orders (customer_id, order_day)")
+        # Listing tabs, as in migration 006
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS archive.idx_orders_incomplete "
+            "ON orders (id, order_day, total_cents, payment_status_id, status_id) WHERE status_id = 1"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS archive.idx_orders_finished "
+            "ON orders (id, order_day, total_cents, payment_status_id, status_id) WHERE status_id IN (2, 3)"
+        )
+        conn.execute(_ALL_ORDERS_VIEW)
+    return True
+
+
+def cutoff_day(before: Optional[date] = None) -> int:
+    """Days-since-epoch cutoff: orders dated strictly before it are archived."""
+    if before is None:
+        before = date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    return before.toordinal() - EPOCH_ORDINAL
+
+
+def archive_orders(
+    shard: int = 0,
+    before: Optional[date] = None,
+    statuses: Optional[Iterable[str]] = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    archive_path: Optional[str] = None,
+    pause: float = 0.0,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Move eligible orders of ``shard`` into its archive.
+
+    Each batch is copied with ``INSERT OR REPLACE`` and then deleted from the
+    hot table in one transaction, so re-running after an interruption is
+    always safe. ``pause`` seconds are slept between batches to leave room
+    for other writers. Returns the number of orders moved.
+    """
+    conn = database.connect_shard(shard, isolation_level=None)
+    try:
+        if not attach(conn, archive_path, create=True, shard=shard):
+            raise RuntimeError("Archiving is disabled (ARCHIVE_PATH=off)")
+        cursor = conn.cursor()
+        status_ids: List[int] = [
+            code
+            for code in (order_statuses.code(cursor, name) for name in (statuses or ARCHIVE_STATUSES))
+            if code is not None
+        ]
+        if not status_ids:
+            return 0
+        placeholders = ",".join(["?"] * len(status_ids))
+        batch = (
+            f"SELECT id FROM main.orders WHERE order_day < ? AND status_id IN ({placeholders}) "
+            "ORDER BY id LIMIT ?"
+        )
+        params = [cutoff_day(before), *status_ids, batch_size]
+
+        moved = 0
+        while True:
+            # BEGIN IMMEDIATE keeps other writers out, so both statements see
+            # the same batch.
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO archive.orders ({ORDER_FIELDS}) "
+                    f"SELECT {ORDER_FIELDS} FROM main.orders WHERE id IN ({batch})",
+                    params,
+                )
+                cursor.execute(f"DELETE FROM main.orders WHERE id IN ({batch})", params)
+                count = cursor.rowcount
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            moved += count
+            if count and progress:
+                progress(moved)
+            if count < batch_size:
+                return moved
+            if pause:
+                time.sleep(pause)
+    finally:
+        conn.close()
+
+
+def archive_counts(shard: int = 0, archive_path: Optional[str] = None) -> dict:
+    """Number of orders of ``shard`` in the hot table and in the archive."""
+    conn = database.connect_shard(shard)
+    try:
+        hot = conn.execute("SELECT COUNT(*) FROM main.orders").fetchone()[0]
+        archived = 0
+        if attach(conn, archive_path, shard=shard):
+            archived = conn.execute("SELECT COUNT(*) FROM archive.orders").fetchone()[0]
+        return {"hot": hot, "archived": archived}
+    finally:
+        conn.close()
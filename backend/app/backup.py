@@ -0,0 +1,407 @@
+"""Online backups of the database files.
+
+A snapshot is a directory under ``BACKUP_DIR`` holding a copy of every
+database file (DATABASE_PATH, its shard files and their archives) and a
+``manifest.json`` with their sizes and checksums. Files are copied with
+SQLite's backup API, ``BACKUP_STEP_PAGES`` pages per step with a
+``BACKUP_PAUSE_MS`` sleep in between, so the copy never holds a lock for
+long.
+
+In WAL mode each file is copied inside one read transaction: the copy is a
+consistent image of the moment it started, and writers carry on meanwhile.
+(Outside one, every write by another connection restarts the copy, which
+then never finishes under steady traffic.) In rollback-journal mode a read
+transaction would block writers for the whole copy, so files are copied
+step by step and, after ``MAX_RESTARTS`` restarts, in a single step.
+
+Files are copied one at a time, so a snapshot of several files is not a
+single point in time. DATABASE_PATH is copied last: it holds the order
+number sequence, which then covers every order in the shard copies.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, List, Optional
+
+from app import archive, database
+from app.metrics import backup_bytes_total, backup_seconds, backup_snapshots_total
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "")
+BACKUP_INTERVAL_SECONDS = float(os.getenv("BACKUP_INTERVAL_SECONDS", "0"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+BACKUP_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES", "256"))
+BACKUP_PAUSE_MS = float(os.getenv("BACKUP_PAUSE_MS", "5"))
+
+# Restarts tolerated before a rollback-journal copy is taken in one step
+MAX_RESTARTS = 3
+
+MANIFEST = "manifest.json"
+PARTIAL_SUFFIX = ".partial"
+
+# Unfinished snapshot directories older than this are left over from a
+# crash and removed by prune()
+STALE_PARTIAL_SECONDS = 24 * 3600
+
+
+class BackupError(Exception):
+    """A snapshot is missing, incomplete or damaged, or cannot be restored."""
+
+
+class _Restarted(Exception):
+    pass
+
+
+class ServiceLock:
+    """Shared lock on ``<DATABASE_PATH>.lock`` held by every running worker.
+
+    Restoring takes it exclusively, so files are never swapped under a
+    running service (which would keep using the replaced files).
+    """
+
+    def __init__(self) -> None:
+        self._file = None
+
+    def start(self) -> None:
+        if fcntl is None or self._file is not None:
+            return
+        self._file = open(database.DATABASE_PATH + ".lock", "a")
+        fcntl.flock(self._file, fcntl.LOCK_SH)
+
+    def stop(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+service_lock = ServiceLock()
+
+
+def default_backup_dir() -> str:
+    """Where snapshots are kept: BACKUP_DIR, or ``backups/`` next to DATABASE_PATH."""
+    return BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(database.DATABASE_PATH)), "backups")
+
+
+def _configured_files() -> List[str]:
+    """Every database file of the current configuration, in backup order.
+
+    Archives first, then the shard files, and DATABASE_PATH last.
+    """
+    files = [archive.default_archive_path(shard) for shard in range(database.SHARD_COUNT)]
+    files.extend(database.shard_path(shard) for shard in reversed(range(1, database.SHARD_COUNT)))
+    files.append(database.DATABASE_PATH)
+    return [path for path in files if path]
+
+
+def database_files() -> List[str]:
+    """Existing database files, in the order they are backed up."""
+    return [path for path in _configured_files() if os.path.exists(path)]
+
+
+def copy_database(
+    source: str,
+    target: str,
+    step_pages: int = BACKUP_STEP_PAGES,
+    pause: float = BACKUP_PAUSE_MS / 1000,
+) -> Dict[str, float]:
+    """Copy the database at ``source`` into a new file ``target``.
+
+    Returns the number of pages copied, steps taken, restarts and seconds.
+    """
+    start = time.perf_counter()
+    src = sqlite3.connect(source, isolation_level=None)
+    dst = sqlite3.connect(target)
+    stats = {"pages": 0, "steps": 0, "restarts": 0}
+    try:
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if wal:
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1")  # Starts the read transaction
+
+        previous = [None]
+
+        def progress(status: int, remaining: int, total: int) -> None:
+            stats["pages"] = total
+            stats["steps"] += 1
+            if previous[0] is not None and remaining > previous[0]:
+                stats["restarts"] += 1
+                if not wal and stats["restarts"] > MAX_RESTARTS:
+                    raise _Restarted()
+            previous[0] = remaining
+            if remaining and pause:
+                time.sleep(pause)
+
+        try:
+            src.backup(dst, pages=step_pages, progress=progress)
+        except _Restarted:
+            src.backup(dst)
+            stats["steps"] += 1
+        if wal:
+            src.execute("COMMIT")
+        # Copies of a WAL database are in WAL mode too; fold their WAL in,
+        # leaving a single self-contained file.
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dst.close()
+        src.close()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _integrity_problems(path: str) -> List[str]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+
+def snapshot(
+    directory: Optional[str] = None,
+    step_pages: int = BACKUP_STEP_PAGES,
+    pause: float = BACKUP_PAUSE_MS / 1000,
+    progress: Optional[Callable[[str, Dict[str, float]], None]] = None,
+) -> dict:
+    """Back up every database file into a new snapshot directory.
+
+    The directory is only given its final name once every file has been
+    copied, so an interrupted snapshot is never mistaken for a complete one.
+    Returns the manifest, with the snapshot's path added.
+    """
+    directory = directory or default_backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    suffix = 1
+    while os.path.exists(os.path.join(directory, name)) or os.path.exists(
+        os.path.join(directory, name + PARTIAL_SUFFIX)
+    ):
+        suffix += 1
+        name = f"{name.split('-')[0]}-{suffix}"
+    final = os.path.join(directory, name)
+    partial = final + PARTIAL_SUFFIX
+    os.makedirs(partial)
+
+    start = time.perf_counter()
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "database": os.path.basename(database.DATABASE_PATH),
+        "shard_count": database.SHARD_COUNT,
+        "files": [],
+    }
+    try:
+        for source in database_files():
+            target = os.path.join(partial, os.path.basename(source))
+            stats = copy_database(source, target, step_pages, pause)
+            size = os.path.getsize(target)
+            manifest["files"].append({
+                "name": os.path.basename(source),
+                "bytes": size,
+                "sha256": _sha256(target),
+                **stats,
+            })
+            backup_bytes_total.inc(size)
+            if progress:
+                progress(source, stats)
+        manifest["seconds"] = round(time.perf_counter() - start, 3)
+        with open(os.path.join(partial, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(partial, final)
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        backup_snapshots_total.labels("error").inc()
+        raise
+    backup_seconds.observe(time.perf_counter() - start)
+    backup_snapshots_total.labels("ok").inc()
+    return {"path": final, **manifest}
+
+
+def list_snapshots(directory: Optional[str] = None) -> List[dict]:
+    """Manifests of the complete snapshots in ``directory``, newest first."""
+    directory = directory or default_backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        manifest_path = os.path.join(directory, name, MANIFEST)
+        if name.endswith(PARTIAL_SUFFIX) or not os.path.exists(manifest_path):
+            continue
+        with open(manifest_path) as f:
+            snapshots.append({"path": os.path.join(directory, name), **json.load(f)})
+    return snapshots
+
+
+def prune(directory: Optional[str] = None, keep: int = BACKUP_KEEP) -> List[str]:
+    """Delete all but the ``keep`` newest snapshots; returns the paths removed."""
+    directory = directory or default_backup_dir()
+    removed = [snap["path"] for snap in list_snapshots(directory)[max(keep, 1):]]
+    if os.path.isdir(directory):
+        cutoff = time.time() - STALE_PARTIAL_SECONDS
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(PARTIAL_SUFFIX) and os.path.getmtime(path) < cutoff:
+                removed.append(path)
+    for path in removed:
+        shutil.rmtree(path)
+    return removed
+
+
+def latest_snapshot(directory: Optional[str] = None) -> Optional[dict]:
+    snapshots = list_snapshots(directory)
+    return snapshots[0] if snapshots else None
+
+
+def resolve(snapshot_path: str, directory: Optional[str] = None) -> str:
+    """Path of a snapshot given as a path, a name in ``directory`` or ``latest``."""
+    if snapshot_path == "latest":
+        latest = latest_snapshot(directory)
+        if latest is None:
+            raise BackupError(f"No snapshots in {directory or default_backup_dir()}")
+        return latest["path"]
+    if os.path.isdir(snapshot_path):
+        return snapshot_path
+    path = os.path.join(directory or default_backup_dir(), snapshot_path)
+    if os.path.isdir(path):
+        return path
+    raise BackupError(f"Snapshot not found: {snapshot_path}")
+
+
+def verify(snapshot_path: str) -> dict:
+    """Check every file of a snapshot against its manifest and for corruption.
+
+    Returns the manifest; raises BackupError describing every problem found.
+    """
+    manifest_path = os.path.join(snapshot_path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise BackupError(f"{snapshot_path} is not a complete snapshot (no {MANIFEST})")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    problems = []
+    for entry in manifest["files"]:
+        path = os.path.join(snapshot_path, entry["name"])
+        if not os.path.exists(path):
+            problems.append(f"{entry['name']}: missing")
+        elif _sha256(path) != entry["sha256"]:
+            problems.append(f"{entry['name']}: checksum mismatch")
+        else:
+            problems.extend(f"{entry['name']}: {problem}" for problem in _integrity_problems(path))
+    if problems:
+        raise BackupError("Snapshot failed verification:\n  " + "\n  ".join(problems))
+    return manifest
+
+
+@contextmanager
+def _service_stopped() -> Generator[None, None, None]:
+    """Hold the service lock exclusively; raises BackupError while workers run."""
+    if fcntl is None:
+        yield
+        return
+    with open(database.DATABASE_PATH + ".lock", "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise BackupError("The service is running; stop it before restoring")
+        yield
+
+
+def _release(path: str) -> None:
+    """Fold the WAL of the live file at ``path`` into it and leave WAL mode."""
+    conn = sqlite3.connect(path, timeout=0)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if conn.execute("PRAGMA journal_mode = DELETE").fetchone()[0] != "delete":
+            raise BackupError(f"{path} is in use; close every connection before restoring")
+    except sqlite3.OperationalError as e:
+        raise BackupError(f"{path} is in use; close every connection before restoring ({e})")
+    finally:
+        conn.close()
+
+
+def restore(snapshot_path: str, progress: Optional[Callable[[str], None]] = None) -> List[str]:
+    """Replace the database files with those of a verified snapshot.
+
+    Every file is first copied next to its destination and checked again;
+    only then are they renamed over the live files. If a rename fails, the
+    files already renamed are put back, so the database files are either
+    all old or all restored. Each replaced file is kept as
+    ``<file>.pre-restore``. The service must be stopped: workers hold
+    ``ServiceLock`` while they run.
+    Returns the paths restored.
+    """
+    manifest = verify(snapshot_path)
+    if manifest["shard_count"] != database.SHARD_COUNT:
+        raise BackupError(
+            f"Snapshot has {manifest['shard_count']} shard(s) but SHARD_COUNT is {database.SHARD_COUNT}"
+        )
+    with _service_stopped():
+        return _swap_in(snapshot_path, manifest, progress)
+
+
+def _swap_in(snapshot_path: str, manifest: dict, progress: Optional[Callable[[str], None]]) -> List[str]:
+    locations = {os.path.basename(path): path for path in _configured_files()}
+    locations[manifest["database"]] = database.DATABASE_PATH
+    unknown = [entry["name"] for entry in manifest["files"] if entry["name"] not in locations]
+    if unknown:
+        raise BackupError(f"No database file is configured for {', '.join(unknown)}")
+
+    # Stage and check every file before touching any live one
+    staged = []
+    try:
+        for entry in manifest["files"]:
+            name = entry["name"]
+            target = locations[name]
+            staging = target + ".restoring"
+            staged.append(staging)
+            shutil.copyfile(os.path.join(snapshot_path, name), staging)
+            with open(staging, "rb") as f:
+                os.fsync(f.fileno())
+            if _sha256(staging) != entry["sha256"]:
+                raise BackupError(f"{name}: copy does not match the snapshot")
+        targets = [locations[entry["name"]] for entry in manifest["files"]]
+        existed = {target for target in targets if os.path.exists(target)}
+        for target in targets:
+            if target in existed:
+                _release(target)
+                kept = target + ".pre-restore"
+                if os.path.exists(kept):
+                    os.remove(kept)
+                os.link(target, kept)
+
+        restored: List[str] = []
+        try:
+            for staging, target in zip(staged, targets):
+                os.replace(staging, target)
+                restored.append(target)
+        except OSError as e:
+            # Put back the files already swapped, so the set stays consistent
+            for target in restored:
+                if target in existed:
+                    os.replace(target + ".pre-restore", target)
+                else:
+                    os.remove(target)
+            raise BackupError(f"Restore failed and was rolled back: {e}")
+    finally:
+        for staging in staged:
+            if os.path.exists(staging):
+                os.remove(staging)
+    if progress:
+        for target in restored:
+            progress(target)
+    return restored
@@ -0,0 +1,91 @@
+"""Keep per-process caches coherent when several workers share the database.
+
+Each worker process holds its own in-memory caches (the status lookup
+tables, for instance). A background thread polls ``PRAGMA data_version`` on
+one long-lived connection per database file; the value changes whenever any
+other connection, in this process or another, commits to that file. On a
+change the generation counter is bumped and every registered invalidation
+callback runs, so a cache is stale for at most one polling interval.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+from app import database
+
+COHERENCE_INTERVAL_MS = float(os.getenv("COHERENCE_INTERVAL_MS", "100"))
+
+
+class DataVersionWatcher:
+    """Detect commits made through other connections and notify listeners."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.generation = 0
+        self._callbacks: List[Callable[[], None]] = []
+        self._connections: List[sqlite3.Connection] = []
+        self._versions: List[int] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run ``callback`` whenever another connection changes the database."""
+        self._callbacks.append(callback)
+        return callback
+
+    def poll(self) -> bool:
+        """Check every database file once; return True if any changed."""
+        with self._lock:
+            if not self._connections:
+                self._connections = [
+                    sqlite3.connect(database.shard_path(shard), check_same_thread=False)
+                    for shard in range(database.SHARD_COUNT)
+                ]
+                self._versions = [self._version(conn) for conn in self._connections]
+                return False
+            versions = [self._version(conn) for conn in self._connections]
+            changed = versions != self._versions
+            self._versions = versions
+            if changed:
+                self.generation += 1
+        if changed:
+            for callback in self._callbacks:
+                callback()
+        return changed
+
+    @staticmethod
+    def _version(conn: sqlite3.Connection) -> int:
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except sqlite3.Error:
+                pass  # Transient (e.g. locked); try again next interval
+
+    def start(self) -> None:
+        """Start polling in a daemon thread."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self.poll()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-version-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling and close the watcher connections."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+
+watcher = DataVersionWatcher(COHERENCE_INTERVAL_MS / 1000)
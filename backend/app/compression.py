@@ -0,0 +1,164 @@
+"""Response compression.
+
+Responses of a compressible media type are compressed with the best
+encoding the client accepts: zstd when the ``zstandard`` package is
+installed, otherwise gzip. Complete bodies smaller than
+``COMPRESSION_MIN_BYTES`` are sent as they are. Streamed responses are
+compressed chunk by chunk, each flushed so the client can decode it as soon
+as it arrives.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.profiling import phase
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional, gzip is used instead
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") != "0"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = frozenset((
+    "application/json",
+    "application/msgpack",
+    "application/x-msgpack",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+))
+
+
+def _compressible(media_type: str) -> bool:
+    media_type = media_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+msgpack", "+xml"))
+    )
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The content coding to use for an ``Accept-Encoding`` header, or None."""
+    weights: Dict[str, float] = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    wildcard = weights.get("*", 0.0)
+    available = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, coding: str) -> None:
+        if coding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._sync = zlib.Z_SYNC_FLUSH
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(self._sync)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def compress(coding: str, data: bytes) -> bytes:
+    """Compress a complete body."""
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies as negotiated by ``Accept-Encoding``."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message) -> None:
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is not None:
+                with phase("compress"):
+                    data = compressor.chunk(body) if more_body else compressor.chunk(body) + compressor.finish()
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if (
+                "content-encoding" in headers
+                or not _compressible(headers.get("content-type", ""))
+                or (not more_body and len(body) < COMPRESSION_MIN_BYTES)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers["content-encoding"] = coding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["content-length"]
+                compressor = _Compressor(coding)
+                with phase("compress"):
+                    data = compressor.chunk(body)
+            else:
+                with phase("compress"):
+                    data = compress(coding, body)
+                headers["content-length"] = str(len(data))
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,27 +1,299 @@
+import contextvars
 import os
 import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Callable, Generator, List, Optional, TypeVar
 
 DATABASE_PATH = os.getenv("DATABASE_PATH", "app.db")
 
+# Orders can be hash-partitioned across SHARD_COUNT database files. Shard 0
+# is DATABASE_PATH itself and also holds every shared table (customers,
+# items, lookup tables); shards 1..N-1 hold only an orders table and attach
+# DATABASE_PATH as "home", so unqualified names resolve to the shared tables.
+# Order IDs are allocated so that ``id % SHARD_COUNT`` is the owning shard.
+SHARD_COUNT = max(int(os.getenv("SHARD_COUNT", "1")), 1)
 
-def get_connection() -> sqlite3.Connection:
-    """Create a new database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
+# Write-ahead logging lets readers proceed while a writer commits, which
+# matters once several worker processes share the files.
+DATABASE_WAL = os.getenv("DATABASE_WAL", "1") != "0"
+
+T = TypeVar("T")
+
+# Instrumentation hooks. Query hooks receive (connection, sql, params, seconds,
+# many) for every executed statement, the seconds including fetching its
+# rows; many is True for executemany(), whose params are then a sequence of
+# parameter sets (possibly an exhausted iterator). Connection hooks receive
+# ("open" | "close", seconds spent opening the connection, or 0.0 on close).
+QueryHook = Callable[[sqlite3.Connection, str, Any, float, bool], None]
+ConnectionHook = Callable[[str, float], None]
+
+_query_hooks: List[QueryHook] = []
+_connection_hooks: List[ConnectionHook] = []
+
+# Number of get_db blocks in this process that committed changes.
+_commits = 0
+_commits_lock = threading.Lock()
+
+
+def add_query_hook(hook: QueryHook) -> None:
+    """Register a callback invoked once each statement has run and its rows are fetched."""
+    _query_hooks.append(hook)
+
+
+def add_connection_hook(hook: ConnectionHook) -> None:
+    """Register a callback invoked when a connection is opened or closed."""
+    _connection_hooks.append(hook)
+
+
+def _notify_query(conn: sqlite3.Connection, sql: str, params: Any, seconds: float, many: bool = False) -> None:
+    for hook in _query_hooks:
+        hook(conn, sql, params, seconds, many)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports the wall time of each statement to the query hooks.
+
+    A statement's time covers executing it and fetching its rows. It is
+    reported once the rows run out, or when the cursor runs another
+    statement, is closed or is collected with rows left.
+    """
+
+    # (sql, parameters) of a statement not reported yet, and its time so far
+    _statement = None
+    _seconds = 0.0
+
+    def _report(self) -> None:
+        if self._statement is not None:
+            sql, parameters = self._statement
+            self._statement = None
+            _notify_query(self.connection, sql, parameters, self._seconds)
+
+    def _timed(self, start: float, done: bool) -> None:
+        self._seconds += time.perf_counter() - start
+        if done:
+            self._report()
+
+    def execute(self, sql, parameters=()):
+        self._report()
+        self._statement = (sql, parameters)
+        self._seconds = 0.0
+        start = time.perf_counter()
+        done = True
+        try:
+            super().execute(sql, parameters)
+            done = self.description is None
+            return self
+        finally:
+            self._timed(start, done)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._report()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify_query(self.connection, sql, seq_of_parameters, time.perf_counter() - start, True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = None
+        try:
+            row = super().fetchone()
+            return row
+        finally:
+            self._timed(start, row is None)
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchmany(size)
+            return rows
+        finally:
+            self._timed(start, len(rows) < size)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._timed(start, True)
+
+    def __next__(self):
+        start = time.perf_counter()
+        done = True
+        try:
+            row = super().__next__()
+            done = False
+            return row
+        finally:
+            self._timed(start, done)
+
+    def close(self):
+        self._report()
+        super().close()
+
+    def __del__(self):
+        self._report()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including implicit ones, are instrumented."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        super().close()
+        for hook in _connection_hooks:
+            hook("close", 0.0)
+
+
+def shard_path(shard: int, path: Optional[str] = None) -> str:
+    """Database file holding the orders of ``shard`` for the database at ``path``."""
+    path = path or DATABASE_PATH
+    if shard == 0:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}-shard{shard}{ext}"
+
+
+def shard_of(order_id: int) -> int:
+    """Shard that owns the order with ID ``order_id``."""
+    return order_id % SHARD_COUNT
+
+
+def shard_for_key(key: str) -> int:
+    """Shard on which a new order with this order number is placed."""
+    return zlib.crc32(key.encode()) % SHARD_COUNT
+
+
+def connect_shard(shard: int, **kwargs) -> sqlite3.Connection:
+    """Open a plain connection to ``shard`` with the shared tables visible."""
+    conn = sqlite3.connect(shard_path(shard), **kwargs)
+    if shard:
+        conn.execute("ATTACH DATABASE ? AS home", (DATABASE_PATH,))
+    return conn
+
+
+def ensure_shards() -> None:
+    """Create missing shard files and move misplaced orders to their shard.
+
+    New shard files get the orders schema and auto_vacuum mode of
+    DATABASE_PATH and start their ID sequence at its high-water mark, so no
+    ID is ever handed out twice.
+    Orders on DATABASE_PATH whose ID belongs to another shard (for example
+    when sharding is enabled on an existing database) are then moved there.
+    """
+    if SHARD_COUNT == 1:
+        return
+    home = sqlite3.connect(DATABASE_PATH)
+    try:
+        schema = home.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'orders' AND sql IS NOT NULL "
+            "ORDER BY type = 'table' DESC"
+        ).fetchall()
+        row = home.execute("SELECT MAX(seq) FROM sqlite_sequence WHERE name = 'orders'").fetchone()
+        seq = row[0] or 0
+        columns = ", ".join(row[1] for row in home.execute("PRAGMA table_info(orders)").fetchall())
+        auto_vacuum = home.execute("PRAGMA auto_vacuum").fetchone()[0]
+        for shard in range(1, SHARD_COUNT):
+            conn = sqlite3.connect(shard_path(shard))
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'orders'").fetchone() is None:
+                # Only takes effect before the first table is created
+                conn.execute(f"PRAGMA auto_vacuum = {auto_vacuum}")
+                for (sql,) in schema:
+                    conn.execute(sql)
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('orders', ?)", (seq,))
+                conn.commit()
+            conn.close()
+
+            home.execute("ATTACH DATABASE ? AS shard", (shard_path(shard),))
+            home.execute(
+                f"INSERT OR REPLACE INTO shard.orders ({columns}) "
+                f"SELECT {columns} FROM main.orders WHERE id % ? = ?",
+                (SHARD_COUNT, shard),
+            )
+            home.execute("DELETE FROM main.orders WHERE id % ? = ?", (SHARD_COUNT, shard))
+            home.commit()
+            home.execute("DETACH DATABASE shard")
+    finally:
+        home.close()
+
+
+def enable_wal() -> None:
+    """Switch every database file to WAL mode; the setting is persistent."""
+    if not DATABASE_WAL:
+        return
+    for shard in range(SHARD_COUNT):
+        conn = sqlite3.connect(shard_path(shard))
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+
+
+def get_connection(shard: int = 0) -> sqlite3.Connection:
+    """Create a new database connection, to shard 0 unless told otherwise."""
+    start = time.perf_counter()
+    conn = connect_shard(shard, factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+    elapsed = time.perf_counter() - start
+    for hook in _connection_hooks:
+        hook("open", elapsed)
     return conn
 
 
+def commit_count() -> int:
+    """Number of ``get_db`` blocks in this process that committed changes."""
+    return _commits
+
+
 @contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
+def get_db(shard: int = 0) -> Generator[sqlite3.Connection, None, None]:
     """Context manager for database connections."""
-    conn = get_connection()
+    global _commits
+    conn = get_connection(shard)
     try:
         yield conn
         conn.commit()
+        # The connection is new, so any change counted here was made by
+        # this block; reads leave the count, and coalescing, alone
+        if conn.total_changes:
+            with _commits_lock:
+                _commits += 1
     except Exception:
         conn.rollback()
         raise
     finally:
         conn.close()
+
+
+_scatter_pool: Optional[ThreadPoolExecutor] = None
+_scatter_lock = threading.Lock()
+
+
+def scatter(fn: Callable[[int], T], shards: Optional[List[int]] = None) -> List[T]:
+    """Run ``fn(shard)`` for each shard, in parallel when there are several.
+
+    Results are returned in shard order. Each call runs in a copy of the
+    caller's context, so request profiling still sees its queries.
+    """
+    global _scatter_pool
+    shards = list(range(SHARD_COUNT)) if shards is None else shards
+    if len(shards) == 1:
+        return [fn(shards[0])]
+    with _scatter_lock:
+        if _scatter_pool is None:
+            _scatter_pool = ThreadPoolExecutor(max_workers=SHARD_COUNT * 4, thread_name_prefix="shard")
+    futures = [_scatter_pool.submit(contextvars.copy_context().run, fn, shard) for shard in shards]
+    return [future.result() for future in futures]
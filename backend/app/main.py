@@ -1,13 +1,69 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics, warmup
+from app.admission import AdmissionMiddleware
+from app.backup import service_lock
+from app.compression import CompressionMiddleware
+from app.coherence import watcher
+from app.database import enable_wal
+from app.maintenance import scheduler
+from app.metrics import MetricsMiddleware
+from app.profiling import ProfilingMiddleware, TimedJSONResponse
+from app.routes import (
+    admin_router,
+    customers_router,
+    health_router,
+    items_router,
+    metrics_router,
+    orders_router,
+)
+from app.routes.orders import printing
+from app.routes.orders.repository import get_repository
+from app.startup import report
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown."""
+    service_lock.start()
+    enable_wal()
+    watcher.start()
+    metrics.start_flusher()
+    get_repository().start()
+    scheduler.start()
+    await run_in_threadpool(warmup.run)
+    report.ready()
+    yield
+    scheduler.stop()
+    get_repository().stop()
+    printing.shutdown()
+    metrics.stop_flusher()
+    watcher.stop()
+    service_lock.stop()
+
 
-from app.routes import health_router, items_router, orders_router
+app = FastAPI(
+    title="Backend Exercise API",
+    version="1.0.0",
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan,
+)
 
-app = FastAPI(title="Backend Exercise API", version="1.0.0")
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Register routers
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(items_router)
 app.include_router(orders_router)
+app.include_router(customers_router)
+app.include_router(admin_router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+"""Background database maintenance.
+
+A daemon thread started by ``app.main`` looks after every database file
+(DATABASE_PATH and its shard files) every ``MAINTENANCE_INTERVAL_SECONDS``:
+
+- **WAL checkpoint**: a passive checkpoint each pass, and a truncating one
+  once the ``-wal`` file exceeds ``MAINTENANCE_WAL_MB``, so the log cannot
+  grow without bound under constant readers;
+- **incremental vacuum**: once ``MAINTENANCE_FREE_PAGES`` pages are free
+  (after bulk deletes, say), they are returned to the filesystem
+  ``MAINTENANCE_VACUUM_STEP_PAGES`` at a time, each slice its own short
+  transaction with a pause in between (needs migration 007);
+- **statistics**: every ``MAINTENANCE_OPTIMIZE_SECONDS``, and after a vacuum,
+  the planner statistics are refreshed with a row-limited ``ANALYZE``;
+- **backup**: every ``BACKUP_INTERVAL_SECONDS`` (when set), a snapshot is
+  taken and old ones pruned (see ``app.backup``).
+
+Maintenance connections give up after ``MAINTENANCE_BUSY_MS`` when the
+database is locked and try again next pass, so they yield to live traffic.
+With several workers, a lock file makes sure only one runs a pass at a time.
+"""
+
+import calendar
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Generator, List, Optional
+
+from app import backup, database
+from app.metrics import (
+    maintenance_pages_freed_total,
+    maintenance_task_seconds,
+    maintenance_wal_frames_checkpointed_total,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "1") != "0"
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "60"))
+MAINTENANCE_WAL_MB = float(os.getenv("MAINTENANCE_WAL_MB", "64"))
+MAINTENANCE_FREE_PAGES = int(os.getenv("MAINTENANCE_FREE_PAGES", "2000"))
+MAINTENANCE_VACUUM_STEP_PAGES = int(os.getenv("MAINTENANCE_VACUUM_STEP_PAGES", "500"))
+MAINTENANCE_SLICE_PAUSE_MS = float(os.getenv("MAINTENANCE_SLICE_PAUSE_MS", "20"))
+MAINTENANCE_OPTIMIZE_SECONDS = float(os.getenv("MAINTENANCE_OPTIMIZE_SECONDS", "3600"))
+MAINTENANCE_BUSY_MS = float(os.getenv("MAINTENANCE_BUSY_MS", "50"))
+
+# Rows sampled per index by ANALYZE, keeping it fast on large tables
+ANALYSIS_LIMIT = 1000
+
+# Reports of recent passes kept for /admin/maintenance
+HISTORY_SIZE = 20
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceScheduler:
+    """Runs maintenance passes on a timer and keeps their reports."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.history: Deque[dict] = deque(maxlen=HISTORY_SIZE)
+        self._last_analyze: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- tasks -------------------------------------------------------------
+
+    def _checkpoint(self, conn: sqlite3.Connection, path: str, force: bool) -> Optional[dict]:
+        wal_path = path + "-wal"
+        wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        if not wal_bytes:
+            return None
+        mode = "TRUNCATE" if force or wal_bytes >= MAINTENANCE_WAL_MB * 1024 * 1024 else "PASSIVE"
+        start = time.perf_counter()
+        busy, frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        maintenance_task_seconds.labels("checkpoint").observe(time.perf_counter() - start)
+        maintenance_wal_frames_checkpointed_total.inc(max(checkpointed, 0))
+        if mode == "PASSIVE" and checkpointed <= 0:
+            return None
+        return {
+            "task": "checkpoint",
+            "mode": mode.lower(),
+            "wal_bytes": wal_bytes,
+            "frames": frames,
+            "checkpointed": checkpointed,
+            "busy": bool(busy),
+        }
+
+    def _vacuum(self, conn: sqlite3.Connection, force: bool) -> Optional[dict]:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free or (free < MAINTENANCE_FREE_PAGES and not force):
+            return None
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return {"task": "vacuum", "skipped": "auto_vacuum is not incremental", "free_pages": free}
+        start = time.perf_counter()
+        freed = slices = 0
+        interrupted = None
+        while free and not self._stop.is_set():
+            try:
+                # execute() would step the pragma once, freeing a single page
+                conn.executescript(f"PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_STEP_PAGES});")
+            except sqlite3.OperationalError as e:
+                interrupted = str(e)  # Busy; the rest waits for the next pass
+                break
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            freed += free - remaining
+            free = remaining
+            slices += 1
+            if free:
+                time.sleep(MAINTENANCE_SLICE_PAUSE_MS / 1000)
+        maintenance_task_seconds.labels("vacuum").observe(time.perf_counter() - start)
+        maintenance_pages_freed_total.inc(freed)
+        report = {"task": "vacuum", "pages_freed": freed, "slices": slices, "free_pages": free}
+        if interrupted:
+            report["interrupted"] = interrupted
+        return report
+
+    def _analyze(self, conn: sqlite3.Connection, path: str, force: bool) -> Optional[dict]:
+        last = self._last_analyze.get(path)
+        if not force and last is not None and time.monotonic() - last < MAINTENANCE_OPTIMIZE_SECONDS:
+            return None
+        start = time.perf_counter()
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        if sqlite3.sqlite_version_info >= (3, 46, 0):
+            # Check every table, not only those this connection has used
+            conn.execute("PRAGMA optimize = 0x10002")
+        else:
+            conn.execute("ANALYZE")
+        elapsed = time.perf_counter() - start
+        maintenance_task_seconds.labels("analyze").observe(elapsed)
+        self._last_analyze[path] = time.monotonic()
+        return {"task": "analyze", "ms": round(elapsed * 1000, 1)}
+
+    # -- passes ------------------------------------------------------------
+
+    def _maintain(self, path: str, force: bool) -> dict:
+        conn = sqlite3.connect(path, timeout=MAINTENANCE_BUSY_MS / 1000, isolation_level=None)
+        actions: List[dict] = []
+        tasks = (
+            ("checkpoint", lambda: self._checkpoint(conn, path, force)),
+            ("vacuum", lambda: self._vacuum(conn, force)),
+            # Bulk deletes that freed pages have also skewed the statistics
+            ("analyze", lambda: self._analyze(conn, path, force or any(a.get("pages_freed") for a in actions))),
+        )
+        try:
+            for task, run in tasks:
+                try:
+                    action = run()
+                except sqlite3.OperationalError as e:
+                    action = {"task": task, "error": str(e)}  # Locked; retried next pass
+                if action:
+                    actions.append(action)
+        finally:
+            conn.close()
+        return {"database": path, "actions": actions}
+
+    def _backup_due(self) -> bool:
+        if backup.BACKUP_INTERVAL_SECONDS <= 0:
+            return False
+        latest = backup.latest_snapshot()
+        if latest is None:
+            return True
+        taken = calendar.timegm(time.strptime(latest["created_at"], "%Y-%m-%dT%H:%M:%SZ"))
+        return time.time() - taken >= backup.BACKUP_INTERVAL_SECONDS
+
+    def _backup(self) -> dict:
+        try:
+            manifest = backup.snapshot()
+            pruned = backup.prune()
+        except (sqlite3.Error, OSError) as e:
+            return {"task": "backup", "error": str(e)}
+        return {
+            "task": "backup",
+            "snapshot": manifest["path"],
+            "bytes": sum(entry["bytes"] for entry in manifest["files"]),
+            "seconds": manifest["seconds"],
+            "pruned": pruned,
+        }
+
+    @contextmanager
+    def _worker_lock(self) -> Generator[bool, None, None]:
+        """Hold the cross-worker maintenance lock; yields False if another worker has it."""
+        if fcntl is None:
+            yield True
+            return
+        with open(database.DATABASE_PATH + ".maintenance.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def run_once(self, force: bool = False) -> Optional[dict]:
+        """Run one pass over every database file and return its report.
+
+        ``force`` runs every task regardless of its trigger. Returns None
+        when another worker is already running a pass.
+        """
+        with self._lock, self._worker_lock() as acquired:
+            if not acquired:
+                return None
+            start = time.perf_counter()
+            report = {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+                "forced": force,
+                "databases": [
+                    self._maintain(database.shard_path(shard), force) for shard in range(database.SHARD_COUNT)
+                ],
+            }
+            if self._backup_due():
+                report["backup"] = self._backup()
+            report["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.history.append(report)
+        for entry in report["databases"]:
+            if entry["actions"]:
+                logger.info("maintenance %s: %s", entry["database"], entry["actions"])
+        if "backup" in report:
+            logger.info("maintenance backup: %s", report["backup"])
+        return report
+
+    def backup_now(self) -> Optional[dict]:
+        """Take a snapshot now; None when another worker is running a pass."""
+        with self._lock, self._worker_lock() as acquired:
+            if not acquired:
+                return None
+            report = self._backup()
+            self.history.append({
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+                "forced": True,
+                "databases": [],
+                "backup": report,
+            })
+        return report
+
+    def status(self) -> dict:
+        """Current size, WAL and free-page figures of every database file."""
+        databases = []
+        for shard in range(database.SHARD_COUNT):
+            path = database.shard_path(shard)
+            wal_path = path + "-wal"
+            conn = sqlite3.connect(path, timeout=MAINTENANCE_BUSY_MS / 1000)
+            try:
+                page_size, pages, free, auto_vacuum = (
+                    conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+                    for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum")
+                )
+            finally:
+                conn.close()
+            databases.append({
+                "database": path,
+                "bytes": page_size * pages,
+                "free_pages": free,
+                "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+                "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum, str(auto_vacuum)),
+            })
+        return {
+            "enabled": MAINTENANCE_ENABLED and self.interval > 0,
+            "running": self._thread is not None,
+            "interval_seconds": self.interval,
+            "databases": databases,
+            "history": list(self.history),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Database maintenance pass failed")
+
+    def start(self) -> None:
+        """Start the scheduler in a daemon thread."""
+        if self._thread is not None or not MAINTENANCE_ENABLED or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the scheduler, interrupting a running vacuum between slices."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+scheduler = MaintenanceScheduler(MAINTENANCE_INTERVAL_SECONDS)
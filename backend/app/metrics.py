@@ -0,0 +1,449 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Hot-path updates never take a lock: every metric keeps one preallocated row
+of cells per thread and a scrape sums the rows. Only the first update from a
+new thread, or the first use of a new label combination, takes a lock.
+
+With several worker processes, set METRICS_DIR to a directory shared by the
+workers: each one periodically writes its raw totals there and a scrape,
+whichever worker serves it, sums the files of all workers.
+"""
+
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.database import add_connection_hook, add_query_hook
+from app.singleflight import reads
+from app.startup import report
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 50000)
+BACKUP_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Raw per-child totals of one metric, keyed by label values.
+Samples = Dict[Tuple[str, ...], List[float]]
+
+
+class _Cells:
+    """Fixed-size row of float cells sharded per thread."""
+
+    __slots__ = ("_size", "_local", "_rows", "_lock")
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._rows: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def _row(self) -> List[float]:
+        try:
+            return self._local.row
+        except AttributeError:
+            row = [0.0] * self._size
+            with self._lock:
+                self._rows.append(row)
+            self._local.row = row
+            return row
+
+    def add(self, index: int, amount: float = 1.0) -> None:
+        self._row()[index] += amount
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            rows = list(self._rows)
+        return [sum(column) for column in zip(*rows)] if rows else [0.0] * self._size
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self) -> None:
+        self._cells = _Cells(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._cells.add(0, amount)
+
+    def totals(self) -> List[float]:
+        return self._cells.totals()
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._cells.add(0, -amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_cells")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        # One cell per bucket, one for +Inf, then sum and count.
+        self._cells = _Cells(len(bounds) + 3)
+
+    def observe(self, value: float) -> None:
+        cells = self._cells
+        cells.add(bisect.bisect_left(self._bounds, value))
+        cells.add(-2, value)
+        cells.add(-1)
+
+    def totals(self) -> List[float]:
+        """Per-bucket counts (not cumulative), then the sum and the count."""
+        return self._cells.totals()
+
+
+class _Metric:
+    """A named metric family with optional labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the child for a label combination, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def collect(self) -> Samples:
+        """Raw totals of every child, in a form that can be summed across processes."""
+        return {values: child.totals() for values, child in list(self._children.items())}
+
+    def render(self, samples: Optional[Samples] = None) -> List[str]:
+        samples = self.collect() if samples is None else samples
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, totals in sorted(samples.items()):
+            lines.extend(self._render_child(values, totals))
+        return lines
+
+    def _render_child(self, values, totals: List[float]) -> List[str]:
+        return [f"{self.name}{self._label_str(values)} {_format(totals[0])}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values, totals: List[float]) -> List[str]:
+        total, count = totals[-2], totals[-1]
+        lines = []
+        running = 0.0
+        for bound, bucket in zip(self.buckets + (float("inf"),), totals[:-2]):
+            running += bucket
+            le = "+Inf" if bound == float("inf") else _format(bound)
+            labels = self._label_str(values, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {_format(running)}")
+        lines.append(f"{self.name}_sum{self._label_str(values)} {_format(total)}")
+        lines.append(f"{self.name}_count{self._label_str(values)} {_format(count)}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Metric whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str, callback: Callable[[], float]) -> None:
+        super().__init__(name, documentation)
+        self.kind = kind
+        self._callback = callback
+
+    def collect(self) -> Samples:
+        return {(): [float(self._callback())]}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY: List[_Metric] = []
+
+
+def collect() -> Dict[str, Samples]:
+    """Raw totals of every registered metric in this process."""
+    return {metric.name: metric.collect() for metric in REGISTRY}
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def write_snapshot() -> None:
+    """Write this process's totals to METRICS_DIR for other workers to merge."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    data = {
+        name: [[list(values), totals] for values, totals in samples.items()]
+        for name, samples in collect().items()
+    }
+    path = _snapshot_path(os.getpid())
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_all() -> Dict[str, Samples]:
+    """Totals of this process plus the latest snapshots of every other worker.
+
+    Counters and histograms of exited workers are kept so totals never go
+    backwards; their gauges are dropped.
+    """
+    merged = collect()
+    kinds = {metric.name: metric.kind for metric in REGISTRY}
+    own = _snapshot_path(os.getpid())
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        if path == own:
+            continue
+        try:
+            pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            with open(path) as f:
+                data = json.load(f)
+        except (ValueError, OSError):
+            continue
+        alive = _alive(pid)
+        for name, entries in data.items():
+            if name not in merged or (kinds[name] == "gauge" and not alive):
+                continue
+            samples = merged[name]
+            for values, totals in entries:
+                key = tuple(values)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = list(totals)
+                elif len(current) == len(totals):
+                    samples[key] = [a + b for a, b in zip(current, totals)]
+    return merged
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    samples = collect_all() if METRICS_DIR else collect()
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(samples.get(metric.name, {})))
+    return "\n".join(lines) + "\n"
+
+
+_flush_stop = threading.Event()
+_flush_thread: Optional[threading.Thread] = None
+
+
+def _flush_loop() -> None:
+    while not _flush_stop.wait(METRICS_FLUSH_SECONDS):
+        write_snapshot()
+
+
+def start_flusher() -> None:
+    """Periodically publish this worker's totals when METRICS_DIR is set."""
+    global _flush_thread
+    if not METRICS_DIR or _flush_thread is not None:
+        return
+    write_snapshot()
+    _flush_stop.clear()
+    _flush_thread = threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True)
+    _flush_thread.start()
+
+
+def stop_flusher() -> None:
+    """Stop the flusher and publish the final totals."""
+    global _flush_thread
+    if _flush_thread is None:
+        return
+    _flush_stop.set()
+    _flush_thread.join()
+    _flush_thread = None
+    write_snapshot()
+
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests served.", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+bulk_batch_size = Histogram(
+    "orders_bulk_batch_size", "Number of IDs submitted per bulk operation.", ("operation",), BATCH_SIZE_BUCKETS
+)
+bulk_rows_affected_total = Counter(
+    "orders_bulk_rows_affected_total", "Rows affected by bulk operations.", ("operation",)
+)
+db_connections_opened_total = Counter("db_connections_opened_total", "Database connections opened.")
+db_connections_closed_total = Counter("db_connections_closed_total", "Database connections closed.")
+db_connection_open_seconds = Histogram("db_connection_open_seconds", "Time spent opening database connections.")
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds", "Statement execution and row fetch time.", ("statement",)
+)
+admission_queue_depth = Gauge(
+    "admission_queue_depth", "Write requests waiting for admission.", ("operation",)
+)
+admission_active = Gauge(
+    "admission_active_requests", "Admitted write requests currently running.", ("operation",)
+)
+admission_queue_seconds = Histogram(
+    "admission_queue_seconds", "Time write requests waited for admission.", ("operation",)
+)
+admission_rejected_total = Counter(
+    "admission_rejected_total", "Write requests rejected with 503 by admission control.", ("operation", "reason")
+)
+maintenance_task_seconds = Histogram(
+    "maintenance_task_seconds", "Time spent on background database maintenance tasks.", ("task",)
+)
+maintenance_wal_frames_checkpointed_total = Counter(
+    "maintenance_wal_frames_checkpointed_total", "WAL frames copied into the database by maintenance checkpoints."
+)
+maintenance_pages_freed_total = Counter(
+    "maintenance_pages_freed_total", "Free pages returned to the filesystem by incremental vacuum."
+)
+backup_seconds = Histogram("backup_seconds", "Time taken by database snapshots.", (), BACKUP_BUCKETS)
+backup_bytes_total = Counter("backup_bytes_total", "Bytes written to database snapshots.")
+backup_snapshots_total = Counter("backup_snapshots_total", "Database snapshots taken.", ("result",))
+CallbackMetric(
+    "singleflight_executed_total", "Coalesced reads that ran a query.", "counter", lambda: reads.executed
+)
+CallbackMetric(
+    "singleflight_collapsed_total", "Reads that shared another request's in-flight query.", "counter",
+    lambda: reads.collapsed,
+)
+
+
+def observe_bulk(operation: str, batch_size: int, rows_affected: int) -> None:
+    """Record the size and effect of a bulk operation."""
+    bulk_batch_size.labels(operation).observe(batch_size)
+    bulk_rows_affected_total.labels(operation).inc(rows_affected)
+
+
+_STATEMENT_KINDS = ("select", "insert", "update", "delete")
+
+
+def _on_query(conn, sql: str, params, seconds: float, many: bool) -> None:
+    verb = sql.lstrip()[:6].lower()
+    db_query_duration_seconds.labels(verb if verb in _STATEMENT_KINDS else "other").observe(seconds)
+
+
+def _on_connection(event: str, seconds: float) -> None:
+    if event == "open":
+        db_connections_opened_total.inc()
+        db_connection_open_seconds.observe(seconds)
+    else:
+        db_connections_closed_total.inc()
+
+
+add_query_hook(_on_query)
+add_connection_hook(_on_connection)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and concurrency."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status: Optional[int] = None
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            # Label by route template, not raw path, to bound cardinality.
+            route = scope.get("route")
+            path = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            http_requests_total.labels(method, path, str(status or 500)).inc()
+            http_request_duration_seconds.labels(method, path).observe(elapsed)
+            report.observe(method, path, elapsed)
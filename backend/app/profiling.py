@@ -0,0 +1,200 @@
+"""Per-request timing, ``Server-Timing`` headers and sampled slow-request profiles."""
+
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Set
+
+from fastapi.responses import JSONResponse
+
+from app.database import add_connection_hook, add_query_hook
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "1") != "0"
+# Requests slower than this are written to PROFILE_DIR; 0 disables sampling.
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+# Fraction of requests that run the stack sampler when PROFILE_SLOW_MS is set.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class StackSampler(threading.Thread):
+    """Statistical profiler that samples the stacks of a set of threads.
+
+    ``cProfile`` only sees the thread it was enabled in, while a request hops
+    between the event loop and a threadpool worker. Sampling
+    ``sys._current_frames()`` from a side thread covers both, pyinstrument
+    style, and produces folded stacks that flame graph tools understand.
+    """
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._threads: Set[int] = set()
+        self._stop_event = threading.Event()
+
+    def watch(self, ident: int) -> None:
+        """Include the given thread in future samples."""
+        self._threads.add(ident)
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in tuple(self._threads):
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        """Stop sampling and return the collected stack counts."""
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+class RequestProfile:
+    """Timings collected while serving one request."""
+
+    __slots__ = ("start", "phases", "queries", "sampler")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+        self.sampler: Optional[StackSampler] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Accumulate time spent in a phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """Render the phases as a ``Server-Timing`` header value."""
+        parts = []
+        accounted = 0.0
+        for name, seconds in self.phases.items():
+            accounted += seconds
+            if name == "sql":
+                parts.append(f'sql;dur={seconds * 1000:.3f};desc="{self.queries} queries"')
+            else:
+                parts.append(f"{name};dur={seconds * 1000:.3f}")
+        parts.append(f"app;dur={max(total - accounted, 0.0) * 1000:.3f}")
+        parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current() -> Optional[RequestProfile]:
+    """Return the profile of the request being served, if any."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block of code as a named phase of the current request."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+def _on_query(conn, sql, params, seconds: float, many: bool) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.queries += 1
+        profile.add("sql", seconds)
+
+
+def _on_connection(event: str, seconds: float) -> None:
+    profile = _current.get()
+    if profile is None:
+        return
+    if event == "open":
+        profile.add("connect", seconds)
+    if profile.sampler is not None:
+        # Connections are opened from the threadpool worker running the
+        # handler, which is the thread worth sampling.
+        profile.sampler.watch(threading.get_ident())
+
+
+add_query_hook(_on_query)
+add_connection_hook(_on_connection)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response that records serialization time as the ``encode`` phase."""
+
+    def render(self, content) -> bytes:
+        with phase("encode"):
+            return super().render(content)
+
+
+def _write_profile(scope, total: float, samples: Counter) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope.get("path", "")).strip("_") or "root"
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(total * 1000)}ms-{scope.get('method', '')}-{path}.folded"
+    with open(os.path.join(PROFILE_DIR, filename), "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that times each request and adds a ``Server-Timing`` header.
+
+    Written as plain ASGI rather than ``BaseHTTPMiddleware`` so the handler
+    runs in the same context and the request profile is visible to the
+    database hooks.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        if PROFILE_SLOW_MS > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            profile.sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+            profile.sampler.watch(threading.get_ident())
+            profile.sampler.start()
+        token = _current.set(profile)
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - profile.start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing(total).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if profile.sampler is not None:
+                samples = profile.sampler.stop()
+                total = time.perf_counter() - profile.start
+                if total * 1000 >= PROFILE_SLOW_MS and samples:
+                    _write_profile(scope, total, samples)
@@ -1,5 +1,8 @@
+from app.routes.admin import router as admin_router
+from app.routes.customers import router as customers_router
 from app.routes.health import router as health_router
 from app.routes.items import router as items_router
+from app.routes.metrics import router as metrics_router
 from app.routes.orders import orders_router
 
-__all__ = ["health_router", "items_router", "orders_router"]
\ No newline at end of file
+__all__ = ["admin_router", "customers_router", "health_router", "items_router", "metrics_router", "orders_router"]
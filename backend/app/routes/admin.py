@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from app import backup
+from app.maintenance import scheduler
+from app.slow_queries import slow_log
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/slow-queries")
+def list_slow_queries(
+    limit: int = Query(20, ge=1, le=500, description="Number of fingerprints to return"),
+    sort_by: str = Query("total", pattern="^(total|max|count)$", description="Ranking key"),
+):
+    """List the slowest statements aggregated by normalized SQL fingerprint."""
+    return {
+        "threshold_ms": slow_log.threshold * 1000,
+        "queries": slow_log.top(limit, sort_by),
+    }
+
+
+@router.delete("/slow-queries", status_code=204)
+def reset_slow_queries():
+    """Clear the slow-query log."""
+    slow_log.reset()
+    return None
+
+
+@router.get("/maintenance")
+def maintenance_status():
+    """Database sizes, WAL and free pages, and reports of recent maintenance passes."""
+    return scheduler.status()
+
+
+@router.post("/maintenance/run")
+def run_maintenance():
+    """Run every maintenance task now, regardless of its trigger."""
+    report = scheduler.run_once(force=True)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running in another worker")
+    return report
+
+
+@router.get("/backups")
+def list_backups():
+    """Snapshots kept in the backup directory, newest first."""
+    return {
+        "directory": backup.default_backup_dir(),
+        "interval_seconds": backup.BACKUP_INTERVAL_SECONDS,
+        "keep": backup.BACKUP_KEEP,
+        "snapshots": backup.list_snapshots(),
+    }
+
+
+@router.post("/backups", status_code=201)
+def create_backup():
+    """Take a snapshot of every database file now and prune old ones."""
+    report = scheduler.backup_now()
+    if report is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running in another worker")
+    if "error" in report:
+        raise HTTPException(status_code=500, detail=f"Database error: {report['error']}")
+    return report
@@ -0,0 +1,22 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query
+
+from app.routes.orders import encoding
+from app.routes.orders.repository import get_repository
+
+router = APIRouter(prefix="/customers", tags=["customers"])
+
+
+@router.get("/{customer_id}/orders")
+def list_customer_orders(
+    customer_id: int,
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(10, ge=1, le=100, description="Items per page"),
+    include_archived: bool = Query(False, description="Also return archived orders"),
+    accept: Optional[str] = Header(None),
+):
+    """List a customer's orders, newest first."""
+    return encoding.respond(
+        get_repository().list_customer_orders(customer_id, page, limit, include_archived), accept
+    )
@@ -1,9 +1,23 @@
+import os
+
 from fastapi import APIRouter
 
+from app.admission import controller
+from app.coherence import watcher
+from app.singleflight import reads
+from app.startup import report
+
 router = APIRouter()
 
 
 @router.get("/health")
 def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "worker": os.getpid(),
+        "data_generation": watcher.generation,
+        "singleflight": reads.stats(),
+        "admission": controller.stats(),
+        "startup": report.stats(),
+    }
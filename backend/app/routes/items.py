@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import json
+from typing import Iterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from app.database import get_db
+from app.routes.orders.selectors import IdSelection, Selection
+from app.singleflight import coalesce
 
 router = APIRouter(prefix="/items", tags=["items"])
 
+# Rows read per query while streaming a listing; each chunk uses its own
+# short-lived connection so a slow client never holds a read transaction open.
+STREAM_CHUNK_SIZE = 1000
+
 
 class ItemCreate(BaseModel):
     name: str
@@ -19,19 +29,127 @@ class ItemResponse(BaseModel):
     name: str
 
 
+class ItemBatchCreate(BaseModel):
+    items: List[ItemCreate] = Field(..., description="Items to create")
+
+
+class ItemBatchUpdate(BaseModel):
+    items: List[ItemResponse] = Field(..., description="New names by item ID")
+
+
+class ItemSelection(IdSelection):
+    """Items a bulk operation applies to."""
+
+    ids_field = "ids"
+
+    ids: Optional[List[int]] = Field(None, description="IDs to operate on")
+
+
+def _page(after: int, limit: int) -> List[dict]:
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name FROM items WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+        return [{"id": row["id"], "name": row["name"]} for row in cursor.fetchall()]
+
+
+@coalesce
+def _list_items(after: int, limit: int):
+    # One extra row tells whether another page follows
+    items = _page(after, limit + 1)
+    next_after = items[limit - 1]["id"] if len(items) > limit else None
+    return {"items": items[:limit], "next_after": next_after}
+
+
+def _stream_items(after: int) -> Iterator[bytes]:
+    while True:
+        items = _page(after, STREAM_CHUNK_SIZE)
+        if not items:
+            return
+        yield "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items).encode()
+        after = items[-1]["id"]
+
+
 @router.get("")
-def list_items():
+def list_items(
+    after: int = Query(0, ge=0, description="Return items with an ID greater than this (keyset cursor)"),
+    limit: int = Query(100, ge=1, le=1000, description="Items per page"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json page, or ndjson stream of every item"),
+):
     """
-    List all items from the database.
-    Uses raw SQL query (no ORM).
+    List items in ID order, one keyset page at a time.
+    Pass the returned ``next_after`` as ``after`` to get the next page; with
+    ``format=ndjson`` every item after ``after`` is streamed, one per line.
+    """
+    try:
+        if format == "ndjson":
+            return StreamingResponse(_stream_items(after), media_type="application/x-ndjson")
+        return _list_items(after, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.post("/bulk", status_code=201)
+def bulk_create_items(payload: ItemBatchCreate):
+    """
+    Create many items in one transaction.
+    Returns the new items in the order given.
     """
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    names = [item.name for item in payload.items]
     try:
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM items ORDER BY id")
-            rows = cursor.fetchall()
-            items = [{"id": row["id"], "name": row["name"]} for row in rows]
-            return {"items": items}
+            cursor.executemany("INSERT INTO items (name) VALUES (?)", [(name,) for name in names])
+            # The transaction holds the write lock, so the new IDs are consecutive
+            cursor.execute("SELECT last_insert_rowid()")
+            first_id = cursor.fetchone()[0] - len(names) + 1
+            return {"items": [{"id": first_id + i, "name": name} for i, name in enumerate(names)]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.put("/bulk")
+def bulk_update_items(payload: ItemBatchUpdate):
+    """
+    Rename many items in one transaction.
+    Nothing is changed if any of the items does not exist.
+    """
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("UPDATE items SET name = ? WHERE id = ?", [(item.name, item.id) for item in payload.items])
+            if cursor.rowcount < len(payload.items):
+                selection = Selection([item.id for item in payload.items])
+                where, params = selection.where(cursor)
+                cursor.execute(f"SELECT id FROM items WHERE {where}", params)
+                found = {row["id"] for row in cursor.fetchall()}
+                missing = sorted({item.id for item in payload.items} - found)
+                raise HTTPException(status_code=404, detail=f"Items not found: {missing}")
+            return {"updated": cursor.rowcount}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.delete("/bulk", status_code=204)
+def bulk_delete_items(payload: ItemSelection):
+    """
+    Delete many items in one statement.
+    Accepts the same compact selections as the orders bulk endpoints.
+    """
+    selection = Selection.from_request(payload)
+    if not selection:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            where, params = selection.where(cursor, table="items")
+            cursor.execute(f"DELETE FROM items WHERE {where}", params)
+            return None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -81,12 +199,9 @@ def update_item(item_id: int, item: ItemUpdate):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = ?", (item_id,))
-            if cursor.fetchone() is None:
-                raise HTTPException(status_code=404, detail="Item not found")
-            # Update the item
             cursor.execute("UPDATE items SET name = ? WHERE id = ?", (item.name, item_id))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Item not found")
             return {"id": item_id, "name": item.name}
     except HTTPException:
         raise
@@ -103,12 +218,9 @@ def delete_item(item_id: int):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = ?", (item_id,))
-            if cursor.fetchone() is None:
-                raise HTTPException(status_code=404, detail="Item not found")
-            # Delete the item
             cursor.execute("DELETE FROM items WHERE id = ?", (item_id,))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Item not found")
             return None
     except HTTPException:
         raise
@@ -0,0 +1,490 @@
+"""Order analytics over a columnar snapshot.
+
+``GET /orders/analytics`` summarizes ``total_amount`` (count, sum, mean,
+min, max, quantiles and a histogram) over all orders, by status and by
+payment status, and ranks customers by their totals. Rather than running
+GROUP BY scans per request it reads a snapshot of the orders held in
+``array`` columns:
+
+- each orders database, and with ``include_archived`` each archive, is
+  loaded once in bulk with ``fetchmany``;
+- before summarizing, the snapshot compares every file's
+  ``PRAGMA data_version`` with the value at its last refresh. When another
+  connection has committed since, it appends the orders with higher IDs and
+  re-reads those whose ``updated_at`` moved (indexed by migration 008); if
+  the row count still disagrees (deletes, archiving) the file is reloaded.
+  Archives are always reloaded whole, as archiving adds rows with old IDs;
+- summaries are computed with NumPy over zero-copy views of the columns
+  when it is installed, and in plain Python (much slower on large
+  snapshots) otherwise. They are cached until the snapshot changes.
+
+The memory engine summarizes its own columns with the same functions.
+"""
+
+import bisect
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from itertools import chain, compress
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app import archive, database
+from app.singleflight import coalesce
+
+from .storage import from_cents, order_statuses, payment_statuses
+
+# NumPy is imported by the first summary rather than at startup, where it
+# would add ~80 ms to every worker's start; see ``_load_numpy``
+numpy = None
+_numpy_loaded = False
+
+ANALYTICS_FETCH_SIZE = int(os.getenv("ANALYTICS_FETCH_SIZE", "10000"))
+ANALYTICS_FULL_REFRESH_SECONDS = float(os.getenv("ANALYTICS_FULL_REFRESH_SECONDS", "600"))
+
+# Orders updated this close to the newest ``updated_at`` seen are re-read on
+# every refresh: timestamps are taken before a write commits, so a slow
+# transaction can commit one older than a timestamp already seen.
+UPDATE_MARGIN_SECONDS = 10
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Summaries kept for distinct snapshot versions and parameters
+CACHE_SIZE = 32
+
+SNAPSHOT_COLUMNS = "id, COALESCE(customer_id, 0), status_id, payment_status_id, total_cents"
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class OrderColumns:
+    """Orders as parallel ``array('q')`` columns."""
+
+    __slots__ = ("id", "customer_id", "status_id", "payment_status_id", "total_cents")
+
+    def __init__(self, *columns: array) -> None:
+        for name, column in zip(self.__slots__, columns or [array("q") for _ in self.__slots__]):
+            setattr(self, name, column)
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def columns(self) -> Tuple[array, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def extend(self, rows: Sequence[tuple]) -> None:
+        """Append rows selected with ``SNAPSHOT_COLUMNS``."""
+        # Flattening and slicing every column out of one array is about
+        # twice as fast as transposing the rows with zip().
+        flat = array("q", chain.from_iterable(rows))
+        width = len(self.__slots__)
+        for i, column in enumerate(self.columns()):
+            column.extend(flat[i::width])
+
+    @classmethod
+    def concat(cls, parts: List["OrderColumns"]) -> "OrderColumns":
+        """The rows of all ``parts``; a single part is returned as is."""
+        if len(parts) == 1:
+            return parts[0]
+        combined = cls()
+        for part in parts:
+            for column, values in zip(combined.columns(), part.columns()):
+                column.extend(values)
+        return combined
+
+
+def parse_quantiles(text: str) -> Tuple[float, ...]:
+    """Parse a comma-separated list of quantiles between 0 and 1."""
+    try:
+        quantiles = tuple(float(part) for part in text.split(",") if part.strip())
+    except ValueError:
+        quantiles = ()
+    if not quantiles or any(not 0 <= q <= 1 for q in quantiles):
+        raise HTTPException(status_code=400, detail=f"Invalid quantiles: {text!r} (expected numbers from 0 to 1)")
+    return quantiles
+
+
+# -- summaries ------------------------------------------------------------
+#
+# A summary holds amounts in cents and groups keyed by code:
+# {"orders", "edges", "overall", "by_status", "by_payment_status",
+#  "customers", "top_customers": [(customer_id, orders, total_cents)]}
+
+
+def _edges(lo: int, hi: int, buckets: int) -> List[float]:
+    """Equal-width histogram bucket edges over ``[lo, hi]``."""
+    if hi == lo:
+        hi = lo + 1
+    return [lo + (hi - lo) * i / buckets for i in range(buckets + 1)]
+
+
+def _quantile(ordered: Sequence[int], q: float) -> float:
+    """Linearly interpolated quantile of sorted values, as ``numpy.quantile``."""
+    position = q * (len(ordered) - 1)
+    below = int(position)
+    if below + 1 >= len(ordered):
+        return float(ordered[-1])
+    return ordered[below] + (ordered[below + 1] - ordered[below]) * (position - below)
+
+
+def _describe_sorted(ordered: Sequence[int], quantiles: Sequence[float], edges: List[float]) -> dict:
+    left = [bisect.bisect_left(ordered, edge) for edge in edges[:-1]] + [bisect.bisect_right(ordered, edges[-1])]
+    return {
+        "count": len(ordered),
+        "sum": sum(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "quantiles": [_quantile(ordered, q) for q in quantiles],
+        "histogram": [left[i + 1] - left[i] for i in range(len(edges) - 1)],
+    }
+
+
+def _summarize_python(columns: OrderColumns, quantiles: Sequence[float], buckets: int, top: int) -> dict:
+    cents = columns.total_cents
+    edges = _edges(min(cents), max(cents), buckets)
+
+    def by(codes: array) -> Dict[int, dict]:
+        return {
+            code: _describe_sorted(sorted(compress(cents, map(code.__eq__, codes))), quantiles, edges)
+            for code in sorted(set(codes))
+        }
+
+    orders = Counter(columns.customer_id)
+    orders.pop(0, None)
+    totals: Dict[int, int] = defaultdict(int)
+    for customer_id, amount in zip(columns.customer_id, cents):
+        totals[customer_id] += amount
+    ranked = heapq.nsmallest(top, orders, key=lambda customer_id: (-totals[customer_id], customer_id))
+    return {
+        "orders": len(cents),
+        "edges": edges,
+        "overall": _describe_sorted(sorted(cents), quantiles, edges),
+        "by_status": by(columns.status_id),
+        "by_payment_status": by(columns.payment_status_id),
+        "customers": len(orders),
+        "top_customers": [(customer_id, orders[customer_id], totals[customer_id]) for customer_id in ranked],
+    }
+
+
+def _describe_counts(values, counts, quantiles: Sequence[float], edges: List[float]) -> dict:
+    """Describe a group from how many of its orders have each amount in ``values``."""
+    present = numpy.flatnonzero(counts)
+    cumulative = numpy.cumsum(counts)
+    count = int(cumulative[-1])
+    position = numpy.asarray(quantiles) * (count - 1)
+    below = numpy.floor(position)
+    lower = values[numpy.searchsorted(cumulative, below, side="right")]
+    upper = values[numpy.searchsorted(cumulative, numpy.minimum(below + 1, count - 1), side="right")]
+    buckets = len(edges) - 1
+    bucket_of = numpy.minimum(numpy.searchsorted(edges, values, side="right") - 1, buckets - 1)
+    return {
+        "count": count,
+        "sum": int(counts @ values),
+        "min": int(values[present[0]]),
+        "max": int(values[present[-1]]),
+        "quantiles": (lower + (upper - lower) * (position - below)).tolist(),
+        "histogram": numpy.bincount(bucket_of, weights=counts, minlength=buckets).astype(numpy.int64).tolist(),
+    }
+
+
+def _summarize_numpy(columns: OrderColumns, quantiles: Sequence[float], buckets: int, top: int) -> dict:
+    cents = numpy.frombuffer(columns.total_cents, dtype=numpy.int64)
+    lo, hi = int(cents.min()), int(cents.max())
+    edges = _edges(lo, hi, buckets)
+
+    # Group statistics come from one count per (group, amount) pair, built
+    # in a single bincount pass. Amounts index the counts directly when
+    # their range is not much wider than the number of orders, and through
+    # their sorted distinct values otherwise.
+    if hi - lo <= cents.size + 65536:
+        values = numpy.arange(lo, hi + 1)
+        value_index = cents - lo
+    else:
+        values, value_index = numpy.unique(cents, return_inverse=True)
+
+    def by(column: array):
+        codes = numpy.frombuffer(column, dtype=numpy.int64)
+        groups = int(codes.max()) + 1
+        counts = numpy.bincount(codes * values.size + value_index, minlength=groups * values.size)
+        counts = counts.reshape(groups, values.size)
+        described = {
+            code: _describe_counts(values, counts[code], quantiles, edges)
+            for code in numpy.flatnonzero(counts.any(axis=1)).tolist()
+        }
+        return described, counts
+
+    by_status, status_counts = by(columns.status_id)
+    by_payment_status, _ = by(columns.payment_status_id)
+
+    customer_ids = numpy.frombuffer(columns.customer_id, dtype=numpy.int64)
+    orders = numpy.bincount(customer_ids)
+    orders[0] = 0
+    totals = numpy.bincount(customer_ids, weights=cents)
+    customers = numpy.flatnonzero(orders)
+    count = min(top, customers.size)
+    ranked = []
+    if count:
+        best = customers[numpy.argpartition(-totals[customers], count - 1)[:count]]
+        ranked = best[numpy.lexsort((best, -totals[best]))].tolist()
+    return {
+        "orders": int(cents.size),
+        "edges": edges,
+        "overall": _describe_counts(values, status_counts.sum(axis=0), quantiles, edges),
+        "by_status": by_status,
+        "by_payment_status": by_payment_status,
+        "customers": int(customers.size),
+        "top_customers": [(i, int(orders[i]), int(round(totals[i]))) for i in ranked],
+    }
+
+
+def _load_numpy():
+    """Import NumPy on first use; None when it is not installed."""
+    global numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as module
+        except ImportError:  # pragma: no cover - optional, plain Python is used instead
+            module = None
+        numpy, _numpy_loaded = module, True
+    return numpy
+
+
+def summarize(columns: OrderColumns, quantiles: Sequence[float], buckets: int, top: int) -> dict:
+    """Summarize the amounts of ``columns``, vectorized with NumPy when it is installed."""
+    if not len(columns):
+        return {
+            "orders": 0, "edges": [], "overall": None, "by_status": {}, "by_payment_status": {},
+            "customers": 0, "top_customers": [],
+        }
+    if _load_numpy() is not None:
+        return _summarize_numpy(columns, quantiles, buckets, top)
+    return _summarize_python(columns, quantiles, buckets, top)
+
+
+def _stats(stats: Optional[dict], quantiles: Sequence[float]) -> dict:
+    if stats is None:
+        return {"count": 0, "total_amount": 0.0, "mean": None, "min": None, "max": None,
+                "quantiles": {}, "histogram": []}
+    return {
+        "count": stats["count"],
+        "total_amount": from_cents(stats["sum"]),
+        "mean": round(stats["sum"] / stats["count"] / 100, 2),
+        "min": from_cents(stats["min"]),
+        "max": from_cents(stats["max"]),
+        "quantiles": {f"p{q * 100:g}": round(value / 100, 2) for q, value in zip(quantiles, stats["quantiles"])},
+        "histogram": stats["histogram"],
+    }
+
+
+def render(
+    summary: dict,
+    quantiles: Sequence[float],
+    status_name: Callable[[int], str],
+    payment_name: Callable[[int], str],
+    customer_names: Dict[int, str],
+) -> dict:
+    """The API shape of a summary: amounts in currency units, groups by name."""
+    return {
+        "orders": summary["orders"],
+        "histogram_edges": [round(edge / 100, 2) for edge in summary["edges"]],
+        "overall": _stats(summary["overall"], quantiles),
+        "by_status": {status_name(code): _stats(s, quantiles) for code, s in summary["by_status"].items()},
+        "by_payment_status": {
+            payment_name(code): _stats(s, quantiles) for code, s in summary["by_payment_status"].items()
+        },
+        "customers": {
+            "count": summary["customers"],
+            "top": [
+                {"id": customer_id, "name": customer_names.get(customer_id), "orders": orders,
+                 "total_amount": from_cents(total)}
+                for customer_id, orders, total in summary["top_customers"]
+            ],
+        },
+    }
+
+
+# -- snapshot -------------------------------------------------------------
+
+
+def _cutoff(newest: Optional[str]) -> str:
+    """Lowest ``updated_at`` re-read by the next refresh."""
+    if newest is None:
+        return ""
+    try:
+        moment = datetime.strptime(newest[:19], TIMESTAMP_FORMAT)
+    except ValueError:
+        return newest
+    return (moment - timedelta(seconds=UPDATE_MARGIN_SECONDS)).strftime(TIMESTAMP_FORMAT)
+
+
+def _fetch_into(columns: OrderColumns, cursor: sqlite3.Cursor) -> int:
+    fetched = 0
+    while True:
+        rows = cursor.fetchmany(ANALYTICS_FETCH_SIZE)
+        if not rows:
+            return fetched
+        columns.extend(rows)
+        fetched += len(rows)
+
+
+class _Source:
+    """Columns of the orders table of one database file."""
+
+    def __init__(self, path: str, incremental: bool) -> None:
+        self.path = path
+        self.incremental = incremental
+        self.columns = OrderColumns()
+        # Bumped whenever the columns change
+        self.generation = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version: Optional[int] = None
+        self._updated_since = ""
+        self._loaded_at = 0.0
+
+    def refresh(self) -> None:
+        """Bring the columns up to date if the file changed since the last refresh."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn = self._conn
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        expired = time.monotonic() - self._loaded_at > ANALYTICS_FULL_REFRESH_SECONDS
+        if version == self._version and not expired:
+            return
+        # One read transaction, so the delta and the row count agree
+        conn.execute("BEGIN")
+        try:
+            changed = None
+            if self._version is not None and self.incremental and not expired:
+                changed = self._apply_changes(conn)
+            if changed is None:
+                self._load(conn)
+                changed = 1
+        finally:
+            conn.execute("ROLLBACK")
+        self._version = version
+        if changed:
+            self.generation += 1
+
+    def _load(self, conn: sqlite3.Connection) -> None:
+        columns = OrderColumns()
+        _fetch_into(columns, conn.execute(f"SELECT {SNAPSHOT_COLUMNS} FROM orders ORDER BY id"))
+        self.columns = columns
+        self._updated_since = _cutoff(conn.execute("SELECT MAX(updated_at) FROM orders").fetchone()[0])
+        self._loaded_at = time.monotonic()
+
+    def _apply_changes(self, conn: sqlite3.Connection) -> Optional[int]:
+        """Apply updated and new orders; None when the file needs a reload."""
+        columns = self.columns
+        ids = columns.id
+        max_id = ids[-1] if ids else 0
+        changed = 0
+        # Filtering on id in SQL would let the planner scan the table by
+        # primary key instead of the updated_at index.
+        cursor = conn.execute(f"SELECT {SNAPSHOT_COLUMNS} FROM orders WHERE updated_at >= ?", (self._updated_since,))
+        targets = columns.columns()[1:]
+        for row in cursor:
+            if row[0] > max_id:
+                continue  # New, appended below
+            i = bisect.bisect_left(ids, row[0])
+            if i == len(ids) or ids[i] != row[0]:
+                return None  # An old ID came back
+            for column, value in zip(targets, row[1:]):
+                if column[i] != value:
+                    column[i] = value
+                    changed += 1
+        changed += _fetch_into(
+            columns, conn.execute(f"SELECT {SNAPSHOT_COLUMNS} FROM orders WHERE id > ? ORDER BY id", (max_id,))
+        )
+        if conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] != len(columns):
+            return None
+        self._updated_since = _cutoff(conn.execute("SELECT MAX(updated_at) FROM orders").fetchone()[0])
+        return changed
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ColumnarSnapshot:
+    """Columnar copies of every orders database, and summaries cached per version."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sources: Dict[str, _Source] = {}
+        self._cache: "OrderedDict[tuple, dict]" = OrderedDict()
+
+    def _source(self, path: str, incremental: bool) -> _Source:
+        source = self._sources.get(path)
+        if source is None:
+            source = self._sources[path] = _Source(path, incremental)
+        return source
+
+    def _sources_for(self, include_archived: bool) -> Iterable[_Source]:
+        for shard in range(database.SHARD_COUNT):
+            yield self._source(database.shard_path(shard), incremental=True)
+            if include_archived:
+                path = archive.default_archive_path(shard)
+                if path and os.path.exists(path):
+                    yield self._source(path, incremental=False)
+
+    def summarize(self, include_archived: bool, quantiles: Tuple[float, ...], buckets: int, top: int) -> dict:
+        """Summary of the current orders; see ``summarize``."""
+        with self._lock:
+            sources = list(self._sources_for(include_archived))
+            for source in sources:
+                source.refresh()
+            key = (tuple((source.path, source.generation) for source in sources), quantiles, buckets, top)
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+                return summary
+            # Under the lock: NumPy views must not outlive a refresh
+            summary = summarize(OrderColumns.concat([source.columns for source in sources]), quantiles, buckets, top)
+            self._cache[key] = summary
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return summary
+
+    def close(self) -> None:
+        """Drop the snapshot and close its connections."""
+        with self._lock:
+            for source in self._sources.values():
+                source.close()
+            self._sources = {}
+            self._cache.clear()
+
+
+snapshot = ColumnarSnapshot()
+
+
+@coalesce
+def get_order_analytics(include_archived: bool, quantiles: Tuple[float, ...], buckets: int, top_customers: int):
+    """Amount statistics by status and payment status, and the top customers by total."""
+    try:
+        summary = snapshot.summarize(include_archived, quantiles, buckets, top_customers)
+        with database.get_db() as conn:
+            cursor = conn.cursor()
+            customer_ids = [customer_id for customer_id, _, _ in summary["top_customers"]]
+            names: Dict[int, str] = {}
+            if customer_ids:
+                placeholders = ",".join(["?"] * len(customer_ids))
+                cursor.execute(f"SELECT id, name FROM customers WHERE id IN ({placeholders})", customer_ids)
+                names = {row[0]: row[1] for row in cursor.fetchall()}
+            return render(
+                summary,
+                quantiles,
+                lambda code: order_statuses.name(cursor, code),
+                lambda code: payment_statuses.name(cursor, code),
+                names,
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1,91 +1,362 @@
 """Helpers for reading and writing orders."""
 
-from typing import List, Optional
+import heapq
+import sqlite3
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException
 
-from app.database import get_db
+from app import archive
+from app.database import SHARD_COUNT, get_db, scatter, shard_for_key, shard_of
+from app.metrics import observe_bulk
+from app.sequences import next_order_numbers
+from app.singleflight import coalesce
 
+from .encoding import OrderRows
+from .filters import Criteria, OrderFilter
+from .selectors import Selection
+from .storage import (
+    check_order_number,
+    date_to_day,
+    day_to_date,
+    from_cents,
+    order_statuses,
+    payload_customer,
+    payment_statuses,
+    requested_order_number,
+    timestamp_now,
+    to_cents,
+)
 
-def list_orders(status: Optional[str], page: int, limit: int):
-    """Fetch a paginated list of orders optionally filtered by status."""
+ORDER_COLUMNS = (
+    "o.id, o.order_number, o.customer_id, c.name AS customer_name, c.email AS customer_email, "
+    "c.avatar AS customer_avatar, o.order_day, o.status_id, o.total_cents, o.payment_status_id, "
+    "o.created_at, o.updated_at"
+)
+ORDER_SOURCE = "orders o JOIN customers c ON c.id = o.customer_id"
+
+# Next free ID on the current shard that keeps ``id % SHARD_COUNT`` equal to
+# the shard number; with a single shard this is plain AUTOINCREMENT.
+ORDER_ID = (
+    "(SELECT (COALESCE(MAX(seq), 0) + ? - ?) / ? * ? + ? FROM main.sqlite_sequence WHERE name = 'orders')"
+)
+INSERT_ORDER = (
+    "INSERT INTO orders (id, order_number, customer_id, order_day, status_id, total_cents, "
+    f"payment_status_id, created_at, updated_at) VALUES ({ORDER_ID}, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _order_from_row(cursor, row) -> dict:
+    """Decode a row selected with ``ORDER_COLUMNS`` into the API shape."""
+    return {
+        "id": row["id"],
+        "order_number": row["order_number"],
+        "customer_name": row["customer_name"],
+        "customer": {
+            "id": row["customer_id"],
+            "name": row["customer_name"],
+            "email": row["customer_email"],
+            "avatar": row["customer_avatar"],
+        },
+        "order_date": day_to_date(row["order_day"]),
+        "status": order_statuses.name(cursor, row["status_id"]),
+        "total_amount": from_cents(row["total_cents"]),
+        "payment_status": payment_statuses.name(cursor, row["payment_status_id"]),
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def _order_rows(cursor, rows) -> OrderRows:
+    """Wrap rows selected with ``ORDER_COLUMNS`` for encoding, naming their status codes."""
+    return OrderRows(
+        rows,
+        {code: order_statuses.name(cursor, code) for code in {row[7] for row in rows}},
+        {code: payment_statuses.name(cursor, code) for code in {row[9] for row in rows}},
+    )
+
+
+def _select_order(cursor, order_id: int, columns: str = ORDER_COLUMNS, source: str = ORDER_SOURCE):
+    cursor.execute(f"SELECT {columns} FROM {source} WHERE o.id = ?", (order_id,))
+    return cursor.fetchone()
+
+
+def _order_id_params(shard: int) -> tuple:
+    return (SHARD_COUNT, shard, SHARD_COUNT, SHARD_COUNT, shard)
+
+
+def _by_shard(order_ids: List[int]) -> Dict[int, List[int]]:
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for order_id in order_ids:
+        groups[shard_of(order_id)].append(order_id)
+    return groups
+
+
+def _read_source(conn, include_archived: bool, shard: int = 0):
+    """Columns, FROM clause and count tables for order reads.
+
+    With ``include_archived`` and an archive present, reads go through the
+    ``all_orders`` view over the hot and archive tables.
+    """
+    if include_archived and archive.attach(conn, shard=shard):
+        return "o.*", "all_orders o", ("main.orders", "archive.orders")
+    return ORDER_COLUMNS, ORDER_SOURCE, ("orders",)
+
+
+def _count(cursor, tables, where: str, params, hint: str = "") -> int:
+    total = 0
+    for table in tables:
+        cursor.execute(f"SELECT COUNT(*) AS count FROM {table} o{hint}{where}", params)
+        total += cursor.fetchone()["count"]
+    return total
+
+
+def _fetch_orders(order_ids: List[int], include_archived: bool) -> OrderRows:
+    """Fetch orders by ID from their shards, in the order given."""
+    groups = _by_shard(order_ids)
+
+    def fetch(shard: int) -> OrderRows:
+        with get_db(shard) as conn:
+            columns, source, _ = _read_source(conn, include_archived, shard)
+            cursor = conn.cursor()
+            placeholders = ",".join(["?"] * len(groups[shard]))
+            cursor.execute(f"SELECT {columns} FROM {source} WHERE o.id IN ({placeholders})", groups[shard])
+            return _order_rows(cursor, cursor.fetchall())
+
+    parts = scatter(fetch, sorted(groups))
+    found = {row[0]: row for part in parts for row in part.rows}
+    return OrderRows.merge(parts, [found[order_id] for order_id in order_ids if order_id in found])
+
+
+def _gather_page(keys_of, offset: int, limit: int, include_archived: bool, reverse: bool = False):
+    """Scatter-gather one page of orders across shards.
+
+    ``keys_of(shard)`` returns the shard's match count and, per table, the
+    sort keys (ending in the order ID) of its first ``offset + limit``
+    matches in page order. The key lists are k-way merged and only the
+    orders on the requested page are then fetched from their shards.
+    """
+    parts = scatter(keys_of)
+    merged = heapq.merge(*(keys for _, lists in parts for keys in lists), reverse=reverse)
+    page_ids = [key[-1] for key in islice(merged, offset, offset + limit)]
+    return sum(total for total, _ in parts), _fetch_orders(page_ids, include_archived)
+
+
+def _criteria(cursor, filters: OrderFilter) -> Optional[Criteria]:
+    return filters.resolve(
+        lambda name: order_statuses.code(cursor, name),
+        lambda name: payment_statuses.code(cursor, name),
+    )
+
+
+def _customer_id(cursor, customer) -> int:
+    """Return the ID of a matching customer, creating one if needed.
+
+    Customers are matched by name, and by email too when one is given.
+    """
+    if customer.email is None:
+        cursor.execute("SELECT id FROM customers WHERE name = ? ORDER BY id LIMIT 1", (customer.name,))
+    else:
+        cursor.execute(
+            "SELECT id FROM customers WHERE name = ? AND email = ? ORDER BY id LIMIT 1",
+            (customer.name, customer.email),
+        )
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    cursor.execute(
+        "INSERT INTO customers (name, email, avatar) VALUES (?, ?, ?)",
+        (customer.name, customer.email, customer.avatar),
+    )
+    return cursor.lastrowid
+
+
+@coalesce
+def list_orders(filters: OrderFilter, page: int, limit: int, include_archived: bool = False):
+    """Fetch a paginated list of orders matching a status or tab and ranges."""
     offset = (page - 1) * limit
+    if SHARD_COUNT > 1:
+        return _list_orders_sharded(filters, page, limit, include_archived)
     try:
         with get_db() as conn:
+            columns, source, tables = _read_source(conn, include_archived)
             cursor = conn.cursor()
-            base_query = (
-                "SELECT id, order_number, customer_name, order_date, status, total_amount, payment_status "
-                "FROM orders"
-            )
-            params: List[object] = []
-            if status:
-                base_query += " WHERE status = ?"
-                params.append(status)
+            criteria = _criteria(cursor, filters)
+            if criteria is None:
+                return {"items": _order_rows(cursor, []), "page": page, "limit": limit, "total": 0}
+            where, params = criteria.where()
+            hint = criteria.index_hint()
+            if source == ORDER_SOURCE:
+                source = f"orders o{hint} JOIN customers c ON c.id = o.customer_id"
             # total count
-            count_query = f"SELECT COUNT(*) as count FROM (" + base_query + ")"
-            cursor.execute(count_query, params)
-            total_count = cursor.fetchone()["count"]
+            total_count = _count(cursor, tables, where, params, hint)
             # ordering, limit, offset
-            base_query += " ORDER BY id LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-            cursor.execute(base_query, params)
-            rows = cursor.fetchall()
-            orders = [
-                {
-                    "id": row["id"],
-                    "order_number": row["order_number"],
-                    "customer_name": row["customer_name"],
-                    "order_date": row["order_date"],
-                    "status": row["status"],
-                    "total_amount": row["total_amount"],
-                    "payment_status": row["payment_status"],
-                }
-                for row in rows
-            ]
+            cursor.execute(
+                f"SELECT {columns} FROM {source}{where} ORDER BY o.id LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            )
+            orders = _order_rows(cursor, cursor.fetchall())
             return {
                 "items": orders,
                 "page": page,
                 "limit": limit,
                 "total": total_count,
             }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def get_order_stats():
-    """Return counts of orders grouped by status."""
+def _list_orders_sharded(filters: OrderFilter, page: int, limit: int, include_archived: bool):
+    offset = (page - 1) * limit
+
+    def keys_of(shard: int):
+        with get_db(shard) as conn:
+            _, _, tables = _read_source(conn, include_archived, shard)
+            cursor = conn.cursor()
+            criteria = _criteria(cursor, filters)
+            if criteria is None:
+                return 0, []
+            where, params = criteria.where()
+            hint = criteria.index_hint()
+            lists = []
+            for table in tables:
+                cursor.execute(
+                    f"SELECT o.id FROM {table} o{hint}{where} ORDER BY o.id LIMIT ?", [*params, offset + limit]
+                )
+                lists.append([tuple(row) for row in cursor.fetchall()])
+            return _count(cursor, tables, where, params, hint), lists
+
     try:
-        with get_db() as conn:
+        total_count, orders = _gather_page(keys_of, offset, limit, include_archived)
+        return {
+            "items": orders,
+            "page": page,
+            "limit": limit,
+            "total": total_count,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@coalesce
+def get_order_stats(include_archived: bool = False):
+    """Return counts of orders grouped by status, summed across shards."""
+
+    def stats_of(shard: int) -> Dict[str, int]:
+        with get_db(shard) as conn:
+            _, _, tables = _read_source(conn, include_archived, shard)
             cursor = conn.cursor()
-            cursor.execute(
-                "SELECT status, COUNT(*) AS count FROM orders GROUP BY status"
-            )
-            return {row["status"]: row["count"] for row in cursor.fetchall()}
+            stats: Dict[str, int] = {}
+            for table in tables:
+                cursor.execute(
+                    f"SELECT status_id, COUNT(*) AS count FROM {table} GROUP BY status_id"
+                )
+                for row in cursor.fetchall():
+                    name = order_statuses.name(cursor, row["status_id"])
+                    stats[name] = stats.get(name, 0) + row["count"]
+            return stats
+
+    try:
+        stats: Dict[str, int] = {}
+        for part in scatter(stats_of):
+            for name, count in part.items():
+                stats[name] = stats.get(name, 0) + count
+        return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def get_order(order_id: int):
+@coalesce
+def get_order(order_id: int, include_archived: bool = False):
     """Retrieve a single order by its ID."""
+    shard = shard_of(order_id)
+    try:
+        with get_db(shard) as conn:
+            columns, source, _ = _read_source(conn, include_archived, shard)
+            cursor = conn.cursor()
+            row = _select_order(cursor, order_id, columns, source)
+            if row is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            return _order_from_row(cursor, row)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def get_orders(selection: Selection):
+    """Retrieve the selected orders in ID order, with one query per shard."""
+    if not selection:
+        raise HTTPException(status_code=400, detail="order_ids must not be empty")
+
+    def fetch(shard: int) -> List[dict]:
+        with get_db(shard) as conn:
+            cursor = conn.cursor()
+            where, params = selection.for_shard(shard, SHARD_COUNT).where(cursor, "o.id")
+            cursor.execute(f"SELECT {ORDER_COLUMNS} FROM {ORDER_SOURCE} WHERE {where} ORDER BY o.id", params)
+            return [_order_from_row(cursor, row) for row in cursor.fetchall()]
+
+    try:
+        parts = scatter(fetch, selection.shards(SHARD_COUNT))
+        return list(heapq.merge(*parts, key=lambda order: order["id"]))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@coalesce
+def list_customer_orders(customer_id: int, page: int, limit: int, include_archived: bool = False):
+    """Fetch a customer's orders, newest first, via the (customer_id, order_day) index."""
+    offset = (page - 1) * limit
+
+    def keys_of(shard: int):
+        with get_db(shard) as conn:
+            _, _, tables = _read_source(conn, include_archived, shard)
+            cursor = conn.cursor()
+            lists = []
+            for table in tables:
+                cursor.execute(
+                    f"SELECT o.order_day, o.id FROM {table} o WHERE o.customer_id = ? "
+                    "ORDER BY o.order_day DESC, o.id DESC LIMIT ?",
+                    (customer_id, offset + limit),
+                )
+                lists.append([tuple(row) for row in cursor.fetchall()])
+            return _count(cursor, tables, " WHERE o.customer_id = ?", (customer_id,)), lists
+
     try:
         with get_db() as conn:
+            columns, source, tables = _read_source(conn, include_archived)
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT id, order_number, customer_name, order_date, status, total_amount, payment_status "
-                "FROM orders WHERE id = ?",
-                (order_id,),
+                "SELECT id, name, email, avatar, created_at, updated_at FROM customers WHERE id = ?",
+                (customer_id,),
             )
-            row = cursor.fetchone()
-            if row is None:
-                raise HTTPException(status_code=404, detail="Order not found")
+            customer = cursor.fetchone()
+            if customer is None:
+                raise HTTPException(status_code=404, detail="Customer not found")
+            if SHARD_COUNT > 1:
+                total_count, orders = _gather_page(keys_of, offset, limit, include_archived, reverse=True)
+            else:
+                total_count = _count(cursor, tables, " WHERE o.customer_id = ?", (customer_id,))
+                cursor.execute(
+                    f"SELECT {columns} FROM {source} WHERE o.customer_id = ? "
+                    "ORDER BY o.order_day DESC, o.id DESC LIMIT ? OFFSET ?",
+                    (customer_id, limit, offset),
+                )
+                orders = _order_rows(cursor, cursor.fetchall())
             return {
-                "id": row["id"],
-                "order_number": row["order_number"],
-                "customer_name": row["customer_name"],
-                "order_date": row["order_date"],
-                "status": row["status"],
-                "total_amount": row["total_amount"],
-                "payment_status": row["payment_status"],
+                "customer": dict(customer),
+                "items": orders,
+                "page": page,
+                "limit": limit,
+                "total": total_count,
             }
     except HTTPException:
         raise
@@ -94,32 +365,33 @@ def get_order(order_id: int):
 
 
 def create_order(order):
-    """Insert a new order and return it with its generated ID."""
+    """Insert a new order and return it with its generated ID (and number, if none was given)."""
+    order_day = date_to_day(order.order_date)
+    customer = payload_customer(order)
+    now = timestamp_now()
     try:
-        with get_db() as conn:
+        order_number = requested_order_number(order.order_number) or next_order_numbers(1)[0]
+        shard = shard_for_key(order_number)
+        with get_db(shard) as conn:
             cursor = conn.cursor()
+            customer_id = _customer_id(cursor, customer)
             cursor.execute(
-                "INSERT INTO orders (order_number, customer_name, order_date, status, total_amount, payment_status) "
-                "VALUES (?, ?, ?, ?, ?, ?)",
+                INSERT_ORDER,
                 (
-                    order.order_number,
-                    order.customer_name,
-                    order.order_date,
-                    order.status,
-                    order.total_amount,
-                    order.payment_status,
+                    *_order_id_params(shard),
+                    order_number,
+                    customer_id,
+                    order_day,
+                    order_statuses.code(cursor, order.status, create=True),
+                    to_cents(order.total_amount),
+                    payment_statuses.code(cursor, order.payment_status, create=True),
+                    now,
+                    now,
                 ),
             )
-            order_id = cursor.lastrowid
-            return {
-                "id": order_id,
-                "order_number": order.order_number,
-                "customer_name": order.customer_name,
-                "order_date": order.order_date,
-                "status": order.status,
-                "total_amount": order.total_amount,
-                "payment_status": order.payment_status,
-            }
+            return _order_from_row(cursor, _select_order(cursor, cursor.lastrowid))
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -131,50 +403,44 @@ def update_order(order_id: int, order):
     if order.order_number is not None:
         fields.append("order_number = ?")
         params.append(order.order_number)
-    if order.customer_name is not None:
-        fields.append("customer_name = ?")
-        params.append(order.customer_name)
     if order.order_date is not None:
-        fields.append("order_date = ?")
-        params.append(order.order_date)
-    if order.status is not None:
-        fields.append("status = ?")
-        params.append(order.status)
+        fields.append("order_day = ?")
+        params.append(date_to_day(order.order_date))
     if order.total_amount is not None:
-        fields.append("total_amount = ?")
-        params.append(order.total_amount)
-    if order.payment_status is not None:
-        fields.append("payment_status = ?")
-        params.append(order.payment_status)
-    if not fields:
+        fields.append("total_cents = ?")
+        params.append(to_cents(order.total_amount))
+    customer = payload_customer(order)
+    if not fields and customer is None and order.status is None and order.payment_status is None:
         raise HTTPException(status_code=400, detail="No fields provided for update")
     try:
-        with get_db() as conn:
+        with get_db(shard_of(order_id)) as conn:
             cursor = conn.cursor()
             # confirm existence
-            cursor.execute("SELECT id FROM orders WHERE id = ?", (order_id,))
-            if cursor.fetchone() is None:
+            cursor.execute("SELECT order_number FROM orders WHERE id = ?", (order_id,))
+            row = cursor.fetchone()
+            if row is None:
                 raise HTTPException(status_code=404, detail="Order not found")
+            if order.order_number is not None:
+                check_order_number(order.order_number, row["order_number"])
+            if customer is not None:
+                fields.append("customer_id = ?")
+                params.append(_customer_id(cursor, customer))
+            if order.status is not None:
+                fields.append("status_id = ?")
+                params.append(order_statuses.code(cursor, order.status, create=True))
+            if order.payment_status is not None:
+                fields.append("payment_status_id = ?")
+                params.append(payment_statuses.code(cursor, order.payment_status, create=True))
+            fields.append("updated_at = ?")
+            params.append(timestamp_now())
             query = f"UPDATE orders SET {', '.join(fields)} WHERE id = ?"
             params.append(order_id)
             cursor.execute(query, params)
-            cursor.execute(
-                "SELECT id, order_number, customer_name, order_date, status, total_amount, payment_status "
-                "FROM orders WHERE id = ?",
-                (order_id,),
-            )
-            row = cursor.fetchone()
-            return {
-                "id": row["id"],
-                "order_number": row["order_number"],
-                "customer_name": row["customer_name"],
-                "order_date": row["order_date"],
-                "status": row["status"],
-                "total_amount": row["total_amount"],
-                "payment_status": row["payment_status"],
-            }
+            return _order_from_row(cursor, _select_order(cursor, order_id))
     except HTTPException:
         raise
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -182,7 +448,7 @@ def update_order(order_id: int, order):
 def delete_order(order_id: int):
     """Remove a single order."""
     try:
-        with get_db() as conn:
+        with get_db(shard_of(order_id)) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id FROM orders WHERE id = ?", (order_id,))
             if cursor.fetchone() is None:
@@ -195,92 +461,96 @@ def delete_order(order_id: int):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def bulk_update_status(order_ids: List[int], status: str):
+def bulk_update_status(selection: Selection, status: str):
     """Set the same status on multiple orders."""
-    if not order_ids:
+    if not selection:
         raise HTTPException(status_code=400, detail="order_ids must not be empty")
-    try:
-        with get_db() as conn:
+    now = timestamp_now()
+
+    def update(shard: int) -> int:
+        with get_db(shard) as conn:
             cursor = conn.cursor()
-            placeholders = ",".join(["?"] * len(order_ids))
-            query = f"UPDATE orders SET status = ? WHERE id IN ({placeholders})"
-            params: List[object] = [status, *order_ids]
-            cursor.execute(query, params)
+            status_id = order_statuses.code(cursor, status, create=True)
+            where, params = selection.for_shard(shard, SHARD_COUNT).where(cursor)
+            cursor.execute(f"UPDATE orders SET status_id = ?, updated_at = ? WHERE {where}", [status_id, now, *params])
             return cursor.rowcount
+
+    try:
+        updated = sum(scatter(update, selection.shards(SHARD_COUNT)))
+        observe_bulk("update_status", selection.count(), updated)
+        return updated
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def bulk_duplicate(order_ids: List[int]):
+def bulk_duplicate(selection: Selection):
     """Duplicate the specified orders and return the new records."""
-    if not order_ids:
+    if not selection:
         raise HTTPException(status_code=400, detail="order_ids must not be empty")
-    try:
-        with get_db() as conn:
+    now = timestamp_now()
+
+    # Copies stay on the shard of their original, so each shard duplicates
+    # its share in a single local transaction. They get freshly generated
+    # order numbers.
+    def duplicate(shard: int) -> OrderRows:
+        with get_db(shard) as conn:
             cursor = conn.cursor()
-            placeholders = ",".join(["?"] * len(order_ids))
-            cursor.execute(
-                f"SELECT id, order_number, customer_name, order_date, status, total_amount, payment_status "
-                f"FROM orders WHERE id IN ({placeholders})",
-                order_ids,
-            )
+            where, params = selection.for_shard(shard, SHARD_COUNT).where(cursor, "o.id")
+            cursor.execute(f"SELECT {ORDER_COLUMNS} FROM {ORDER_SOURCE} WHERE {where} ORDER BY o.id", params)
             originals = cursor.fetchall()
-            if not originals:
-                raise HTTPException(status_code=404, detail="No orders found to duplicate")
-            new_orders = []
-            suffix_counter = 1
-            for row in originals:
-                base_number = row["order_number"]
-                new_number = f"{base_number}-COPY"
-                while True:
-                    cursor.execute(
-                        "SELECT 1 FROM orders WHERE order_number = ?",
-                        (new_number,),
-                    )
-                    if cursor.fetchone() is None:
-                        break
-                    suffix_counter += 1
-                    new_number = f"{base_number}-COPY{suffix_counter}"
+            # Loading a large selection into a temp table opened a read
+            # transaction; end it so the inserts below are not left on a
+            # snapshot older than the order number reservation.
+            conn.commit()
+            new_numbers = next_order_numbers(len(originals))
+            new_rows = []
+            for row, new_number in zip(originals, new_numbers):
                 cursor.execute(
-                    "INSERT INTO orders (order_number, customer_name, order_date, status, total_amount, payment_status) "
-                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    INSERT_ORDER,
                     (
+                        *_order_id_params(shard),
                         new_number,
-                        row["customer_name"],
-                        row["order_date"],
-                        row["status"],
-                        row["total_amount"],
-                        row["payment_status"],
+                        row["customer_id"],
+                        row["order_day"],
+                        row["status_id"],
+                        row["total_cents"],
+                        row["payment_status_id"],
+                        now,
+                        now,
                     ),
                 )
-                new_id = cursor.lastrowid
-                new_orders.append(
-                    {
-                        "id": new_id,
-                        "order_number": new_number,
-                        "customer_name": row["customer_name"],
-                        "order_date": row["order_date"],
-                        "status": row["status"],
-                        "total_amount": row["total_amount"],
-                        "payment_status": row["payment_status"],
-                    }
-                )
-            return new_orders
+                new_rows.append((cursor.lastrowid, new_number, *row[2:10], now, now))
+            return _order_rows(cursor, new_rows)
+
+    try:
+        parts = scatter(duplicate, selection.shards(SHARD_COUNT))
+        new_orders = OrderRows.merge(parts, [row for part in parts for row in part.rows])
+        if not new_orders:
+            raise HTTPException(status_code=404, detail="No orders found to duplicate")
+        observe_bulk("duplicate", selection.count(), len(new_orders))
+        return new_orders
     except HTTPException:
         raise
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def bulk_delete(order_ids: List[int]):
+def bulk_delete(selection: Selection):
     """Delete multiple orders by their IDs."""
-    if not order_ids:
+    if not selection:
         raise HTTPException(status_code=400, detail="order_ids must not be empty")
-    try:
-        with get_db() as conn:
+
+    def delete(shard: int) -> int:
+        with get_db(shard) as conn:
             cursor = conn.cursor()
-            placeholders = ",".join(["?"] * len(order_ids))
-            cursor.execute(f"DELETE FROM orders WHERE id IN ({placeholders})", order_ids)
-            return None
+            where, params = selection.for_shard(shard, SHARD_COUNT).where(cursor)
+            cursor.execute(f"DELETE FROM orders WHERE {where}", params)
+            return cursor.rowcount
+
+    try:
+        observe_bulk("delete", selection.count(), sum(scatter(delete, selection.shards(SHARD_COUNT))))
+        return None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,273 @@
+"""Response encodings for lists of orders.
+
+Order lists are carried from the storage layer to the response as raw rows
+(``OrderRows``) and only encoded once the representation is chosen from the
+request's ``Accept`` header:
+
+- ``application/json`` (the default): one object per order, as documented.
+- ``application/msgpack`` (or ``application/x-msgpack``): the same shape as
+  MessagePack.
+- ``application/vnd.orders.columnar+json`` and
+  ``application/vnd.orders.columnar+msgpack``: one array per column, with
+  ``status`` and ``payment_status`` dictionary-encoded. Column arrays are
+  transposed straight from the rows, so no per-order objects are built.
+
+MessagePack is written by the ``msgpack`` package when it is installed and
+by a small built-in encoder otherwise.
+"""
+
+import json
+import struct
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from app.profiling import phase
+
+from .storage import day_to_date, from_cents
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional, the built-in encoder is used
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR_JSON = "application/vnd.orders.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.orders.columnar+msgpack"
+
+# Positions of the order columns in a row, matching ``crud.ORDER_COLUMNS``
+ROW_FIELDS = (
+    "id", "order_number", "customer_id", "customer_name", "customer_email", "customer_avatar",
+    "order_day", "status_id", "total_cents", "payment_status_id", "created_at", "updated_at",
+)
+
+
+class OrderRows:
+    """Orders as rows in ``ROW_FIELDS`` order, with the names of their status codes.
+
+    ``rows`` may be ``sqlite3.Row`` objects straight from a cursor or plain
+    tuples; only positional access is used.
+    """
+
+    __slots__ = ("rows", "statuses", "payments")
+
+    def __init__(self, rows: Sequence, statuses: Dict[int, str], payments: Dict[int, str]) -> None:
+        self.rows = rows
+        self.statuses = statuses
+        self.payments = payments
+
+    @classmethod
+    def merge(cls, parts: List["OrderRows"], rows: Sequence) -> "OrderRows":
+        """``rows`` picked from ``parts``, with the status names of all of them."""
+        statuses: Dict[int, str] = {}
+        payments: Dict[int, str] = {}
+        for part in parts:
+            statuses.update(part.statuses)
+            payments.update(part.payments)
+        return cls(rows, statuses, payments)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.dicts())
+
+    def dicts(self) -> List[dict]:
+        """The orders in the row-oriented API shape."""
+        statuses, payments = self.statuses, self.payments
+        return [
+            {
+                "id": row[0],
+                "order_number": row[1],
+                "customer_name": row[3],
+                "customer": {"id": row[2], "name": row[3], "email": row[4], "avatar": row[5]},
+                "order_date": day_to_date(row[6]),
+                "status": statuses[row[7]],
+                "total_amount": from_cents(row[8]),
+                "payment_status": payments[row[9]],
+                "created_at": row[10],
+                "updated_at": row[11],
+            }
+            for row in self.rows
+        ]
+
+    def columns(self) -> dict:
+        """The orders as one array per column."""
+        columns = list(zip(*self.rows)) if self.rows else [()] * len(ROW_FIELDS)
+        return {
+            "count": len(self.rows),
+            "id": columns[0],
+            "order_number": columns[1],
+            "customer_id": columns[2],
+            "customer_name": columns[3],
+            "customer_email": columns[4],
+            "customer_avatar": columns[5],
+            "order_date": list(map(day_to_date, columns[6])),
+            "status": _dictionary(columns[7], self.statuses),
+            "total_amount": list(map(from_cents, columns[8])),
+            "payment_status": _dictionary(columns[9], self.payments),
+            "created_at": columns[10],
+            "updated_at": columns[11],
+        }
+
+
+def _dictionary(codes: Sequence[int], names: Dict[int, str]) -> dict:
+    """Dictionary-encode a column: distinct ``values`` and an index into them per row."""
+    distinct = sorted(set(codes))
+    index = {code: i for i, code in enumerate(distinct)}
+    return {"values": [names[code] for code in distinct], "codes": [index[code] for code in codes]}
+
+
+def _orders_of(columnar: bool, obj):
+    if isinstance(obj, OrderRows):
+        return obj.columns() if columnar else obj.dicts()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+# -- MessagePack ----------------------------------------------------------
+
+
+def _pack_int(value: int, out: bytearray) -> None:
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -0x20 <= value < 0:
+        out.append(value & 0xFF)
+    elif value >= 0:
+        if value <= 0xFF:
+            out += struct.pack(">BB", 0xCC, value)
+        elif value <= 0xFFFF:
+            out += struct.pack(">BH", 0xCD, value)
+        elif value <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, value)
+        else:
+            out += struct.pack(">BQ", 0xCF, value)
+    elif value >= -0x80:
+        out += struct.pack(">Bb", 0xD0, value)
+    elif value >= -0x8000:
+        out += struct.pack(">Bh", 0xD1, value)
+    elif value >= -0x80000000:
+        out += struct.pack(">Bi", 0xD2, value)
+    else:
+        out += struct.pack(">Bq", 0xD3, value)
+
+
+def _pack_header(length: int, out: bytearray, fix: int, fix_limit: int, codes: Tuple[int, int, int]) -> None:
+    if length < fix_limit:
+        out.append(fix | length)
+    elif codes[0] and length <= 0xFF:
+        out += struct.pack(">BB", codes[0], length)
+    elif length <= 0xFFFF:
+        out += struct.pack(">BH", codes[1], length)
+    else:
+        out += struct.pack(">BI", codes[2], length)
+
+
+def _pack(obj, out: bytearray, default: Callable) -> None:
+    kind = type(obj)
+    if obj is None:
+        out.append(0xC0)
+    elif kind is bool:
+        out.append(0xC3 if obj else 0xC2)
+    elif kind is int:
+        _pack_int(obj, out)
+    elif kind is float:
+        out += struct.pack(">Bd", 0xCB, obj)
+    elif kind is str:
+        data = obj.encode("utf-8")
+        _pack_header(len(data), out, 0xA0, 32, (0xD9, 0xDA, 0xDB))
+        out += data
+    elif kind is list or kind is tuple:
+        _pack_header(len(obj), out, 0x90, 16, (0, 0xDC, 0xDD))
+        for item in obj:
+            _pack(item, out, default)
+    elif kind is dict:
+        _pack_header(len(obj), out, 0x80, 16, (0, 0xDE, 0xDF))
+        for key, value in obj.items():
+            _pack(key, out, default)
+            _pack(value, out, default)
+    elif kind is bytes:
+        _pack_header(len(obj), out, 0, 0, (0xC4, 0xC5, 0xC6))
+        out += obj
+    else:
+        _pack(default(obj), out, default)
+
+
+def packb(obj, default: Callable) -> bytes:
+    """Encode ``obj`` as MessagePack, calling ``default`` for unknown types."""
+    if msgpack is not None:
+        return msgpack.packb(obj, default=default, use_bin_type=True)
+    out = bytearray()
+    _pack(obj, out, default)
+    return bytes(out)
+
+
+# -- negotiation ----------------------------------------------------------
+
+
+def _encode_json(content, columnar: bool) -> bytes:
+    # Same settings as Starlette's JSONResponse
+    return json.dumps(
+        content,
+        default=partial(_orders_of, columnar),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _encode_msgpack(content, columnar: bool) -> bytes:
+    return packb(content, partial(_orders_of, columnar))
+
+
+# Media type -> (encoder, columnar)
+ENCODINGS = {
+    JSON: (_encode_json, False),
+    MSGPACK: (_encode_msgpack, False),
+    "application/x-msgpack": (_encode_msgpack, False),
+    COLUMNAR_JSON: (_encode_json, True),
+    COLUMNAR_MSGPACK: (_encode_msgpack, True),
+}
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """The media type of ``ENCODINGS`` preferred by an ``Accept`` header.
+
+    Wildcards and a missing header select JSON; a header accepting none of
+    the encodings is rejected with 406.
+    """
+    if not accept:
+        return JSON
+    best, best_q = None, 0.0
+    for entry in accept.split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        media_type = media_type.lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        if media_type in ENCODINGS and q > best_q:
+            best, best_q = media_type, q
+    if best is None:
+        raise HTTPException(
+            status_code=406, detail=f"Not acceptable; available types: {', '.join(ENCODINGS)}"
+        )
+    return best
+
+
+def respond(content, accept: Optional[str]) -> Response:
+    """Encode ``content``, which may hold ``OrderRows``, as negotiated by ``accept``."""
+    media_type = negotiate(accept)
+    encode, columnar = ENCODINGS[media_type]
+    with phase("encode"):
+        body = encode(content, columnar)
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
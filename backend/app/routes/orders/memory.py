@@ -0,0 +1,649 @@
+"""In-memory order storage.
+
+Orders live in parallel column arrays, one slot per order in ID order, with
+secondary indexes held in dicts: live slots per status, slots per customer
+and the slot of every order number. Deleted orders leave a dead slot behind
+until the columns are compacted. Every operation of ``crud`` is provided
+with the same results and errors, without touching SQLite.
+
+The store can be restored from, and snapshotted back into, a migrated
+SQLite database. Snapshots write only the orders and customers changed
+since the previous one.
+"""
+
+import heapq
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from app.metrics import observe_bulk
+from app.sequences import FIRST_ORDER_NUMBER, format_order_number
+
+from .storage import (
+    check_order_number,
+    date_to_day,
+    day_to_date,
+    from_cents,
+    payload_customer,
+    requested_order_number,
+    timestamp_now,
+    to_cents,
+)
+from . import analytics
+from .encoding import OrderRows
+from .filters import OrderFilter
+from .selectors import Selection
+
+# Dead slots are compacted away once there are this many and they outnumber
+# live ones.
+COMPACT_MIN_DEAD = 10000
+
+_DUPLICATE_NUMBER = "Database error: UNIQUE constraint failed: orders.order_number"
+
+ORDER_FIELDS = (
+    "id, order_number, customer_id, order_day, status_id, total_cents, payment_status_id, created_at, updated_at"
+)
+CUSTOMER_FIELDS = "id, name, email, avatar, created_at, updated_at"
+
+
+class _Codes:
+    """Two-way mapping between status names and codes."""
+
+    def __init__(self, rows: Iterable[Tuple[int, str]]) -> None:
+        self.by_code: Dict[int, str] = dict(rows)
+        self.by_name: Dict[str, int] = {name: code for code, name in self.by_code.items()}
+
+    def code(self, name: str, create: bool = False) -> Optional[int]:
+        code = self.by_name.get(name)
+        if code is None and create:
+            code = max(self.by_code, default=0) + 1
+            self.by_code[code] = name
+            self.by_name[name] = code
+        return code
+
+
+class SlotIndex:
+    """Sorted set of slots, stored as a list of short sorted chunks.
+
+    Inserting or removing a slot only shifts one chunk, so indexes stay cheap
+    to maintain at millions of entries; a page is sliced out by skipping
+    whole chunks.
+    """
+
+    CHUNK = 1024
+
+    def __init__(self, slots: Iterable[int] = ()) -> None:
+        slots = array("q", slots)
+        self._chunks = [slots[i:i + self.CHUNK] for i in range(0, len(slots), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(slots)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def add(self, slot: int) -> None:
+        if not self._chunks:
+            self._chunks.append(array("q", [slot]))
+            self._maxes.append(slot)
+            self._len = 1
+            return
+        i = min(bisect_left(self._maxes, slot), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        if slot > chunk[-1]:
+            chunk.append(slot)
+        else:
+            position = bisect_left(chunk, slot)
+            if position < len(chunk) and chunk[position] == slot:
+                return
+            chunk.insert(position, slot)
+        self._maxes[i] = chunk[-1]
+        self._len += 1
+        if len(chunk) >= 2 * self.CHUNK:
+            self._chunks[i:i + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+            self._maxes[i:i + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+
+    def discard(self, slot: int) -> None:
+        i = bisect_left(self._maxes, slot)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        position = bisect_left(chunk, slot)
+        if chunk[position] != slot:
+            return
+        del chunk[position]
+        self._len -= 1
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+
+    def slice(self, start: int, stop: int) -> List[int]:
+        """Slots at positions ``start`` to ``stop`` in ascending order."""
+        found: List[int] = []
+        for chunk in self._chunks:
+            if start >= len(chunk):
+                start -= len(chunk)
+                stop -= len(chunk)
+                continue
+            found.extend(chunk[start:stop])
+            stop -= len(chunk)
+            start = 0
+            if stop <= 0:
+                break
+        return found
+
+
+class MemoryOrderStore:
+    """Orders and customers held in process memory."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop every order and customer and reset the lookup tables."""
+        with self._lock:
+            # Columns, indexed by slot
+            self._id = array("q")
+            self._customer = array("q")
+            self._day = array("q")
+            self._status = array("q")
+            self._cents = array("q")
+            self._payment = array("q")
+            self._number: List[Optional[str]] = []
+            self._created: List[str] = []
+            self._updated: List[str] = []
+            self._dead = 0
+
+            # Indexes
+            self._slot: Dict[int, int] = {}
+            self._by_number: Dict[str, int] = {}
+            self._live = SlotIndex()
+            self._by_status: Dict[int, SlotIndex] = {}
+            self._by_customer: Dict[int, Set[int]] = {}
+            self._next_id = 1
+            self._next_number = FIRST_ORDER_NUMBER
+
+            self._statuses = _Codes([(1, "Pending"), (2, "Completed"), (3, "Refunded")])
+            self._payments = _Codes([(1, "Paid"), (2, "Unpaid")])
+
+            # Customers: id -> (name, email, avatar, created_at, updated_at)
+            self._customers: Dict[int, tuple] = {}
+            self._customer_by_name: Dict[str, int] = {}
+            self._customer_by_email: Dict[Tuple[str, str], int] = {}
+            self._next_customer_id = 1
+
+            # Changes not yet written by snapshot()
+            self._dirty: Set[int] = set()
+            self._deleted: Set[int] = set()
+            self._dirty_customers: Set[int] = set()
+
+    # -- internals ---------------------------------------------------------
+
+    def _append(self, order_id: int, row: tuple) -> int:
+        number, customer_id, day, status_id, cents, payment_id, created_at, updated_at = row
+        slot = len(self._id)
+        self._id.append(order_id)
+        self._customer.append(customer_id)
+        self._day.append(day)
+        self._status.append(status_id)
+        self._cents.append(cents)
+        self._payment.append(payment_id)
+        self._number.append(number)
+        self._created.append(created_at)
+        self._updated.append(updated_at)
+        self._slot[order_id] = slot
+        self._by_number[number] = slot
+        self._live.add(slot)
+        self._by_status.setdefault(status_id, SlotIndex()).add(slot)
+        self._by_customer.setdefault(customer_id, set()).add(slot)
+        self._next_id = max(self._next_id, order_id + 1)
+        return slot
+
+    def _load(self, rows: List[tuple]) -> None:
+        """Fill an empty store with full order rows given in ascending ID order."""
+        if not rows:
+            return
+        ids, numbers, customers, days, statuses, cents, payments, created, updated = zip(*rows)
+        slots = range(len(rows))
+        self._id = array("q", ids)
+        self._customer = array("q", customers)
+        self._day = array("q", days)
+        self._status = array("q", statuses)
+        self._cents = array("q", cents)
+        self._payment = array("q", payments)
+        self._number = list(numbers)
+        self._created = list(created)
+        self._updated = list(updated)
+        self._slot = dict(zip(ids, slots))
+        self._by_number = dict(zip(numbers, slots))
+        self._live = SlotIndex(slots)
+        by_status: Dict[int, List[int]] = {}
+        for slot, status_id, customer_id in zip(slots, statuses, customers):
+            by_status.setdefault(status_id, []).append(slot)
+            self._by_customer.setdefault(customer_id, set()).add(slot)
+        self._by_status = {status_id: SlotIndex(status_slots) for status_id, status_slots in by_status.items()}
+        self._next_id = max(self._next_id, ids[-1] + 1)
+
+    def _add_customer(self, customer_id: int, row: tuple) -> None:
+        name, email = row[0], row[1]
+        self._customers[customer_id] = row
+        self._customer_by_name.setdefault(name, customer_id)
+        if email is not None:
+            self._customer_by_email.setdefault((name, email), customer_id)
+        self._next_customer_id = max(self._next_customer_id, customer_id + 1)
+
+    def _customer_id(self, customer) -> int:
+        """Return the ID of a matching customer, creating one if needed."""
+        if customer.email is None:
+            customer_id = self._customer_by_name.get(customer.name)
+        else:
+            customer_id = self._customer_by_email.get((customer.name, customer.email))
+        if customer_id is None:
+            customer_id = self._next_customer_id
+            now = timestamp_now()
+            self._add_customer(customer_id, (customer.name, customer.email, customer.avatar, now, now))
+            self._dirty_customers.add(customer_id)
+        return customer_id
+
+    def _new_numbers(self, count: int) -> List[str]:
+        numbers: List[str] = []
+        while len(numbers) < count:
+            number = format_order_number(self._next_number)
+            self._next_number += 1
+            if number not in self._by_number:
+                numbers.append(number)
+        return numbers
+
+    def _claim_number(self, number: str, slot: Optional[int] = None) -> None:
+        owner = self._by_number.get(number)
+        if owner is not None and owner != slot:
+            raise HTTPException(status_code=409, detail=_DUPLICATE_NUMBER)
+
+    def _order(self, slot: int) -> dict:
+        customer_id = self._customer[slot]
+        name, email, avatar = self._customers[customer_id][:3]
+        return {
+            "id": self._id[slot],
+            "order_number": self._number[slot],
+            "customer_name": name,
+            "customer": {"id": customer_id, "name": name, "email": email, "avatar": avatar},
+            "order_date": day_to_date(self._day[slot]),
+            "status": self._statuses.by_code[self._status[slot]],
+            "total_amount": from_cents(self._cents[slot]),
+            "payment_status": self._payments.by_code[self._payment[slot]],
+            "created_at": self._created[slot],
+            "updated_at": self._updated[slot],
+        }
+
+    def _rows(self, slots: Iterable[int]) -> OrderRows:
+        """The orders in ``slots`` as rows for encoding, in ``encoding.ROW_FIELDS`` order."""
+        customers = self._customers
+        rows = []
+        for slot in slots:
+            customer_id = self._customer[slot]
+            name, email, avatar = customers[customer_id][:3]
+            rows.append((
+                self._id[slot], self._number[slot], customer_id, name, email, avatar, self._day[slot],
+                self._status[slot], self._cents[slot], self._payment[slot], self._created[slot], self._updated[slot],
+            ))
+        return OrderRows(rows, dict(self._statuses.by_code), dict(self._payments.by_code))
+
+    def _row(self, slot: int) -> tuple:
+        return (
+            self._id[slot], self._number[slot], self._customer[slot], self._day[slot], self._status[slot],
+            self._cents[slot], self._payment[slot], self._created[slot], self._updated[slot],
+        )
+
+    def _set_status(self, slots: List[int], status_id: int, now: str) -> None:
+        index = self._by_status.setdefault(status_id, SlotIndex())
+        for slot in slots:
+            old = self._status[slot]
+            if old != status_id:
+                self._by_status[old].discard(slot)
+                index.add(slot)
+                self._status[slot] = status_id
+            self._updated[slot] = now
+            self._dirty.add(self._id[slot])
+
+    def _delete(self, slots: List[int]) -> None:
+        for slot in slots:
+            order_id = self._id[slot]
+            self._live.discard(slot)
+            self._by_status[self._status[slot]].discard(slot)
+            self._by_customer[self._customer[slot]].discard(slot)
+            del self._by_number[self._number[slot]]
+            del self._slot[order_id]
+            self._number[slot] = None
+            self._dirty.discard(order_id)
+            self._deleted.add(order_id)
+        self._dead += len(slots)
+        if self._dead >= COMPACT_MIN_DEAD and self._dead > len(self._live):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the columns without dead slots and rebuild the indexes."""
+        rows = [self._row(slot) for slot in self._live]
+        customers, statuses, payments = self._customers, self._statuses, self._payments
+        by_name, by_email, next_customer = self._customer_by_name, self._customer_by_email, self._next_customer_id
+        dirty, deleted, dirty_customers, next_id = self._dirty, self._deleted, self._dirty_customers, self._next_id
+        self.clear()
+        self._customers, self._statuses, self._payments = customers, statuses, payments
+        self._customer_by_name, self._customer_by_email, self._next_customer_id = by_name, by_email, next_customer
+        self._load(rows)
+        self._dirty, self._deleted, self._dirty_customers = dirty, deleted, dirty_customers
+        self._next_id = next_id
+
+    def _page(self, slots: SlotIndex, page: int, limit: int) -> OrderRows:
+        offset = (page - 1) * limit
+        return self._rows(slots.slice(offset, offset + limit))
+
+    # -- order operations --------------------------------------------------
+
+    def list_orders(self, filters: OrderFilter, page: int, limit: int, include_archived: bool = False):
+        """Fetch a paginated list of orders matching a status or tab and ranges.
+
+        There is no archive in memory, so ``include_archived`` has no effect.
+        """
+        with self._lock:
+            criteria = filters.resolve(self._statuses.by_name.get, self._payments.by_name.get)
+            if criteria is None:
+                return {"items": self._rows(()), "page": page, "limit": limit, "total": 0}
+            if criteria.statuses is None:
+                indexes = [self._live]
+            else:
+                indexes = [self._by_status[code] for code in criteria.statuses if code in self._by_status]
+            if len(indexes) == 1 and not criteria.has_ranges():
+                return {"items": self._page(indexes[0], page, limit), "page": page, "limit": limit,
+                        "total": len(indexes[0])}
+
+            # Walk the candidates in slot (ID) order, keeping only the page
+            slots: Iterable[int] = heapq.merge(*indexes)
+            if criteria.has_ranges():
+                day, cents, payment = self._day, self._cents, self._payment
+                slots = (slot for slot in slots if criteria.matches(day[slot], cents[slot], payment[slot]))
+            offset = (page - 1) * limit
+            total = 0
+            page_slots = []
+            for slot in slots:
+                if offset <= total < offset + limit:
+                    page_slots.append(slot)
+                total += 1
+            return {"items": self._rows(page_slots), "page": page, "limit": limit, "total": total}
+
+    def get_order_stats(self, include_archived: bool = False):
+        """Return counts of orders grouped by status."""
+        with self._lock:
+            return {
+                self._statuses.by_code[status_id]: len(slots)
+                for status_id, slots in sorted(self._by_status.items())
+                if slots
+            }
+
+    def get_order_analytics(
+        self, include_archived: bool, quantiles: Tuple[float, ...], buckets: int, top_customers: int
+    ):
+        """Amount statistics by status and payment status, and the top customers by total."""
+        with self._lock:
+            if self._dead:
+                live = list(self._live)
+                columns = analytics.OrderColumns(*(
+                    array("q", map(column.__getitem__, live))
+                    for column in (self._id, self._customer, self._status, self._payment, self._cents)
+                ))
+            else:
+                columns = analytics.OrderColumns(
+                    array("q", self._id), array("q", self._customer), array("q", self._status),
+                    array("q", self._payment), array("q", self._cents),
+                )
+            statuses, payments = dict(self._statuses.by_code), dict(self._payments.by_code)
+        summary = analytics.summarize(columns, quantiles, buckets, top_customers)
+        with self._lock:
+            names = {
+                customer_id: self._customers[customer_id][0]
+                for customer_id, _, _ in summary["top_customers"]
+                if customer_id in self._customers
+            }
+        return analytics.render(summary, quantiles, statuses.__getitem__, payments.__getitem__, names)
+
+    def get_order(self, order_id: int, include_archived: bool = False):
+        """Retrieve a single order by its ID."""
+        with self._lock:
+            slot = self._slot.get(order_id)
+            if slot is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            return self._order(slot)
+
+    def get_orders(self, selection: Selection):
+        """Retrieve the selected orders in ID order."""
+        with self._lock:
+            return [self._order(slot) for slot in self._slots_of(selection)]
+
+    def list_customer_orders(self, customer_id: int, page: int, limit: int, include_archived: bool = False):
+        """Fetch a customer's orders, newest first."""
+        with self._lock:
+            customer = self._customers.get(customer_id)
+            if customer is None:
+                raise HTTPException(status_code=404, detail="Customer not found")
+            day = self._day
+            slots = sorted(self._by_customer.get(customer_id, ()), key=lambda slot: (day[slot], slot), reverse=True)
+            offset = (page - 1) * limit
+            name, email, avatar, created_at, updated_at = customer
+            return {
+                "customer": {
+                    "id": customer_id, "name": name, "email": email, "avatar": avatar,
+                    "created_at": created_at, "updated_at": updated_at,
+                },
+                "items": self._rows(slots[offset:offset + limit]),
+                "page": page,
+                "limit": limit,
+                "total": len(slots),
+            }
+
+    def create_order(self, order):
+        """Insert a new order and return it with its generated ID (and number, if none was given)."""
+        order_day = date_to_day(order.order_date)
+        now = timestamp_now()
+        with self._lock:
+            order_number = requested_order_number(order.order_number) or self._new_numbers(1)[0]
+            self._claim_number(order_number)
+            order_id = self._next_id
+            slot = self._append(order_id, (
+                order_number,
+                self._customer_id(payload_customer(order)),
+                order_day,
+                self._statuses.code(order.status, create=True),
+                to_cents(order.total_amount),
+                self._payments.code(order.payment_status, create=True),
+                now,
+                now,
+            ))
+            self._dirty.add(order_id)
+            return self._order(slot)
+
+    def update_order(self, order_id: int, order):
+        """Update an order given its ID and return the updated record."""
+        order_day = date_to_day(order.order_date) if order.order_date is not None else None
+        customer = payload_customer(order)
+        if (order.order_number is None and order_day is None and order.total_amount is None
+                and customer is None and order.status is None and order.payment_status is None):
+            raise HTTPException(status_code=400, detail="No fields provided for update")
+        with self._lock:
+            slot = self._slot.get(order_id)
+            if slot is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            now = timestamp_now()
+            if order.order_number is not None:
+                check_order_number(order.order_number, self._number[slot])
+                self._claim_number(order.order_number, slot)
+                del self._by_number[self._number[slot]]
+                self._number[slot] = order.order_number
+                self._by_number[order.order_number] = slot
+            if order_day is not None:
+                self._day[slot] = order_day
+            if order.total_amount is not None:
+                self._cents[slot] = to_cents(order.total_amount)
+            if customer is not None:
+                customer_id = self._customer_id(customer)
+                self._by_customer[self._customer[slot]].discard(slot)
+                self._by_customer.setdefault(customer_id, set()).add(slot)
+                self._customer[slot] = customer_id
+            if order.payment_status is not None:
+                self._payment[slot] = self._payments.code(order.payment_status, create=True)
+            if order.status is not None:
+                self._set_status([slot], self._statuses.code(order.status, create=True), now)
+            self._updated[slot] = now
+            self._dirty.add(order_id)
+            return self._order(slot)
+
+    def delete_order(self, order_id: int):
+        """Remove a single order."""
+        with self._lock:
+            slot = self._slot.get(order_id)
+            if slot is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            self._delete([slot])
+            return None
+
+    def _slots_of(self, selection: Selection) -> List[int]:
+        if not selection:
+            raise HTTPException(status_code=400, detail="order_ids must not be empty")
+        ids, slot_of = self._id, self._slot
+        slots = {slot_of[i] for i in selection.ids if i in slot_of}
+        # Slots are in ascending ID order, so a range is a contiguous run of slots
+        for lo, hi in selection.ranges:
+            for slot in range(bisect_left(ids, lo), bisect_right(ids, hi)):
+                if slot_of.get(ids[slot]) == slot:
+                    slots.add(slot)
+        slots.difference_update(slot_of[i] for i in selection.exclude if i in slot_of)
+        return sorted(slots)
+
+    def bulk_update_status(self, selection: Selection, status: str):
+        """Set the same status on multiple orders."""
+        with self._lock:
+            slots = self._slots_of(selection)
+            self._set_status(slots, self._statuses.code(status, create=True), timestamp_now())
+        observe_bulk("update_status", selection.count(), len(slots))
+        return len(slots)
+
+    def bulk_duplicate(self, selection: Selection):
+        """Duplicate the specified orders and return the new records."""
+        with self._lock:
+            slots = self._slots_of(selection)
+            if not slots:
+                raise HTTPException(status_code=404, detail="No orders found to duplicate")
+            now = timestamp_now()
+            new_slots = []
+            for slot, new_number in zip(slots, self._new_numbers(len(slots))):
+                order_id = self._next_id
+                new_slots.append(self._append(order_id, (new_number, *self._row(slot)[2:7], now, now)))
+                self._dirty.add(order_id)
+            new_orders = self._rows(new_slots)
+        observe_bulk("duplicate", selection.count(), len(new_orders))
+        return new_orders
+
+    def bulk_delete(self, selection: Selection):
+        """Delete multiple orders by their IDs."""
+        with self._lock:
+            slots = self._slots_of(selection)
+            self._delete(slots)
+        observe_bulk("delete", selection.count(), len(slots))
+        return None
+
+    # -- persistence -------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def restore(self, path: str) -> int:
+        """Replace the contents with the orders and customers of a SQLite database.
+
+        Returns the number of orders loaded.
+        """
+        conn = sqlite3.connect(path)
+        try:
+            statuses = conn.execute("SELECT id, name FROM order_statuses").fetchall()
+            payments = conn.execute("SELECT id, name FROM payment_statuses").fetchall()
+            customers = conn.execute(f"SELECT {CUSTOMER_FIELDS} FROM customers").fetchall()
+            orders = conn.execute(f"SELECT {ORDER_FIELDS} FROM orders ORDER BY id").fetchall()
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'").fetchone()
+            number = conn.execute("SELECT next_value FROM _sequences WHERE name = 'order_number'").fetchone()
+            with self._lock:
+                self.clear()
+                self._statuses = _Codes(statuses)
+                self._payments = _Codes(payments)
+                for customer in customers:
+                    self._add_customer(customer[0], customer[1:])
+                self._load(orders)
+                if row is not None:
+                    self._next_id = max(self._next_id, row[0] + 1)
+                if number is not None:
+                    self._next_number = number[0]
+                return len(self._live)
+        finally:
+            conn.close()
+
+    def snapshot(self, path: str, full: bool = False) -> int:
+        """Write changes since the last snapshot into a migrated SQLite database.
+
+        With ``full`` every order and customer is rewritten, replacing the
+        tables' previous contents. Returns the number of orders written. On
+        failure the changes stay pending for the next snapshot.
+        """
+        with self._lock:
+            if full:
+                order_ids = list(self._slot)
+                customer_ids = list(self._customers)
+            else:
+                order_ids = list(self._dirty)
+                customer_ids = list(self._dirty_customers)
+            deleted = list(self._deleted)
+            orders = [self._row(self._slot[i]) for i in order_ids]
+            customers = [(i, *self._customers[i]) for i in customer_ids]
+            statuses = list(self._statuses.by_code.items())
+            payments = list(self._payments.by_code.items())
+            sequence = self._next_id - 1
+            next_number = self._next_number
+            self._dirty, self._deleted, self._dirty_customers = set(), set(), set()
+
+        conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if full:
+                conn.execute("DELETE FROM orders")
+                conn.execute("DELETE FROM customers")
+            else:
+                conn.executemany("DELETE FROM orders WHERE id = ?", [(i,) for i in deleted])
+            conn.executemany("INSERT OR IGNORE INTO order_statuses (id, name) VALUES (?, ?)", statuses)
+            conn.executemany("INSERT OR IGNORE INTO payment_statuses (id, name) VALUES (?, ?)", payments)
+            conn.executemany(f"INSERT OR REPLACE INTO customers ({CUSTOMER_FIELDS}) VALUES (?, ?, ?, ?, ?, ?)", customers)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO orders ({ORDER_FIELDS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", orders
+            )
+            conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'orders'", (sequence,)
+            )
+            conn.execute(
+                "UPDATE _sequences SET next_value = MAX(next_value, ?) WHERE name = 'order_number'", (next_number,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self._lock:
+                self._dirty.update(i for i in order_ids if i in self._slot)
+                self._deleted.update(i for i in deleted if i not in self._slot)
+                self._dirty_customers.update(customer_ids)
+            raise
+        finally:
+            conn.close()
+        return len(orders)
@@ -2,29 +2,51 @@
 
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from .selectors import IdSelection
+
+
+class Customer(BaseModel):
+    """Customer details supplied with an order."""
+
+    name: str = Field(..., description="Name of the customer")
+    email: Optional[str] = Field(None, description="Contact email")
+    avatar: Optional[str] = Field(None, description="Avatar image URL")
 
 
 class OrderBase(BaseModel):
     """Shared fields for an order."""
 
-    order_number: str = Field(..., description="Order identifier (e.g. #ORD1001)")
-    customer_name: str = Field(..., description="Name of the customer")
+    order_number: str = Field(..., description="Order identifier; generated ones look like #ORD1001")
+    customer_name: Optional[str] = Field(None, description="Name of the customer (shorthand for customer.name)")
+    customer: Optional[Customer] = Field(None, description="Customer details")
     order_date: str = Field(..., description="Date of the order in YYYY-MM-DD format")
     status: str = Field(..., description="Current status (Pending, Completed, Refunded)")
     total_amount: float = Field(..., description="Total price")
     payment_status: str = Field(..., description="Payment state (Paid, Unpaid)")
 
+    @model_validator(mode="after")
+    def require_customer(self):
+        if self.customer is None and self.customer_name is None:
+            raise ValueError("customer or customer_name is required")
+        return self
+
 
 class OrderCreate(OrderBase):
     """Schema for creating a new order."""
 
+    order_number: Optional[str] = Field(
+        None, description="Custom order identifier; generated when omitted or of the generated #ORD<digits> form"
+    )
+
 
 class OrderUpdate(BaseModel):
     """Schema for updating an existing order. All fields are optional."""
 
-    order_number: Optional[str] = Field(None)
+    order_number: Optional[str] = Field(None, description="Custom order identifier; #ORD<digits> is reserved")
     customer_name: Optional[str] = Field(None)
+    customer: Optional[Customer] = Field(None)
     order_date: Optional[str] = Field(None)
     status: Optional[str] = Field(None)
     total_amount: Optional[float] = Field(None)
@@ -37,14 +59,20 @@ class OrderResponse(OrderBase):
     id: int
 
 
-class BulkStatusUpdate(BaseModel):
+class OrderSelection(IdSelection):
+    """Orders a bulk operation applies to; ranges and bitmaps select large
+    contiguous sets without listing every ID."""
+
+    ids_field = "order_ids"
+
+    order_ids: Optional[List[int]] = Field(None, description="IDs to operate on")
+
+
+class BulkStatusUpdate(OrderSelection):
     """Request body for bulk status update."""
 
-    order_ids: List[int] = Field(..., description="IDs to update")
     status: str = Field(..., description="New status")
 
 
-class BulkIds(BaseModel):
-    """Request body for operations that only need a list of IDs."""
-
-    order_ids: List[int] = Field(..., description="IDs to operate on")
+class BulkIds(OrderSelection):
+    """Request body for operations that only need a selection of IDs."""
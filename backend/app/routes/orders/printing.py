@@ -0,0 +1,202 @@
+"""Printable documents for a selection of orders.
+
+Orders are rendered to HTML, one page per order, with ``string.Template``
+templates compiled once when the module is imported. Output is streamed
+in chunks of ``PRINT_CHUNK_SIZE`` orders. Jobs of more than
+``PRINT_POOL_THRESHOLD`` orders are rendered in a process pool of
+``PRINT_WORKERS`` processes, whose results the response awaits on the event
+loop, so large jobs tie up neither the loop nor a threadpool thread.
+
+PDF output pipes the HTML through a local renderer (``wkhtmltopdf`` or
+``weasyprint``, or the command in ``PRINT_PDF_RENDERER``) when one is
+installed.
+"""
+
+import asyncio
+import functools
+import html
+import logging
+import os
+import shlex
+import shutil
+import tempfile
+from string import Template
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, List, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - imported by _get_pool when first needed
+    from concurrent.futures import ProcessPoolExecutor
+
+PRINT_CHUNK_SIZE = int(os.getenv("PRINT_CHUNK_SIZE", "100"))
+PRINT_POOL_THRESHOLD = int(os.getenv("PRINT_POOL_THRESHOLD", "5000"))
+PRINT_WORKERS = int(os.getenv("PRINT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PRINT_PDF_RENDERER = os.getenv("PRINT_PDF_RENDERER", "")
+
+# Renderers tried in order, as commands reading HTML from a file and writing
+# PDF to stdout ("{input}" is replaced by the file's path)
+PDF_RENDERERS = (
+    ("wkhtmltopdf", "wkhtmltopdf --quiet --print-media-type {input} -"),
+    ("weasyprint", "weasyprint {input} -"),
+)
+
+DOCUMENT_HEAD = Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+  body { font-family: Helvetica, Arial, sans-serif; font-size: 11pt; color: #111; margin: 0; }
+  .order { padding: 16mm; page-break-after: always; break-after: page; }
+  .order:last-child { page-break-after: auto; break-after: auto; }
+  h1 { font-size: 18pt; margin: 0 0 4mm; }
+  .meta { color: #555; margin-bottom: 8mm; }
+  table { border-collapse: collapse; width: 100%; }
+  th, td { text-align: left; padding: 2mm 0; border-bottom: 1px solid #ddd; }
+  th { width: 35%; font-weight: normal; color: #555; }
+  .total td { font-size: 14pt; font-weight: bold; border-bottom: none; }
+  @page { size: A4; margin: 0; }
+</style>
+</head>
+<body>
+""")
+
+ORDER = Template("""<section class="order">
+<h1>Order $order_number</h1>
+<div class="meta">Placed $order_date &middot; $status</div>
+<table>
+<tr><th>Customer</th><td>$customer_name</td></tr>
+<tr><th>Email</th><td>$customer_email</td></tr>
+<tr><th>Payment</th><td>$payment_status</td></tr>
+<tr class="total"><th>Total</th><td>$total_amount</td></tr>
+</table>
+</section>
+""")
+
+DOCUMENT_TAIL = "</body>\n</html>\n"
+
+_pool: Optional["ProcessPoolExecutor"] = None
+
+logger = logging.getLogger(__name__)
+
+
+def render_orders(orders: List[dict]) -> str:
+    """HTML of the pages of ``orders``; runs in pool processes too."""
+    substitute = ORDER.substitute
+    escape = html.escape
+    return "".join(
+        substitute(
+            order_number=escape(order["order_number"]),
+            order_date=escape(order["order_date"]),
+            status=escape(order["status"]),
+            customer_name=escape(order["customer_name"]),
+            customer_email=escape(order["customer"]["email"] or ""),
+            payment_status=escape(order["payment_status"]),
+            total_amount=f"{order['total_amount']:,.2f}",
+        )
+        for order in orders
+    )
+
+
+def _head(count: int) -> str:
+    return DOCUMENT_HEAD.substitute(title=f"{count} order{'s' if count != 1 else ''}")
+
+
+def _chunks(orders: List[dict]) -> Iterator[List[dict]]:
+    for start in range(0, len(orders), PRINT_CHUNK_SIZE):
+        yield orders[start:start + PRINT_CHUNK_SIZE]
+
+
+def _get_pool() -> "ProcessPoolExecutor":
+    global _pool
+    if _pool is None:
+        # Imported here, as most workers never render a job this large
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+
+        # Spawned rather than forked: the API process runs threads
+        _pool = ProcessPoolExecutor(max_workers=PRINT_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown() -> None:
+    """Stop the rendering processes, if any were started."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _render_inline(orders: List[dict]) -> Iterator[bytes]:
+    yield _head(len(orders)).encode()
+    for chunk in _chunks(orders):
+        yield render_orders(chunk).encode()
+    yield DOCUMENT_TAIL.encode()
+
+
+async def _render_pooled(orders: List[dict]) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    # Keep every worker busy while bounding the chunks held in memory
+    window = PRINT_WORKERS * 2
+    pending: List[asyncio.Future] = []
+    chunks = _chunks(orders)
+    try:
+        yield _head(len(orders)).encode()
+        for chunk in chunks:
+            pending.append(loop.run_in_executor(pool, render_orders, chunk))
+            if len(pending) >= window:
+                yield (await pending.pop(0)).encode()
+        while pending:
+            yield (await pending.pop(0)).encode()
+        yield DOCUMENT_TAIL.encode()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def render_html(orders: List[dict]):
+    """Stream the HTML document of ``orders``, in a process pool for large jobs."""
+    if len(orders) > PRINT_POOL_THRESHOLD and PRINT_WORKERS > 0:
+        return _render_pooled(orders)
+    return _render_inline(orders)
+
+
+@functools.lru_cache(maxsize=None)
+def pdf_renderer() -> Optional[str]:
+    """Command line of the PDF renderer, or None when none is installed."""
+    if PRINT_PDF_RENDERER:
+        return PRINT_PDF_RENDERER
+    for binary, command in PDF_RENDERERS:
+        if shutil.which(binary):
+            return command
+    return None
+
+
+async def render_pdf(orders: List[dict]) -> AsyncIterator[bytes]:
+    """Stream the PDF of ``orders``, converted from their HTML by ``pdf_renderer()``."""
+    with tempfile.NamedTemporaryFile("wb", suffix=".html", delete=False) as f:
+        html_path = f.name
+        document = render_html(orders)
+        if hasattr(document, "__aiter__"):
+            async for part in document:
+                f.write(part)
+        else:
+            await asyncio.to_thread(f.writelines, document)
+    try:
+        args = [arg.replace("{input}", html_path) for arg in shlex.split(pdf_renderer())]
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            while True:
+                block = await process.stdout.read(64 * 1024)
+                if not block:
+                    break
+                yield block
+            if await process.wait():
+                logger.warning("PDF renderer %r exited with status %d", args[0], process.returncode)
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+    finally:
+        os.remove(html_path)
@@ -0,0 +1,175 @@
+"""Storage engines behind the order endpoints.
+
+``STORAGE_ENGINE`` picks where orders live: ``sqlite`` (the default) runs
+the queries in ``crud``; ``memory`` keeps every order in process memory
+(see ``memory``), restored from ``MEMORY_SNAPSHOT_PATH`` at startup and
+written back to it every ``MEMORY_SNAPSHOT_SECONDS`` and at shutdown.
+Both engines expose the same operations with the same results and errors.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Optional, Protocol, Tuple
+
+from app import database
+
+from . import analytics, crud
+from .filters import OrderFilter
+from .memory import MemoryOrderStore
+from .selectors import Selection
+
+STORAGE_ENGINE = os.getenv("STORAGE_ENGINE", "sqlite")
+
+# Defaults to DATABASE_PATH; "off" keeps the memory engine purely ephemeral.
+MEMORY_SNAPSHOT_PATH = os.getenv("MEMORY_SNAPSHOT_PATH", "")
+MEMORY_SNAPSHOT_SECONDS = float(os.getenv("MEMORY_SNAPSHOT_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class OrderRepository(Protocol):
+    """Operations every storage engine provides.
+
+    Lists of orders (``items`` of the list operations, and the result of
+    ``bulk_duplicate``) are returned as ``encoding.OrderRows``.
+    """
+
+    def list_orders(self, filters: OrderFilter, page: int, limit: int, include_archived: bool = False): ...
+
+    def get_order_stats(self, include_archived: bool = False): ...
+
+    def get_order_analytics(
+        self, include_archived: bool, quantiles: Tuple[float, ...], buckets: int, top_customers: int
+    ): ...
+
+    def get_order(self, order_id: int, include_archived: bool = False): ...
+
+    def get_orders(self, selection: Selection): ...
+
+    def list_customer_orders(self, customer_id: int, page: int, limit: int, include_archived: bool = False): ...
+
+    def create_order(self, order): ...
+
+    def update_order(self, order_id: int, order): ...
+
+    def delete_order(self, order_id: int): ...
+
+    def bulk_update_status(self, selection: Selection, status: str): ...
+
+    def bulk_duplicate(self, selection: Selection): ...
+
+    def bulk_delete(self, selection: Selection): ...
+
+    def start(self) -> None: ...
+
+    def stop(self) -> None: ...
+
+
+class SQLiteOrderRepository:
+    """Orders stored in the SQLite database files."""
+
+    list_orders = staticmethod(crud.list_orders)
+    get_order_stats = staticmethod(crud.get_order_stats)
+    get_order_analytics = staticmethod(analytics.get_order_analytics)
+    get_order = staticmethod(crud.get_order)
+    get_orders = staticmethod(crud.get_orders)
+    list_customer_orders = staticmethod(crud.list_customer_orders)
+    create_order = staticmethod(crud.create_order)
+    update_order = staticmethod(crud.update_order)
+    delete_order = staticmethod(crud.delete_order)
+    bulk_update_status = staticmethod(crud.bulk_update_status)
+    bulk_duplicate = staticmethod(crud.bulk_duplicate)
+    bulk_delete = staticmethod(crud.bulk_delete)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        analytics.snapshot.close()
+
+
+class MemoryOrderRepository(MemoryOrderStore):
+    """Orders stored in memory with periodic snapshots to SQLite."""
+
+    def __init__(self, snapshot_path: str = MEMORY_SNAPSHOT_PATH, interval: float = MEMORY_SNAPSHOT_SECONDS) -> None:
+        super().__init__()
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _path(self) -> Optional[str]:
+        if self.snapshot_path == "off":
+            return None
+        # Resolved late so tests and benchmarks can repoint DATABASE_PATH.
+        return self.snapshot_path or database.DATABASE_PATH
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.snapshot(self._path())
+            except Exception:
+                logger.exception("Snapshot of in-memory orders failed")
+
+    def start(self) -> None:
+        """Restore the last snapshot and start snapshotting periodically."""
+        if database.SHARD_COUNT > 1:
+            raise RuntimeError("STORAGE_ENGINE=memory does not support SHARD_COUNT > 1")
+        # Each worker would hold its own diverging copy and overwrite the
+        # others' snapshots. serve.py exports its worker count here.
+        if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            raise RuntimeError("STORAGE_ENGINE=memory does not support WEB_CONCURRENCY > 1")
+        path = self._path()
+        if path is None:
+            return
+        # Snapshots go into the tables of a migrated database; anywhere else
+        # every periodic snapshot would fail
+        if not os.path.exists(path):
+            raise RuntimeError(
+                f"Memory snapshot database {path} does not exist; run migrate.py or set MEMORY_SNAPSHOT_PATH=off"
+            )
+        try:
+            count = self.restore(path)
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"Memory snapshot database {path} is not migrated ({e}); run migrate.py") from e
+        logger.info("Restored %d orders from %s", count, path)
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the snapshot thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        path = self._path()
+        if path is not None and os.path.exists(path):
+            self.snapshot(path)
+
+
+def create_repository(engine: str) -> OrderRepository:
+    """Build the repository for a ``STORAGE_ENGINE`` value."""
+    if engine == "sqlite":
+        return SQLiteOrderRepository()
+    if engine == "memory":
+        return MemoryOrderRepository()
+    raise ValueError(f"Unknown STORAGE_ENGINE: {engine!r} (expected 'sqlite' or 'memory')")
+
+
+_repository: OrderRepository = create_repository(STORAGE_ENGINE)
+
+
+def get_repository() -> OrderRepository:
+    """The repository serving the order endpoints."""
+    return _repository
+
+
+def set_repository(repository: OrderRepository) -> OrderRepository:
+    """Replace the active repository, e.g. to benchmark another engine."""
+    global _repository
+    _repository = repository
+    return repository
@@ -2,9 +2,11 @@
 
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
-from . import crud
+from . import analytics, encoding, printing
+from .filters import OrderFilter
 from .models import (
     BulkIds,
     BulkStatusUpdate,
@@ -12,67 +14,119 @@ from .models import (
     OrderResponse,
     OrderUpdate,
 )
+from .repository import get_repository
+from .selectors import Selection
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
 @router.get("", response_model=None)
 def list_orders(
-    status: Optional[str] = Query(None, description="Filter by status"),
+    status: Optional[str] = Query(
+        None, description="Status name, or tab: all, incomplete, overdue, ongoing, finished"
+    ),
+    date_from: Optional[str] = Query(None, description="Earliest order date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Latest order date (YYYY-MM-DD)"),
+    min_amount: Optional[float] = Query(None, description="Lowest total amount"),
+    max_amount: Optional[float] = Query(None, description="Highest total amount"),
+    payment_status: Optional[str] = Query(None, description="Filter by payment status"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(10, ge=1, le=100, description="Items per page"),
+    include_archived: bool = Query(False, description="Also return archived orders"),
+    accept: Optional[str] = Header(None),
 ):
-    """List orders with optional status filter and pagination."""
-    return crud.list_orders(status, page, limit)
+    """List orders with optional status or tab filter, range filters and pagination."""
+    filters = OrderFilter(status, date_from, date_to, min_amount, max_amount, payment_status)
+    return encoding.respond(get_repository().list_orders(filters, page, limit, include_archived), accept)
 
 
 @router.get("/stats", response_model=None)
-def get_order_stats():
+def get_order_stats(
+    include_archived: bool = Query(False, description="Also count archived orders"),
+):
     """Return counts of orders grouped by status."""
-    return crud.get_order_stats()
+    return get_repository().get_order_stats(include_archived)
+
+
+@router.get("/analytics", response_model=None)
+def get_order_analytics(
+    quantiles: str = Query(
+        ",".join(map(str, analytics.DEFAULT_QUANTILES)), description="Comma-separated quantiles of total_amount"
+    ),
+    buckets: int = Query(20, ge=1, le=1000, description="Histogram buckets"),
+    top_customers: int = Query(10, ge=0, le=1000, description="Customers ranked by total amount"),
+    include_archived: bool = Query(False, description="Also include archived orders"),
+):
+    """Summarize order amounts by status and payment status, and rank customers by total."""
+    return get_repository().get_order_analytics(
+        include_archived, analytics.parse_quantiles(quantiles), buckets, top_customers
+    )
+
+
+@router.put("/bulk/status", response_model=None)
+def bulk_update_status(payload: BulkStatusUpdate):
+    """Bulk update the status of multiple orders."""
+    updated = get_repository().bulk_update_status(Selection.from_request(payload), payload.status)
+    return {"updated": updated}
+
+
+@router.post("/bulk/duplicate", response_model=None)
+def bulk_duplicate(payload: BulkIds, accept: Optional[str] = Header(None)):
+    """Duplicate multiple orders."""
+    orders = get_repository().bulk_duplicate(Selection.from_request(payload))
+    return encoding.respond({"orders": orders}, accept)
+
+
+@router.delete("/bulk", status_code=204, response_model=None)
+def bulk_delete(payload: BulkIds):
+    """Delete multiple orders at once."""
+    get_repository().bulk_delete(Selection.from_request(payload))
+    return None
+
+
+@router.post("/print", response_model=None)
+def print_orders(
+    payload: BulkIds,
+    format: str = Query("html", pattern="^(html|pdf)$", description="html, or pdf when a PDF renderer is installed"),
+):
+    """Render the selected orders as a printable document, one page per order."""
+    if format == "pdf" and printing.pdf_renderer() is None:
+        raise HTTPException(
+            status_code=501, detail="PDF rendering is not available: install wkhtmltopdf or weasyprint"
+        )
+    orders = get_repository().get_orders(Selection.from_request(payload))
+    if not orders:
+        raise HTTPException(status_code=404, detail="No orders found to print")
+    headers = {"Content-Disposition": f'inline; filename="orders.{format}"'}
+    if format == "pdf":
+        return StreamingResponse(printing.render_pdf(orders), media_type="application/pdf", headers=headers)
+    return StreamingResponse(printing.render_html(orders), media_type="text/html", headers=headers)
 
 
 @router.get("/{order_id}", response_model=None)
-def get_order(order_id: int):
+def get_order(
+    order_id: int,
+    include_archived: bool = Query(False, description="Also look in the archive"),
+    accept: Optional[str] = Header(None),
+):
     """Retrieve a single order by its ID."""
-    return crud.get_order(order_id)
+    return encoding.respond(get_repository().get_order(order_id, include_archived), accept)
 
 
 @router.post("", status_code=201, response_model=None)
 def create_order(order: OrderCreate):
     """Create a new order."""
-    return crud.create_order(order)
+    return get_repository().create_order(order)
 
 
 @router.put("/{order_id}", response_model=None)
 def update_order(order_id: int, order: OrderUpdate):
     """Update an existing order."""
-    return crud.update_order(order_id, order)
+    return get_repository().update_order(order_id, order)
 
 
 @router.delete("/{order_id}", status_code=204, response_model=None)
 def delete_order(order_id: int):
     """Delete a single order."""
-    crud.delete_order(order_id)
-    return None
-
-
-@router.put("/bulk/status", response_model=None)
-def bulk_update_status(payload: BulkStatusUpdate):
-    """Bulk update the status of multiple orders."""
-    updated = crud.bulk_update_status(payload.order_ids, payload.status)
-    return {"updated": updated}
-
-
-@router.post("/bulk/duplicate", response_model=None)
-def bulk_duplicate(payload: BulkIds):
-    """Duplicate multiple orders."""
-    orders = crud.bulk_duplicate(payload.order_ids)
-    return {"orders": orders}
-
-
-@router.delete("/bulk", status_code=204, response_model=None)
-def bulk_delete(payload: BulkIds):
-    """Delete multiple orders at once."""
-    crud.bulk_delete(payload.order_ids)
+    get_repository().delete_order(order_id)
     return None
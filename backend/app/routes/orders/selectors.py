@@ -0,0 +1,243 @@
+"""Compact selections of order IDs for bulk operations.
+
+A bulk request can name orders as explicit IDs, inclusive ID ranges and a
+base64 Roaring bitmap (the portable serialization format written by the
+Roaring libraries), minus a list of excluded IDs. A ``Selection`` keeps
+ranges as ranges: a "select all" over millions of orders stays a single
+``BETWEEN`` on the primary key instead of a list of integers. Explicit IDs
+go into an ``IN`` list, or into a temporary table once there are many.
+"""
+
+import base64
+import binascii
+import struct
+from bisect import bisect_right
+from typing import ClassVar, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, model_validator
+
+# Up to this many ranges become OR-ed BETWEEN terms; beyond it they are
+# joined from a temporary table.
+RANGE_TERMS = 64
+
+# Up to this many IDs are bound as an IN list; beyond it they are loaded
+# into a temporary table (which also avoids SQLite's variable limit).
+IN_LIST_IDS = 500
+
+_SERIAL_COOKIE_NO_RUNCONTAINER = 12346
+_SERIAL_COOKIE = 12347
+_NO_OFFSET_THRESHOLD = 4
+_ARRAY_MAX = 4096
+
+Range = Tuple[int, int]
+
+
+def _merge(ranges: Iterable[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def _covered(ranges: List[Range], value: int) -> bool:
+    i = bisect_right(ranges, (value, float("inf"))) - 1
+    return i >= 0 and ranges[i][0] <= value <= ranges[i][1]
+
+
+def _bitmap_container(data: bytes, base: int, ranges: List[Range], ids: List[int]) -> None:
+    """Decode an 8 KiB bitset; runs of full bytes become ranges."""
+    position = 0
+    size = len(data)
+    while position < size:
+        byte = data[position]
+        if byte == 0xFF:
+            start = position
+            while position < size and data[position] == 0xFF:
+                position += 1
+            ranges.append((base + start * 8, base + position * 8 - 1))
+            continue
+        if byte:
+            low = base + position * 8
+            ids.extend(low + bit for bit in range(8) if byte >> bit & 1)
+        position += 1
+
+
+def decode_bitmap(encoded: str) -> Tuple[List[Range], List[int]]:
+    """Decode a base64 portable Roaring bitmap into ranges and single IDs.
+
+    Run containers and fully set stretches of bitset containers come back
+    as ranges without enumerating their values.
+    """
+    try:
+        data = base64.b64decode(encoded, validate=True)
+        cookie, = struct.unpack_from("<I", data, 0)
+        offset = 4
+        if cookie & 0xFFFF == _SERIAL_COOKIE:
+            size = (cookie >> 16) + 1
+            run_flags = data[offset:offset + (size + 7) // 8]
+            offset += (size + 7) // 8
+            has_offsets = size >= _NO_OFFSET_THRESHOLD
+        elif cookie == _SERIAL_COOKIE_NO_RUNCONTAINER:
+            size, = struct.unpack_from("<I", data, offset)
+            offset += 4
+            run_flags = b""
+            has_offsets = True
+        else:
+            raise ValueError("not a portable Roaring bitmap")
+
+        header = struct.unpack_from(f"<{size * 2}H", data, offset)
+        offset += size * 4
+        if has_offsets:
+            offset += size * 4
+
+        ranges: List[Range] = []
+        ids: List[int] = []
+        for i in range(size):
+            base = header[2 * i] << 16
+            cardinality = header[2 * i + 1] + 1
+            if run_flags and run_flags[i // 8] >> (i % 8) & 1:
+                runs, = struct.unpack_from("<H", data, offset)
+                values = struct.unpack_from(f"<{runs * 2}H", data, offset + 2)
+                offset += 2 + runs * 4
+                ranges.extend(
+                    (base + values[2 * r], base + values[2 * r] + values[2 * r + 1]) for r in range(runs)
+                )
+            elif cardinality <= _ARRAY_MAX:
+                values = struct.unpack_from(f"<{cardinality}H", data, offset)
+                offset += cardinality * 2
+                ids.extend(base + value for value in values)
+            else:
+                if offset + 8192 > len(data):
+                    raise ValueError("truncated bitset container")
+                _bitmap_container(data[offset:offset + 8192], base, ranges, ids)
+                offset += 8192
+        return ranges, ids
+    except (binascii.Error, struct.error, ValueError, IndexError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bitmap: {e}")
+
+
+class IdSelection(BaseModel):
+    """Request body fields selecting the rows a bulk operation applies to.
+
+    Subclasses add the explicit ID list named by ``ids_field``. The
+    selection is the union of that list, ``ranges`` and ``bitmap``, minus
+    ``exclude``.
+    """
+
+    ids_field: ClassVar[str] = "ids"
+
+    ranges: Optional[List[Tuple[int, int]]] = Field(None, description="Inclusive [first, last] ID ranges")
+    exclude: Optional[List[int]] = Field(None, description="IDs to leave out of the selection")
+    bitmap: Optional[str] = Field(None, description="Base64 Roaring bitmap of IDs (portable format)")
+
+    def explicit_ids(self) -> Optional[List[int]]:
+        return getattr(self, self.ids_field, None)
+
+    @model_validator(mode="after")
+    def require_selection(self):
+        if self.explicit_ids() is None and self.ranges is None and self.bitmap is None:
+            raise ValueError(f"{self.ids_field}, ranges or bitmap is required")
+        return self
+
+
+class Selection:
+    """A normalized set of order IDs: sorted disjoint ranges, IDs outside
+    them, and exclusions that fall inside either."""
+
+    __slots__ = ("ranges", "ids", "exclude")
+
+    def __init__(
+        self,
+        ids: Sequence[int] = (),
+        ranges: Iterable[Range] = (),
+        exclude: Sequence[int] = (),
+    ) -> None:
+        self.ranges = _merge(ranges)
+        self.ids = sorted({i for i in ids if not _covered(self.ranges, i)})
+        id_set = set(self.ids)
+        self.exclude = sorted({i for i in exclude if i in id_set or _covered(self.ranges, i)})
+
+    @classmethod
+    def from_request(cls, payload: IdSelection) -> "Selection":
+        """Build the selection described by a bulk request body."""
+        ranges = list(payload.ranges or ())
+        for lo, hi in ranges:
+            if lo > hi:
+                raise HTTPException(status_code=400, detail=f"Invalid range: [{lo}, {hi}]")
+        ids = list(payload.explicit_ids() or ())
+        if payload.bitmap:
+            bitmap_ranges, bitmap_ids = decode_bitmap(payload.bitmap)
+            ranges.extend(bitmap_ranges)
+            ids.extend(bitmap_ids)
+        return cls(ids, ranges, payload.exclude or ())
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges or self.ids)
+
+    def count(self) -> int:
+        """Number of IDs selected (whether or not they exist)."""
+        return sum(hi - lo + 1 for lo, hi in self.ranges) + len(self.ids) - len(self.exclude)
+
+    def for_shard(self, shard: int, shard_count: int) -> "Selection":
+        """The part of the selection whose explicit IDs live on ``shard``.
+
+        Ranges are kept whole: each shard only holds its own IDs anyway.
+        """
+        if shard_count == 1:
+            return self
+        part = Selection.__new__(Selection)
+        part.ranges = self.ranges
+        part.ids = [i for i in self.ids if i % shard_count == shard]
+        part.exclude = [i for i in self.exclude if i % shard_count == shard]
+        return part
+
+    def shards(self, shard_count: int) -> List[int]:
+        """Shards holding any selected order."""
+        if self.ranges:
+            return list(range(shard_count))
+        return sorted({i % shard_count for i in self.ids})
+
+    def where(self, cursor, column: str = "id", table: str = "orders") -> Tuple[str, List[object]]:
+        """SQL predicate on ``column`` (the ID column of ``table``) matching the selection.
+
+        Large ID lists and range sets are loaded into temporary tables on
+        the cursor's connection.
+        """
+        terms: List[str] = []
+        params: List[object] = []
+        if len(self.ranges) <= RANGE_TERMS:
+            for lo, hi in self.ranges:
+                terms.append(f"{column} BETWEEN ? AND ?")
+                params.extend((lo, hi))
+        else:
+            _load(cursor, "_selected_ranges", "lo INTEGER PRIMARY KEY, hi INTEGER NOT NULL", self.ranges)
+            terms.append(
+                f"{column} IN (SELECT s.id FROM temp._selected_ranges r "
+                f"JOIN {table} s ON s.id BETWEEN r.lo AND r.hi)"
+            )
+        if self.ids:
+            terms.append(_in(cursor, column, self.ids, "_selected_ids", params))
+        sql = "(" + " OR ".join(terms or ["0"]) + ")"
+        if self.exclude:
+            sql += f" AND NOT {_in(cursor, column, self.exclude, '_excluded_ids', params)}"
+        return sql, params
+
+
+def _load(cursor, name: str, columns: str, rows: Sequence[tuple]) -> None:
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} ({columns})")
+    cursor.execute(f"DELETE FROM temp.{name}")
+    cursor.executemany(f"INSERT INTO temp.{name} VALUES ({', '.join('?' * len(rows[0]))})", rows)
+
+
+def _in(cursor, column: str, ids: List[int], table: str, params: List[object]) -> str:
+    if len(ids) <= IN_LIST_IDS:
+        params.extend(ids)
+        return f"{column} IN ({','.join(['?'] * len(ids))})"
+    _load(cursor, table, "id INTEGER PRIMARY KEY", [(i,) for i in ids])
+    return f"{column} IN (SELECT id FROM temp.{table})"
+
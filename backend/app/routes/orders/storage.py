@@ -0,0 +1,143 @@
+"""Conversions between API values and the compact columns of the orders table.
+
+Orders store dates as days since 1970-01-01, amounts as integer cents and
+statuses as small integer codes from lookup tables. These helpers keep the
+API shapes unchanged on top of that representation.
+"""
+
+import threading
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from app.coherence import watcher
+from app.sequences import ORDER_NUMBER_PREFIX, is_generated_number
+
+from .models import Customer
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def date_to_day(value: str) -> int:
+    """Convert a ``YYYY-MM-DD`` string to days since the epoch."""
+    try:
+        return date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid order_date: {value!r} (expected YYYY-MM-DD)")
+
+
+@lru_cache(maxsize=8192)
+def day_to_date(day: int) -> str:
+    """Convert days since the epoch back to a ``YYYY-MM-DD`` string."""
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def to_cents(amount: float) -> int:
+    """Convert a decimal amount to integer cents."""
+    return int(round(amount * 100))
+
+
+def from_cents(cents: int) -> float:
+    """Convert integer cents back to a decimal amount."""
+    return cents / 100
+
+
+def requested_order_number(value: Optional[str]) -> Optional[str]:
+    """The number to create an order with, or None to generate one.
+
+    A client number of the generated form is ignored rather than rejected:
+    the dashboard sends made-up ``#ORD`` numbers, and storing them could
+    collide with a number another worker has already reserved.
+    """
+    if value is None or is_generated_number(value):
+        return None
+    return value
+
+
+def check_order_number(value: str, current: Optional[str] = None) -> None:
+    """Reject a client-chosen order number from the generated range on update.
+
+    ``current`` is the order's existing number on update, which may be sent
+    back unchanged.
+    """
+    if value != current and is_generated_number(value):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid order_number: {value!r} ({ORDER_NUMBER_PREFIX}<digits> numbers are generated)",
+        )
+
+
+def timestamp_now() -> str:
+    """Current UTC time in the ISO 8601 format used for timestamps."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def payload_customer(order) -> Optional[Customer]:
+    """Customer details from a create/update payload, if any were given."""
+    if order.customer is not None:
+        return order.customer
+    if order.customer_name is not None:
+        return Customer(name=order.customer_name)
+    return None
+
+
+class CodeTable:
+    """Cached two-way mapping between names and codes of a lookup table.
+
+    Only committed rows are cached: lookups made inside a write transaction
+    read the table without updating the cache, so a rollback cannot leave a
+    dangling code behind. Unknown names and codes trigger a reload, which
+    also picks up values created by other processes.
+    """
+
+    def __init__(self, table: str) -> None:
+        self.table = table
+        self._by_name: Dict[str, int] = {}
+        self._by_code: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, cursor) -> Dict[int, str]:
+        cursor.execute(f"SELECT id, name FROM {self.table}")
+        by_code = {row[0]: row[1] for row in cursor.fetchall()}
+        if not cursor.connection.in_transaction:
+            with self._lock:
+                self._by_code = by_code
+                self._by_name = {name: code for code, name in by_code.items()}
+        return by_code
+
+    def code(self, cursor, name: str, create: bool = False) -> Optional[int]:
+        """Return the code for ``name``, optionally inserting it if unknown."""
+        code = self._by_name.get(name)
+        if code is not None:
+            return code
+        if create:
+            cursor.execute(f"INSERT OR IGNORE INTO {self.table} (name) VALUES (?)", (name,))
+            if cursor.rowcount == 1:
+                return cursor.lastrowid
+        for known_code, known_name in self._load(cursor).items():
+            if known_name == name:
+                return known_code
+        return None
+
+    def name(self, cursor, code: int) -> str:
+        """Return the name for ``code``."""
+        name = self._by_code.get(code)
+        if name is None:
+            name = self._load(cursor)[code]
+        return name
+
+    def invalidate(self) -> None:
+        """Drop the cached mapping so the next lookup reloads it."""
+        with self._lock:
+            self._by_code = {}
+            self._by_name = {}
+
+
+order_statuses = CodeTable("order_statuses")
+payment_statuses = CodeTable("payment_statuses")
+
+# Other workers may add values; drop the caches when the database changes.
+watcher.register(order_statuses.invalidate)
+watcher.register(payment_statuses.invalidate)
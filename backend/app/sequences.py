@@ -0,0 +1,90 @@
+"""Unique order numbers from a sequence row in the database.
+
+The ``_sequences`` table holds the next unreserved value of each named
+sequence. Every worker reserves a block of values at a time with one short
+``UPDATE ... RETURNING`` and hands them out from memory, so generating a
+number costs no query in the common case and never collides with another
+worker. Values left in a block when a worker exits are skipped, not reused.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import List
+
+from app import database
+
+ORDER_NUMBER_PREFIX = os.getenv("ORDER_NUMBER_PREFIX", "#ORD")
+SEQUENCE_BLOCK_SIZE = int(os.getenv("SEQUENCE_BLOCK_SIZE", "100"))
+
+# Lowest number handed out when a database has no orders yet
+FIRST_ORDER_NUMBER = 1001
+
+
+def reserve(conn: sqlite3.Connection, name: str, count: int) -> int:
+    """Reserve ``count`` consecutive values of ``name`` and return the first."""
+    row = conn.execute(
+        "UPDATE _sequences SET next_value = next_value + ? WHERE name = ? RETURNING next_value",
+        (count, name),
+    ).fetchone()
+    if row is None:
+        raise RuntimeError(f"Sequence {name!r} does not exist; run the migrations")
+    return row[0] - count
+
+
+class SequenceAllocator:
+    """Hands out values of one sequence from blocks reserved per process."""
+
+    def __init__(self, name: str, block_size: int = SEQUENCE_BLOCK_SIZE) -> None:
+        self.name = name
+        self.block_size = max(block_size, 1)
+        self._next = 0
+        self._end = 0
+        self._path = None
+        self._lock = threading.Lock()
+
+    def _reserve(self, count: int) -> int:
+        conn = database.connect_shard(0, isolation_level=None, timeout=30)
+        try:
+            return reserve(conn, self.name, count)
+        finally:
+            conn.close()
+
+    def take(self, count: int) -> List[int]:
+        """Return ``count`` unused values, reserving a new block when needed."""
+        with self._lock:
+            if self._path != database.DATABASE_PATH:
+                # A block belongs to the database it was reserved from
+                self._next = self._end = 0
+                self._path = database.DATABASE_PATH
+            values = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(values)
+            missing = count - len(values)
+            if missing:
+                size = max(self.block_size, missing)
+                start = self._reserve(size)
+                values.extend(range(start, start + missing))
+                self._next, self._end = start + missing, start + size
+            return values
+
+
+def format_order_number(value: int) -> str:
+    return f"{ORDER_NUMBER_PREFIX}{value}"
+
+
+def is_generated_number(order_number: str) -> bool:
+    """Whether ``order_number`` has the form of a generated order number.
+
+    Such numbers may already be reserved by a worker's block, so clients
+    cannot choose them.
+    """
+    digits = order_number[len(ORDER_NUMBER_PREFIX):]
+    return order_number.startswith(ORDER_NUMBER_PREFIX) and digits.isascii() and digits.isdigit()
+
+
+order_numbers = SequenceAllocator("order_number")
+
+
+def next_order_numbers(count: int) -> List[str]:
+    """``count`` new, unique order numbers."""
+    return [format_order_number(value) for value in order_numbers.take(count)]
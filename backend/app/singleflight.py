@@ -0,0 +1,109 @@
+"""Collapse identical concurrent calls into a single execution."""
+
+import functools
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app import database
+from app.coherence import watcher
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") != "0"
+
+
+class _Call:
+    """An in-flight call whose outcome is shared with every waiter."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its result.
+
+    Callers that arrive while a call for the same key is running block until
+    it finishes and receive the same result (or exception) instead of running
+    the function themselves. Once the call completes the key is forgotten, so
+    this is request coalescing rather than caching.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call ``fn(*args, **kwargs)`` unless an identical call is already running."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls ran and how many joined an in-flight call."""
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls),
+            }
+
+
+# Shared group for read paths; keys are namespaced by function name.
+reads = SingleFlight()
+
+
+def write_epoch() -> Tuple[int, int]:
+    """Identify the data a read started from.
+
+    Commits made in this process bump the commit count as soon as they
+    return; commits from other processes bump the watcher's generation
+    within one polling interval.
+    """
+    return watcher.generation, database.commit_count()
+
+
+def coalesce(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorate a read function so identical concurrent calls share one execution.
+
+    Arguments must be hashable. The shared result is handed to every caller,
+    so callers must treat it as read-only. A caller only joins a call that
+    started at the same write epoch, so a read issued after a commit never
+    receives a result computed before it.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not SINGLEFLIGHT_ENABLED:
+            return fn(*args, **kwargs)
+        key = (name, write_epoch(), args, tuple(sorted(kwargs.items())))
+        return reads.do(key, fn, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,162 @@
+"""Slow-query log with ``EXPLAIN QUERY PLAN`` capture, aggregated by fingerprint."""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.database import add_query_hook
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_MAX_FINGERPRINTS = int(os.getenv("SLOW_QUERY_MAX_FINGERPRINTS", "500"))
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+# Plan lines worth calling out: table scans that use no index (a scan of a
+# covering index reads only the index) and sorts through a temp b-tree.
+_PLAN_WARNINGS = re.compile(r"^(SCAN (?!.* USING (?:COVERING )?INDEX )|USE TEMP B-TREE)")
+
+
+def normalize(sql: str) -> str:
+    """Reduce a statement to its shape: literals become ``?`` and IN lists collapse."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(?, ...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def param_shape(params: Any, many: bool = False) -> str:
+    """Describe bound parameters by type, run-length encoded (``str, int x500``)."""
+    if many:
+        return "executemany"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    runs: List[List[Any]] = []
+    for value in params:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if n == 1 else f"{name} x{n}" for name, n in runs) + ")"
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Any) -> List[str]:
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for a statement."""
+    # A plain cursor keeps the EXPLAIN itself out of the query hooks.
+    cursor = conn.cursor(sqlite3.Cursor)
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class SlowQueryStats:
+    """Aggregate of slow executions sharing one fingerprint."""
+
+    __slots__ = ("fingerprint", "sql", "param_shape", "count", "total", "max", "last_seen", "plan", "warnings")
+
+    def __init__(self, fingerprint: str, sql: str) -> None:
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.param_shape = ""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+        self.plan: Optional[List[str]] = None
+        self.warnings: List[str] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "param_shape": self.param_shape,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "last_seen": self.last_seen,
+            "plan": self.plan or [],
+            "warnings": self.warnings,
+        }
+
+
+class SlowQueryLog:
+    """Records statements slower than a threshold, keyed by normalized SQL."""
+
+    def __init__(self, threshold_ms: float, max_fingerprints: int) -> None:
+        self.threshold = threshold_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self._entries: Dict[str, SlowQueryStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn: sqlite3.Connection, sql: str, params: Any, seconds: float, many: bool = False) -> None:
+        """Query hook: aggregate the statement if it exceeded the threshold."""
+        if seconds < self.threshold or sql.lstrip().upper().startswith("EXPLAIN"):
+            return
+        normalized = normalize(sql)
+        fingerprint = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+        shape = param_shape(params, many)
+
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    # Evict the least expensive fingerprint to stay bounded.
+                    cheapest = min(self._entries.values(), key=lambda e: e.total)
+                    del self._entries[cheapest.fingerprint]
+                entry = self._entries[fingerprint] = SlowQueryStats(fingerprint, normalized)
+            entry.count += 1
+            entry.total += seconds
+            entry.max = max(entry.max, seconds)
+            entry.last_seen = time.time()
+            entry.param_shape = shape
+            needs_plan = entry.plan is None
+            if needs_plan:
+                entry.plan = []
+
+        if needs_plan and not many:
+            # Plans are captured once per fingerprint to keep the overhead off
+            # repeat offenders. An executemany() has no single parameter set
+            # to explain with.
+            try:
+                plan = explain(conn, sql, params)
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN failed: {e}"]
+            entry.plan = plan
+            entry.warnings = [line for line in plan if _PLAN_WARNINGS.match(line)]
+
+        logger.warning(
+            "slow query %.1fms [%s] %s params=%s plan=%s",
+            seconds * 1000,
+            fingerprint,
+            normalized,
+            shape,
+            entry.plan,
+        )
+
+    def top(self, limit: int = 20, sort_by: str = "total") -> List[Dict[str, Any]]:
+        """Return the worst fingerprints ordered by total, max or count."""
+        with self._lock:
+            entries = list(self._entries.values())
+        entries.sort(key=lambda e: getattr(e, sort_by), reverse=True)
+        return [e.to_dict() for e in entries[:limit]]
+
+    def reset(self) -> None:
+        """Forget all recorded statements."""
+        with self._lock:
+            self._entries.clear()
+
+
+slow_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_MAX_FINGERPRINTS)
+add_query_hook(slow_log.record)
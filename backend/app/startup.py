@@ -0,0 +1,77 @@
+"""Startup timing of this worker.
+
+``report`` records when the process started, how long each warmup step took
+(see ``app.warmup``), when the worker became ready to accept requests, and
+the latency of the first request to each route. ``GET /health`` shows it.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Generator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _process_started() -> float:
+    """Wall-clock time this process started, or now where /proc is unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class StartupReport:
+    """Timings of one worker's startup and of its first requests."""
+
+    def __init__(self) -> None:
+        self.started_at = _process_started()
+        self.ready_at: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.first_requests: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str) -> Generator[None, None, None]:
+        """Time a startup step."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = time.perf_counter() - start
+
+    def ready(self) -> None:
+        """Mark the worker as ready to accept requests."""
+        self.ready_at = time.time()
+        logger.info(
+            "Worker %d ready %.0f ms after start (warmup: %s)",
+            os.getpid(),
+            (self.ready_at - self.started_at) * 1000,
+            ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.steps.items()) or "off",
+        )
+
+    def observe(self, method: str, route: str, seconds: float) -> None:
+        """Record a request's latency if it is the first one to its route."""
+        key = f"{method} {route}"
+        if key in self.first_requests:
+            return
+        with self._lock:
+            self.first_requests.setdefault(key, seconds)
+
+    def stats(self) -> dict:
+        ready_ms = None if self.ready_at is None else round((self.ready_at - self.started_at) * 1000, 1)
+        return {
+            "ready_ms": ready_ms,
+            "warmup_ms": {name: round(seconds * 1000, 2) for name, seconds in self.steps.items()},
+            "first_request_ms": {key: round(seconds * 1000, 2) for key, seconds in self.first_requests.items()},
+        }
+
+
+report = StartupReport()
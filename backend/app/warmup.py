@@ -0,0 +1,82 @@
+"""Startup warmup.
+
+Runs from the lifespan before the worker accepts requests, so the first
+requests after a deploy or a scale-out do not pay for a cold start:
+
+- ``indexes`` reads every page of every index on ``orders``, on every
+  shard, through SQLite's ``dbstat`` table, which puts them in the OS page
+  cache. It is skipped by the memory engine and abandoned once
+  ``WARMUP_SECONDS`` have passed.
+- ``queries`` runs the requests the dashboard opens with (the first page of
+  orders and the status counts) through the repository and encodes the
+  result, which also loads the code tables and starts the shard threads.
+
+Both run in the threadpool that serves the synchronous endpoints, so the
+first request does not have to start its thread either. Failures are
+logged and never stop the worker from starting.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+from fastapi import HTTPException
+
+from app import database
+from app.routes.orders import encoding
+from app.routes.orders.filters import OrderFilter
+from app.routes.orders.repository import SQLiteOrderRepository, get_repository
+from app.startup import report
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+WARMUP_SECONDS = float(os.getenv("WARMUP_SECONDS", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+def read_indexes(deadline: float) -> int:
+    """Read the index pages of ``orders`` on every shard; returns the bytes read.
+
+    Raises ``sqlite3.OperationalError`` ("interrupted") at ``deadline``, a
+    ``time.monotonic()`` value.
+    """
+    size = 0
+    for shard in range(database.SHARD_COUNT):
+        conn = sqlite3.connect(database.shard_path(shard))
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            names = [row[1] for row in conn.execute("PRAGMA index_list(orders)").fetchall()]
+            # index_list is newest first; the oldest indexes serve the list and stats queries
+            for name in reversed(names):
+                row = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()
+                size += row[0] or 0
+        finally:
+            conn.close()
+    return size
+
+
+def run_queries() -> None:
+    """Serve the dashboard's opening requests once."""
+    repository = get_repository()
+    encoding.respond(repository.list_orders(OrderFilter(), 1, 10), None)
+    repository.get_order_stats()
+
+
+def run() -> None:
+    """Warm this worker up, timing each step in ``startup.report``."""
+    if not WARMUP_ENABLED:
+        return
+    deadline = time.monotonic() + WARMUP_SECONDS
+    if isinstance(get_repository(), SQLiteOrderRepository):
+        with report.step("indexes"):
+            try:
+                size = read_indexes(deadline)
+                logger.info("Warmup read %.1f MB of order indexes", size / 1e6)
+            except sqlite3.Error as e:
+                logger.warning("Index warmup stopped: %s", e)
+    with report.step("queries"):
+        try:
+            run_queries()
+        except HTTPException as e:
+            logger.warning("Query warmup failed: %s", e.detail)
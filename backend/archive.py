@@ -0,0 +1,73 @@
+"""
+Order Archiver
+
+Moves completed and refunded orders older than a cutoff from each shard of
+DATABASE_PATH into that shard's archive database. Work is done in small
+committed batches, so the command can be interrupted and re-run at any time.
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import date
+
+from app.archive import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_STATUSES,
+    archive_counts,
+    archive_orders,
+    default_archive_path,
+)
+from app.database import SHARD_COUNT, shard_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old orders")
+    parser.add_argument(
+        "action",
+        choices=["run", "status"],
+        help="run (move eligible orders), status (show hot and archived counts)"
+    )
+    parser.add_argument(
+        "--before",
+        type=date.fromisoformat,
+        help=f"Archive orders dated before this day (default: {ARCHIVE_AFTER_DAYS} days ago)",
+    )
+    parser.add_argument(
+        "--statuses",
+        default=",".join(ARCHIVE_STATUSES),
+        help="Comma-separated order statuses eligible for archiving",
+    )
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Orders moved per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--archive", help="Archive database file (single-shard setups only)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards to shrink the file")
+
+    args = parser.parse_args()
+
+    if args.archive and SHARD_COUNT > 1:
+        parser.error("--archive cannot be used with SHARD_COUNT > 1")
+
+    for shard in range(SHARD_COUNT):
+        target = args.archive or default_archive_path(shard)
+        if args.action == "run":
+            started = time.perf_counter()
+            moved = archive_orders(
+                shard,
+                before=args.before,
+                statuses=[s.strip() for s in args.statuses.split(",") if s.strip()],
+                batch_size=args.batch_size,
+                archive_path=target,
+                pause=args.pause,
+                progress=lambda n: print(f"  moved {n} orders"),
+            )
+            print(f"Archived {moved} orders into {target} in {time.perf_counter() - started:.2f}s.")
+            if args.vacuum and moved:
+                conn = sqlite3.connect(shard_path(shard))
+                conn.execute("VACUUM")
+                conn.close()
+                print(f"Vacuumed {shard_path(shard)}.")
+
+        counts = archive_counts(shard, target)
+        print(f"Shard {shard}: hot orders: {counts['hot']}, archived orders: {counts['archived']}")
@@ -0,0 +1,88 @@
+"""
+Database Backup and Restore
+
+Takes online snapshots of every database file with SQLite's backup API,
+lists, verifies and prunes them, and restores one. Snapshots can be taken
+while the service is running; restoring needs it stopped.
+"""
+
+import argparse
+import sys
+
+from app.backup import (
+    BACKUP_KEEP,
+    BACKUP_PAUSE_MS,
+    BACKUP_STEP_PAGES,
+    BackupError,
+    default_backup_dir,
+    list_snapshots,
+    prune,
+    resolve,
+    restore,
+    snapshot,
+    verify,
+)
+
+
+def _size(num_bytes: int) -> str:
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up and restore the database")
+    parser.add_argument(
+        "action",
+        choices=["run", "list", "verify", "restore", "prune"],
+        help="run (take a snapshot), list, verify or restore a snapshot, prune old snapshots"
+    )
+    parser.add_argument("snapshot", nargs="?", default="latest", help="Snapshot name or path (default: latest)")
+    parser.add_argument("--dir", default=None, help=f"Snapshot directory (default: {default_backup_dir()})")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="Snapshots kept by run and prune")
+    parser.add_argument("--step-pages", type=int, default=BACKUP_STEP_PAGES, help="Pages copied per backup step")
+    parser.add_argument("--pause", type=float, default=BACKUP_PAUSE_MS / 1000, help="Seconds to sleep between steps")
+    parser.add_argument("--yes", action="store_true", help="Restore without asking for confirmation")
+
+    args = parser.parse_args()
+
+    try:
+        if args.action == "run":
+            manifest = snapshot(
+                args.dir,
+                step_pages=args.step_pages,
+                pause=args.pause,
+                progress=lambda path, stats: print(
+                    f"  {path}: {stats['pages']} pages in {stats['steps']} steps, {stats['seconds']:.2f}s"
+                ),
+            )
+            total = sum(entry["bytes"] for entry in manifest["files"])
+            print(f"Snapshot {manifest['path']}: {_size(total)} in {manifest['seconds']:.2f}s.")
+            for path in prune(args.dir, args.keep):
+                print(f"Pruned {path}.")
+
+        elif args.action == "list":
+            snapshots = list_snapshots(args.dir)
+            if not snapshots:
+                print(f"No snapshots in {args.dir or default_backup_dir()}.")
+            for snap in snapshots:
+                total = sum(entry["bytes"] for entry in snap["files"])
+                print(f"{snap['path']}  {snap['created_at']}  {len(snap['files'])} file(s)  {_size(total)}")
+
+        elif args.action == "verify":
+            path = resolve(args.snapshot, args.dir)
+            verify(path)
+            print(f"Snapshot {path} is intact.")
+
+        elif args.action == "restore":
+            path = resolve(args.snapshot, args.dir)
+            if not args.yes:
+                answer = input(f"Replace the database files with snapshot {path}? [y/N] ")
+                if answer.strip().lower() != "y":
+                    sys.exit("Aborted.")
+            restore(path, progress=lambda target: print(f"  restored {target}"))
+            print(f"Restored snapshot {path}; previous files are kept as *.pre-restore.")
+
+        elif args.action == "prune":
+            removed = prune(args.dir, args.keep)
+            print(f"Pruned {len(removed)} snapshot(s).")
+    except BackupError as e:
+        sys.exit(str(e))
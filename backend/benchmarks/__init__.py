@@ -0,0 +1 @@
+"""Benchmark suite for the orders and items API."""
@@ -0,0 +1,110 @@
+"""Minimal in-process ASGI client used to drive the app without a server."""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class Response:
+    """Status, headers and body of a completed request."""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class ASGIClient:
+    """Calls an ASGI app directly on a private event loop.
+
+    Going through the app object rather than a socket keeps network and
+    server overhead out of the numbers while still exercising routing,
+    validation, middleware and serialization.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self._lifespan_queue: Optional[asyncio.Queue] = None
+        self._lifespan_sent: Optional[asyncio.Queue] = None
+        self._lifespan_task: Optional[asyncio.Task] = None
+
+    def __enter__(self) -> "ASGIClient":
+        self.loop.run_until_complete(self._lifespan("startup"))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.loop.run_until_complete(self._lifespan("shutdown"))
+        self.loop.close()
+
+    async def _lifespan(self, event: str) -> None:
+        if self._lifespan_queue is None:
+            self._lifespan_queue = asyncio.Queue()
+            self._lifespan_sent = asyncio.Queue()
+            scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+            self._lifespan_task = self.loop.create_task(
+                self.app(scope, self._lifespan_queue.get, self._lifespan_sent.put)
+            )
+        await self._lifespan_queue.put({"type": f"lifespan.{event}"})
+        message = await self._lifespan_sent.get()
+        if message["type"].endswith("failed"):
+            raise RuntimeError(message.get("message", f"lifespan {event} failed"))
+
+    def request(self, method: str, url: str, json_body: Any = None, headers: Optional[Dict[str, str]] = None) -> Response:
+        """Send one request and return its response."""
+        return self.loop.run_until_complete(self.arequest(method, url, json_body, headers))
+
+    async def arequest(
+        self, method: str, url: str, json_body: Any = None, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        parts = urlsplit(url)
+        body = b"" if json_body is None else json.dumps(json_body).encode()
+        raw_headers: List[Tuple[bytes, bytes]] = [(b"host", b"bench")]
+        if json_body is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+        for key, value in (headers or {}).items():
+            raw_headers.append((key.lower().encode(), value.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": parts.path,
+            "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        received = False
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal received
+            if received:
+                await asyncio.Event().wait()
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status = 0
+        response_headers: Dict[str, str] = {}
+        chunks: List[bytes] = []
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", []):
+                    response_headers[key.decode("latin-1")] = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return Response(status, response_headers, b"".join(chunks))
@@ -0,0 +1,495 @@
+"""
+Load Generator
+
+Drives the API over HTTP with simulated dashboard users and reports
+throughput, latency percentiles, error rates and "database is locked"
+responses, in total and per interval of the run.
+
+Every simulated user behaves like ``frontend/app/page.tsx``. It keeps its
+own page, status tab and visible order IDs on one keep-alive connection.
+Each action sends the requests that the page would send:
+
+- ``page``, ``tab``, ``search``, ``sort``: the effect reloading the table,
+  i.e. ``GET /orders`` followed by ``GET /orders/stats``. Search filters
+  client-side, so typing a query reloads once per keystroke;
+- ``bulk_status``, ``bulk_duplicate``, ``bulk_delete``: the bulk action bar
+  applied to some or all of the visible orders, then ``GET /orders``;
+- ``edit``, ``delete``: the row actions, then both reloads;
+- ``add``: ``POST /orders`` with a placeholder order, then ``GET /orders``.
+  Order numbers are unique per user rather than the page's random 4-digit
+  ones, whose collisions would show up as errors.
+
+Workloads:
+
+- closed loop (default): ``--users`` users each perform an action, wait for
+  it and think for an exponentially distributed ``--think-ms`` before the
+  next one;
+- open loop (``--rate``): actions arrive as a Poisson process at ``--rate``
+  per second however fast the server answers, and are taken by the next free
+  user among ``--users``. Action latency counts from the scheduled arrival,
+  so time spent queued behind a slow server is included.
+
+``--mix`` picks the relative frequency of the actions (see ``MIXES``).
+The server is ``serve.py`` on a fresh copy of a seeded dataset; its
+environment is passed through, so e.g. ``STORAGE_ENGINE=memory`` or
+``ADMISSION_ENABLED=0`` apply. ``--url`` targets a running server instead.
+
+Usage:
+    python -m benchmarks.loadgen --orders 100000 --users 16 --duration 30
+    python -m benchmarks.loadgen --rate 200 --users 64 --mix operators --workers 4
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --users 8 --think-ms 500
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import datasets, server  # noqa: E402
+from benchmarks.run import percentile  # noqa: E402
+
+# Tabs of the page's filter bar
+FILTER_OPTIONS = ("All", "Incomplete", "Overdue", "Ongoing", "Finished", "Pending", "Completed", "Refunded")
+STATUSES = ("Pending", "Completed", "Refunded")
+LIMIT = 10
+
+# Relative frequency of each action
+MIXES: Dict[str, Dict[str, int]] = {
+    "dashboard": {
+        "page": 35, "tab": 20, "search": 10, "sort": 10,
+        "bulk_status": 8, "bulk_duplicate": 5, "bulk_delete": 4, "edit": 4, "delete": 2, "add": 2,
+    },
+    "browse": {"page": 45, "tab": 25, "search": 15, "sort": 15},
+    "operators": {
+        "page": 15, "tab": 10, "search": 5, "sort": 5,
+        "bulk_status": 25, "bulk_duplicate": 15, "bulk_delete": 15, "edit": 5, "delete": 2, "add": 3,
+    },
+}
+
+LOCKED = b"database is locked"
+
+# (route, seconds since the run started at completion, latency, status, locked);
+# status 0 when the request failed without a response
+RequestRecord = Tuple[str, float, float, int, bool]
+# (action, seconds since the run started at completion, latency, failed)
+ActionRecord = Tuple[str, float, float, bool]
+
+
+class User:
+    """One simulated dashboard on its own keep-alive connection."""
+
+    def __init__(self, host: str, port: int, rng: random.Random, name: str, start_at: float) -> None:
+        self.host = host
+        self.port = port
+        self.rng = rng
+        self.name = name
+        self.start_at = start_at
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+        self.page = 1
+        self.tab = "All"
+        self.total = 0
+        self.visible: List[int] = []
+        self.created = itertools.count(1)
+        self.failed = False
+        self.requests: List[RequestRecord] = []
+        self.actions: List[ActionRecord] = []
+
+    def request(self, method: str, route: str, path: str, body: Any = None) -> Any:
+        """Send one request; returns the decoded JSON body of a successful response."""
+        payload = None if body is None else json.dumps(body).encode()
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, payload, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            data, status = b"", 0
+        end = time.perf_counter()
+        self.requests.append((f"{method} {route}", time.time() - self.start_at, end - start, status, LOCKED in data))
+        if status == 0 or status >= 500:
+            self.failed = True
+        if 200 <= status < 300 and data:
+            return json.loads(data)
+        return None
+
+    # -- what the page sends ----------------------------------------------
+
+    def fetch_orders(self) -> None:
+        query = f"page={self.page}&limit={LIMIT}"
+        if self.tab != "All":
+            query += f"&status={self.tab}"
+        data = self.request("GET", "/orders", f"/orders?{query}")
+        if data is not None:
+            self.total = data["total"]
+            self.visible = [order["id"] for order in data["items"]]
+
+    def fetch_stats(self) -> None:
+        self.request("GET", "/orders/stats", "/orders/stats")
+
+    def reload(self) -> None:
+        self.fetch_orders()
+        self.fetch_stats()
+
+    def selection(self) -> List[int]:
+        """Visible orders ticked for a bulk action: all of them half of the time."""
+        if self.rng.random() < 0.5:
+            return list(self.visible)
+        return self.rng.sample(self.visible, self.rng.randint(1, len(self.visible)))
+
+    # -- actions ----------------------------------------------------------
+
+    def page_flip(self) -> None:
+        pages = max(1, -(-self.total // LIMIT))
+        if self.rng.random() < 0.8:
+            self.page = min(max(1, self.page + self.rng.choice((-1, 1, 1))), pages)
+        else:
+            self.page = self.rng.randint(1, min(pages, 50))
+        self.reload()
+
+    def switch_tab(self) -> None:
+        self.tab = self.rng.choice(FILTER_OPTIONS)
+        self.page = 1
+        self.reload()
+
+    def search(self) -> None:
+        self.page = 1
+        for _ in range(self.rng.randint(2, 6)):
+            self.reload()
+
+    def sort(self) -> None:
+        self.reload()
+
+    def bulk_status(self) -> None:
+        if self.visible:
+            body = {"order_ids": self.selection(), "status": "Completed"}
+            self.request("PUT", "/orders/bulk/status", "/orders/bulk/status", body)
+        self.fetch_orders()
+
+    def bulk_duplicate(self) -> None:
+        if self.visible:
+            self.request("POST", "/orders/bulk/duplicate", "/orders/bulk/duplicate", {"order_ids": self.selection()})
+        self.fetch_orders()
+
+    def bulk_delete(self) -> None:
+        if self.visible:
+            self.request("DELETE", "/orders/bulk", "/orders/bulk", {"order_ids": self.selection()})
+        self.fetch_orders()
+
+    def edit(self) -> None:
+        if self.visible:
+            order_id = self.rng.choice(self.visible)
+            self.request("PUT", "/orders/{id}", f"/orders/{order_id}", {"status": self.rng.choice(STATUSES)})
+        self.reload()
+
+    def delete(self) -> None:
+        if self.visible:
+            order_id = self.rng.choice(self.visible)
+            self.request("DELETE", "/orders/{id}", f"/orders/{order_id}")
+        self.reload()
+
+    def add(self) -> None:
+        order = {
+            "order_number": f"#LOAD-{self.name}-{next(self.created)}",
+            "customer_name": "New Customer",
+            "order_date": time.strftime("%Y-%m-%d"),
+            "status": "Pending",
+            "total_amount": 0,
+            "payment_status": "Unpaid",
+        }
+        self.request("POST", "/orders", "/orders", order)
+        self.fetch_orders()
+
+    ACTIONS: Dict[str, Callable[["User"], None]] = {
+        "page": page_flip,
+        "tab": switch_tab,
+        "search": search,
+        "sort": sort,
+        "bulk_status": bulk_status,
+        "bulk_duplicate": bulk_duplicate,
+        "bulk_delete": bulk_delete,
+        "edit": edit,
+        "delete": delete,
+        "add": add,
+    }
+
+    def perform(self, action: str, since: Optional[float] = None) -> None:
+        """Perform ``action``; its latency counts from ``since`` (a ``perf_counter`` value) if given."""
+        start = time.perf_counter() if since is None else since
+        self.failed = False
+        self.ACTIONS[action](self)
+        end = time.perf_counter()
+        self.actions.append((action, time.time() - self.start_at, end - start, self.failed))
+
+
+def _closed_loop(user: User, mix: Dict[str, int], think: float, deadline: float) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.time() < deadline:
+        user.perform(user.rng.choices(names, weights)[0])
+        if think:
+            time.sleep(user.rng.expovariate(1 / think))
+
+
+def _open_loop_user(user: User, arrivals: "queue.Queue[Optional[Tuple[str, float]]]") -> None:
+    while True:
+        arrival = arrivals.get()
+        if arrival is None:
+            return
+        action, scheduled = arrival
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        user.perform(action, since=scheduled)
+
+
+_barrier: Optional[Any] = None
+
+
+def _init_client(barrier: Any) -> None:
+    global _barrier
+    _barrier = barrier
+
+
+def _client(args: Tuple[str, int, int, int, Dict[str, int], float, float, float, int]) -> Dict[str, Any]:
+    """One client process: ``users`` users, closed loop or at ``rate`` actions/s."""
+    host, port, index, users, mix, rate, think, duration, seed = args
+    rng = random.Random(seed * 1000 + index)
+    # Start together once every client process is up; spawning them takes a while
+    _barrier.wait()
+    start_at = time.time()
+    pool = [
+        User(host, port, random.Random(rng.random()), f"{index}-{i}", start_at) for i in range(users)
+    ]
+    deadline = start_at + duration
+    unsent = 0
+    if not rate:
+        threads = [
+            threading.Thread(target=_closed_loop, args=(user, mix, think, deadline), daemon=True) for user in pool
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        arrivals: "queue.Queue[Optional[Tuple[str, float]]]" = queue.Queue()
+        threads = [threading.Thread(target=_open_loop_user, args=(user, arrivals), daemon=True) for user in pool]
+        for thread in threads:
+            thread.start()
+        names, weights = list(mix), list(mix.values())
+        # Arrivals are scheduled on the perf_counter clock the users measure with
+        offset = time.perf_counter() - time.time()
+        scheduled = start_at + offset
+        end = deadline + offset
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled >= end:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            arrivals.put((rng.choices(names, weights)[0], scheduled))
+        # Arrivals still queued a few seconds after the run are counted, not sent
+        grace = time.time() + 5.0
+        while not arrivals.empty() and time.time() < grace:
+            time.sleep(0.05)
+        while True:
+            try:
+                arrivals.get_nowait()
+                unsent += 1
+            except queue.Empty:
+                break
+        for _ in threads:
+            arrivals.put(None)
+        for thread in threads:
+            thread.join()
+    for user in pool:
+        user.conn.close()
+    return {
+        "requests": [r for user in pool for r in user.requests],
+        "actions": [a for user in pool for a in user.actions],
+        "unsent": unsent,
+    }
+
+
+def _summary(latencies: List[float], duration: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "throughput": round(len(latencies) / duration, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 3),
+    }
+
+
+def summarize(
+    requests: List[RequestRecord], actions: List[ActionRecord], duration: float, interval: float
+) -> Dict[str, Any]:
+    """Totals per route, per action and per ``interval`` seconds of the run.
+
+    Requests still running at the end of ``duration`` extend the run, so
+    rates are taken over the time until the last one completed.
+    """
+    duration = max([duration] + [record[1] for record in requests])
+
+    def request_stats(records: Sequence[RequestRecord], seconds: float) -> Dict[str, Any]:
+        stats = _summary([r[2] for r in records], seconds)
+        stats["errors"] = sum(1 for r in records if r[3] == 0 or r[3] >= 500)
+        stats["client_errors"] = sum(1 for r in records if 400 <= r[3] < 500)
+        stats["rejected"] = sum(1 for r in records if r[3] == 503)
+        stats["locked"] = sum(1 for r in records if r[4])
+        stats["error_rate"] = round(stats["errors"] / len(records), 4) if records else 0.0
+        return stats
+
+    by_route: Dict[str, List[RequestRecord]] = {}
+    for record in requests:
+        by_route.setdefault(record[0], []).append(record)
+    by_action: Dict[str, List[ActionRecord]] = {}
+    for record in actions:
+        by_action.setdefault(record[0], []).append(record)
+
+    def action_stats(records: Sequence[ActionRecord]) -> Dict[str, Any]:
+        stats = _summary([a[2] for a in records], duration)
+        stats["failed"] = sum(1 for a in records if a[3])
+        return stats
+
+    slots = max(1, int(-(-duration // interval)))
+    windows: List[List[RequestRecord]] = [[] for _ in range(slots)]
+    for record in requests:
+        windows[min(max(int(record[1] // interval), 0), slots - 1)].append(record)
+    timeline = []
+    for i, records in enumerate(windows):
+        stats = request_stats(records, interval)
+        timeline.append({
+            "t": round((i + 1) * interval, 3),
+            **{key: stats[key] for key in ("count", "throughput", "p50_ms", "p99_ms", "errors", "rejected", "locked")},
+        })
+
+    return {
+        "duration": round(duration, 3),
+        "requests": request_stats(requests, duration),
+        "actions": action_stats(actions),
+        "routes": {route: request_stats(records, duration) for route, records in sorted(by_route.items())},
+        "by_action": {action: action_stats(records) for action, records in sorted(by_action.items())},
+        "timeline": timeline,
+    }
+
+
+def run_load(
+    host: str,
+    port: int,
+    users: int,
+    processes: int,
+    mix: Dict[str, int],
+    rate: float,
+    think: float,
+    duration: float,
+    interval: float,
+    seed: int,
+) -> Dict[str, Any]:
+    """Run one workload against the server at ``host``:``port`` and summarize it."""
+    processes = max(1, min(processes, users))
+    jobs = [
+        (host, port, i, users // processes + (i < users % processes), mix, rate / processes, think, duration, seed)
+        for i in range(processes)
+    ]
+    context = multiprocessing.get_context("spawn")
+    # One job per process: each waits at the barrier until all have started
+    with context.Pool(processes, initializer=_init_client, initargs=(context.Barrier(processes),)) as pool:
+        results = pool.map(_client, jobs, chunksize=1)
+    requests = [r for result in results for r in result["requests"]]
+    actions = [a for result in results for a in result["actions"]]
+    summary = summarize(requests, actions, duration, interval)
+    summary["unsent_actions"] = sum(result["unsent"] for result in results)
+    return summary
+
+
+def report(summary: Dict[str, Any]) -> None:
+    """Print a summary of ``run_load``."""
+    header = (f"{'':<32} {'count':>8} {'/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'errors':>7} {'4xx':>6} {'503':>6} {'locked':>7}")
+    print(header)
+    for route, stats in [("all requests", summary["requests"]), *summary["routes"].items()]:
+        print(f"{route:<32} {stats['count']:>8} {stats['throughput']:>9.1f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['errors']:>7} {stats['client_errors']:>6} "
+              f"{stats['rejected']:>6} {stats['locked']:>7}")
+    print(f"\n{'action':<32} {'count':>8} {'/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failed':>7}")
+    for action, stats in [("all actions", summary["actions"]), *summary["by_action"].items()]:
+        print(f"{action:<32} {stats['count']:>8} {stats['throughput']:>9.1f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['failed']:>7}")
+    if summary["unsent_actions"]:
+        print(f"{summary['unsent_actions']} scheduled actions were never sent: the server fell behind the rate")
+    print(f"\n{'t (s)':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} {'503':>6} {'locked':>7}")
+    for window in summary["timeline"]:
+        print(f"{window['t']:>8.1f} {window['throughput']:>9.1f} {window['p50_ms']:>9.2f} {window['p99_ms']:>9.2f} "
+              f"{window['errors']:>7} {window['rejected']:>6} {window['locked']:>7}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Drive the API with simulated dashboard users")
+    parser.add_argument("--orders", type=int, default=100000, help="Dataset size")
+    parser.add_argument("--seed", type=int, default=42, help="Dataset and workload seed")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--users", type=int, default=16, help="Simulated users (connections)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Open loop: actions per second (default: closed loop)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Closed loop: mean think time between actions")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="dashboard", help="Action mix")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds per timeline interval")
+    parser.add_argument(
+        "--processes", type=int, default=max((os.cpu_count() or 2) // 2, 1), help="Client processes"
+    )
+    parser.add_argument("--output", default="loadgen-results.json", help="Where to write results")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if more requests than this fraction fail")
+    args = parser.parse_args(argv)
+
+    mix = MIXES[args.mix]
+    with tempfile.TemporaryDirectory(prefix="orders-loadgen-") as workdir:
+        if args.url:
+            target = urlsplit(args.url)
+            host, serving = target.hostname or "127.0.0.1", nullcontext(target.port or 80)
+        else:
+            path = datasets.prepare(args.orders, args.seed, workdir)
+            host, serving = "127.0.0.1", server.running(path, args.workers)
+        with serving as port:
+            summary = run_load(
+                host, port, args.users, args.processes, mix, args.rate, args.think_ms / 1000,
+                args.duration, args.interval, args.seed,
+            )
+
+    report(summary)
+    config = {
+        "orders": None if args.url else args.orders, "url": args.url, "workers": args.workers,
+        "users": args.users, "rate": args.rate, "think_ms": args.think_ms, "mix": args.mix,
+        "duration": args.duration, "interval": args.interval,
+    }
+    with open(args.output, "w") as f:
+        json.dump({"config": config, **summary}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.max_error_rate is not None and summary["requests"]["error_rate"] > args.max_error_rate:
+        print(f"Error rate {summary['requests']['error_rate']:.2%} above {args.max_error_rate:.2%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""
+Benchmark Runner
+
+Seeds datasets of the requested sizes and drives every orders and items
+route through the ASGI app in-process, recording throughput, latency
+percentiles and SQL statements per request. Results are written as JSON and
+can be compared against a baseline, failing on regressions.
+
+Online backup throughput is measured too, along with request latency while
+a backup runs.
+
+``--engine memory`` serves orders from the in-memory storage engine instead,
+which separates the cost of the Python layers from the cost of SQLite.
+
+Usage:
+    python -m benchmarks.run run --sizes 1000,100000 --output results.json
+    python -m benchmarks.run run --baseline baseline.json --threshold 0.15
+    python -m benchmarks.run run --engine memory --sizes 100000
+    python -m benchmarks.run compare baseline.json results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app import database  # noqa: E402
+from benchmarks import datasets  # noqa: E402
+from benchmarks.asgi import ASGIClient  # noqa: E402
+
+Request = Tuple[str, str, Any]
+
+_statements = 0
+
+
+def _count_statement(conn, sql, params, seconds, many) -> None:
+    global _statements
+    _statements += 1
+
+
+database.add_query_hook(_count_statement)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(
+    client: ASGIClient,
+    make_request: Callable[[int], Request],
+    iterations: int,
+    warmup: int = 0,
+    on_response: Optional[Callable[[Any], None]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict[str, float]:
+    """Issue ``iterations`` requests and summarize their latency and response size."""
+    for i in range(warmup):
+        method, url, body = make_request(i)
+        client.request(method, url, body, headers)
+
+    latencies: List[float] = []
+    response_bytes = 0
+    statements_before = _statements
+    started = time.perf_counter()
+    for i in range(iterations):
+        method, url, body = make_request(i)
+        t0 = time.perf_counter()
+        response = client.request(method, url, body, headers)
+        latencies.append(time.perf_counter() - t0)
+        response_bytes += len(response.body)
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {url} -> {response.status}: {response.body[:200]!r}")
+        if on_response is not None:
+            on_response(response)
+    elapsed = time.perf_counter() - started
+    statements = _statements - statements_before
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "throughput_rps": round(iterations / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "statements_per_request": round(statements / iterations, 2),
+        "response_bytes": response_bytes // iterations,
+    }
+
+
+def run_dataset(path: str, iterations: int, seed: int, engine: str = "sqlite") -> Dict[str, Dict[str, float]]:
+    """Run every scenario against one database file."""
+    from app.main import app
+    from app.routes.orders import encoding, repository
+
+    database.DATABASE_PATH = path
+    repository.set_repository(repository.create_repository(engine))
+    conn = sqlite3.connect(path)
+    max_order_id = conn.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+    total_orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    max_item_id = conn.execute("SELECT MAX(id) FROM items").fetchone()[0]
+    max_customer_id = conn.execute("SELECT MAX(id) FROM customers").fetchone()[0]
+    conn.close()
+
+    rng = random.Random(seed)
+    results: Dict[str, Dict[str, float]] = {}
+    reads = iterations
+    writes = max(iterations // 2, 1)
+    bulk = max(iterations // 10, 1)
+
+    def record(name: str, make_request, count: int, **kwargs) -> None:
+        results[name] = measure(client, make_request, count, **kwargs)
+        print(f"  {name:<48} p50={results[name]['p50_ms']:>9.3f}ms "
+              f"p95={results[name]['p95_ms']:>9.3f}ms {results[name]['throughput_rps']:>9.1f} req/s "
+              f"{results[name]['response_bytes']:>8}B")
+
+    def random_order_id(i: int) -> int:
+        return rng.randint(1, max_order_id)
+
+    last_page = max(1, (total_orders + 99) // 100)
+
+    with ASGIClient(app) as client:
+        # Reads
+        record("GET /orders page=1", lambda i: ("GET", "/orders?page=1&limit=10", None), reads, warmup=5)
+        record("GET /orders deep page (middle)",
+               lambda i: ("GET", f"/orders?page={max(1, last_page // 2)}&limit=100", None), reads)
+        record("GET /orders deep page (last)",
+               lambda i: ("GET", f"/orders?page={last_page}&limit=100", None), reads)
+        record("GET /orders status filter",
+               lambda i: ("GET", f"/orders?status={datasets.STATUSES[i % 3]}&page=2&limit=10", None), reads)
+        record("GET /orders/stats", lambda i: ("GET", "/orders/stats", None), reads)
+        record("GET /orders/{id}", lambda i: ("GET", f"/orders/{random_order_id(i)}", None), reads)
+        record("GET /orders/analytics", lambda i: ("GET", "/orders/analytics", None), reads, warmup=1)
+
+        def analytics_after_write(i: int) -> Request:
+            # Untimed write, so each timed request refreshes the snapshot
+            client.request("PUT", f"/orders/{random_order_id(i)}", {"total_amount": rng.randint(100, 99999) / 100})
+            return "GET", "/orders/analytics", None
+
+        record("GET /orders/analytics after a write", analytics_after_write, reads)
+        record("GET /customers/{id}/orders",
+               lambda i: ("GET", f"/customers/{rng.randint(1, max_customer_id)}/orders", None), reads)
+        # Response encodings of a full page, with and without compression
+        for label, accept in (("json", encoding.JSON), ("msgpack", encoding.MSGPACK),
+                              ("columnar json", encoding.COLUMNAR_JSON),
+                              ("columnar msgpack", encoding.COLUMNAR_MSGPACK)):
+            for accept_encoding in ("identity", "gzip"):
+                record(f"GET /orders limit=100 {label} {accept_encoding}",
+                       lambda i: ("GET", f"/orders?page={i % last_page + 1}&limit=100", None), reads,
+                       headers={"accept": accept, "accept-encoding": accept_encoding})
+        record("GET /items", lambda i: ("GET", "/items", None), reads)
+        record("GET /items deep cursor (middle)", lambda i: ("GET", f"/items?after={max_item_id // 2}", None), reads)
+        record("GET /items deep cursor (last)",
+               lambda i: ("GET", f"/items?after={max(max_item_id - 100, 0)}", None), reads)
+        record("GET /items format=ndjson", lambda i: ("GET", "/items?format=ndjson", None), reads)
+        record("GET /items/{id}", lambda i: ("GET", f"/items/{rng.randint(1, max_item_id)}", None), reads)
+
+        # Single-row writes; created rows are removed again by the delete scenarios.
+        created_orders: List[int] = []
+        created_items: List[int] = []
+        record(
+            "POST /orders",
+            lambda i: ("POST", "/orders", {
+                "order_number": f"#BENCHNEW{seed}-{i}-{rng.random()}",
+                "customer_name": "Bench Customer",
+                "order_date": "2024-12-17",
+                "status": "Pending",
+                "total_amount": 12.5,
+                "payment_status": "Unpaid",
+            }),
+            writes,
+            on_response=lambda r: created_orders.append(r.json()["id"]),
+        )
+        record("PUT /orders/{id}",
+               lambda i: ("PUT", f"/orders/{created_orders[i % len(created_orders)]}", {"status": "Completed"}),
+               writes)
+        record("DELETE /orders/{id}", lambda i: ("DELETE", f"/orders/{created_orders[i]}", None), writes)
+        record("POST /items", lambda i: ("POST", "/items", {"name": f"bench-{i}"}), writes,
+               on_response=lambda r: created_items.append(r.json()["id"]))
+        record("PUT /items/{id}",
+               lambda i: ("PUT", f"/items/{created_items[i % len(created_items)]}", {"name": "renamed"}), writes)
+        record("DELETE /items/{id}", lambda i: ("DELETE", f"/items/{created_items[i]}", None), writes)
+        item_batches: List[List[int]] = []
+        record("POST /items/bulk n=100",
+               lambda i: ("POST", "/items/bulk", {"items": [{"name": f"bench-{i}-{j}"} for j in range(100)]}),
+               bulk,
+               on_response=lambda r: item_batches.append([item["id"] for item in r.json()["items"]]))
+        record("PUT /items/bulk n=100",
+               lambda i: ("PUT", "/items/bulk",
+                          {"items": [{"id": item_id, "name": "renamed"} for item_id in item_batches[i]]}),
+               len(item_batches))
+        record("DELETE /items/bulk n=100",
+               lambda i: ("DELETE", "/items/bulk", {"ranges": [[item_batches[i][0], item_batches[i][-1]]]}),
+               len(item_batches))
+
+        # Bulk operations at increasing selection sizes. Duplicates are
+        # deleted again so the dataset size stays stable.
+        for size in (10, 100, 1000):
+            if size > total_orders:
+                continue
+
+            def selection(i: int, size: int = size) -> List[int]:
+                start = rng.randint(1, max(1, max_order_id - size))
+                return list(range(start, start + size))
+
+            record(f"PUT /orders/bulk/status n={size}",
+                   lambda i: ("PUT", "/orders/bulk/status",
+                              {"order_ids": selection(i), "status": datasets.STATUSES[i % 3]}),
+                   bulk)
+            record(f"POST /orders/print n={size}",
+                   lambda i: ("POST", "/orders/print", {"order_ids": selection(i)}), bulk)
+            duplicated: List[List[int]] = []
+            record(f"POST /orders/bulk/duplicate n={size}",
+                   lambda i: ("POST", "/orders/bulk/duplicate", {"order_ids": selection(i)}),
+                   bulk,
+                   on_response=lambda r: duplicated.append([o["id"] for o in r.json()["orders"]]))
+            record(f"DELETE /orders/bulk n={size}",
+                   lambda i: ("DELETE", "/orders/bulk", {"order_ids": duplicated[i]}),
+                   len(duplicated))
+
+        # Online backup: copy throughput, and request latency while copies
+        # run back to back in the background (compare with the plain
+        # GET/PUT /orders/{id} scenarios above).
+        target = os.path.join(os.path.dirname(path), "bench-backup.db")
+        idle = _copy(path, target)
+        with BackgroundBackup(path, target) as copier:
+            record("GET /orders/{id} during backup", lambda i: ("GET", f"/orders/{random_order_id(i)}", None), reads)
+            record("PUT /orders/{id} during backup",
+                   lambda i: ("PUT", f"/orders/{random_order_id(i)}", {"payment_status": "Paid"}), writes)
+        results["backup"] = {"idle_mb_per_s": idle["mb_per_s"], **copier.summary()}
+        print(f"  {'backup':<48} idle={idle['mb_per_s']:>8.1f}MB/s "
+              f"under load={results['backup']['mb_per_s']:>8.1f}MB/s ({results['backup']['copies']} copies)")
+    return results
+
+
+def _copy(source: str, target: str) -> Dict[str, float]:
+    """Back ``source`` up into ``target`` once and return the copy's stats."""
+    from app.backup import copy_database
+
+    if os.path.exists(target):
+        os.remove(target)
+    stats = copy_database(source, target)
+    size = os.path.getsize(target)
+    stats["bytes"] = size
+    stats["mb_per_s"] = round(size / (1024 * 1024) / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
+
+
+class BackgroundBackup:
+    """Copies a database with the online backup API in a loop on a thread."""
+
+    def __init__(self, source: str, target: str) -> None:
+        self.source = source
+        self.target = target
+        self.copies: List[Dict[str, float]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.copies.append(_copy(self.source, self.target))
+
+    def __enter__(self) -> "BackgroundBackup":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        os.remove(self.target)
+
+    def summary(self) -> Dict[str, float]:
+        seconds = sum(copy["seconds"] for copy in self.copies)
+        size = sum(copy["bytes"] for copy in self.copies)
+        return {
+            "copies": len(self.copies),
+            "restarts": sum(copy["restarts"] for copy in self.copies),
+            "mb_per_s": round(size / (1024 * 1024) / seconds, 1) if seconds else 0.0,
+        }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Return a description of every metric that regressed beyond ``threshold``."""
+    regressions = []
+    for size, scenarios in current["results"].items():
+        base_scenarios = baseline["results"].get(size, {})
+        for name, stats in scenarios.items():
+            base = base_scenarios.get(name)
+            if base is None or "p50_ms" not in stats:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                if base[key] > 0 and stats[key] > base[key] * (1 + threshold):
+                    regressions.append(
+                        f"[{size}] {name}: {key} {base[key]:.3f} -> {stats[key]:.3f} "
+                        f"(+{(stats[key] / base[key] - 1) * 100:.1f}%)"
+                    )
+            if base["throughput_rps"] > 0 and stats["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                regressions.append(
+                    f"[{size}] {name}: throughput {base['throughput_rps']:.1f} -> {stats['throughput_rps']:.1f} req/s"
+                )
+    return regressions
+
+
+def report_regressions(regressions: List[str], threshold: float) -> int:
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold * 100:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {threshold * 100:.0f}%.")
+    return 0
+
+
+def run(args) -> int:
+    sizes = [int(s) for s in args.sizes.split(",")]
+    output: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "engine": args.engine,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="orders-bench-") as workdir:
+        for size in sizes:
+            print(f"\nDataset: {size} orders")
+            path = datasets.prepare(size, args.seed, workdir)
+            output["results"][str(size)] = run_dataset(path, args.iterations, args.seed, args.engine)
+            os.remove(path)
+
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return report_regressions(compare(baseline, output, args.threshold), args.threshold)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Orders API benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--sizes", default="1000,100000,1000000", help="Comma-separated order counts")
+    run_parser.add_argument("--iterations", type=int, default=200, help="Requests per read scenario")
+    run_parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request mix")
+    run_parser.add_argument("--output", default="benchmark-results.json", help="Where to write results")
+    run_parser.add_argument("--engine", choices=["sqlite", "memory"], default="sqlite", help="Order storage engine")
+    run_parser.add_argument("--baseline", help="Baseline results to compare against")
+    run_parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+
+    compare_parser = sub.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return report_regressions(compare(baseline, current, args.threshold), args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Worker Scaling Benchmark
+
+Starts ``serve.py --workers N`` for each requested worker count against the
+same seeded database and drives it over HTTP with a pool of client
+processes, reporting read throughput, latency and scaling efficiency
+relative to a single worker.
+
+Usage:
+    python -m benchmarks.scaling --orders 100000 --workers 1,2,4 --clients 8
+    python -m benchmarks.scaling --workers 1,4 --min-efficiency 0.8
+
+Client processes share the machine with the server, so the numbers are only
+meaningful while workers plus clients fit in the available cores.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import datasets, server  # noqa: E402
+from benchmarks.run import percentile  # noqa: E402
+
+DEFAULT_PATHS = ("/orders?page=1&limit=50", "/orders?page=20&limit=50&status=Completed", "/orders/stats")
+
+
+def _client(args: Tuple[int, List[str], float, float]) -> Tuple[int, int, List[float]]:
+    """Closed-loop client: one keep-alive connection, requests until the deadline."""
+    port, paths, start_at, duration = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies: List[float] = []
+    errors = 0
+    i = os.getpid()
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + duration
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+    return len(latencies), errors, latencies
+
+
+def run_workers(
+    path: str, workers: int, clients: int, duration: float, warmup: float, paths: List[str]
+) -> Dict[str, float]:
+    """Benchmark one worker count and return its summary."""
+    with server.running(path, workers) as port:
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            if warmup:
+                pool.map(_client, [(port, paths, time.time() + 0.5, warmup)] * clients)
+            start_at = time.time() + 0.5
+            results = pool.map(_client, [(port, paths, start_at, duration)] * clients)
+
+    completed = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(latency for r in results for latency in r[2])
+    return {
+        "workers": workers,
+        "clients": clients,
+        "requests": completed,
+        "errors": errors,
+        "throughput_rps": round(completed / duration, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure read throughput scaling across worker processes")
+    parser.add_argument("--orders", type=int, default=100000, help="Dataset size")
+    parser.add_argument("--seed", type=int, default=42, help="Dataset seed")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=max(os.cpu_count() or 1, 2), help="Client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds per worker count")
+    parser.add_argument("--path", action="append", help="Request path to cycle through (repeatable)")
+    parser.add_argument("--output", default="scaling-results.json", help="Where to write results")
+    parser.add_argument(
+        "--min-efficiency",
+        type=float,
+        help="Fail unless throughput(N) / (N * throughput(1)) reaches this for every N",
+    )
+    args = parser.parse_args(argv)
+
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    paths = args.path or list(DEFAULT_PATHS)
+    cores = os.cpu_count() or 1
+    if max(worker_counts) + args.clients > cores:
+        print(f"warning: {max(worker_counts)} workers + {args.clients} clients exceed {cores} cores; "
+              "scaling will be understated")
+
+    with tempfile.TemporaryDirectory(prefix="orders-scaling-") as workdir:
+        path = datasets.prepare(args.orders, args.seed, workdir)
+        results = []
+        for workers in worker_counts:
+            result = run_workers(path, workers, args.clients, args.duration, args.warmup, paths)
+            results.append(result)
+
+    base = next((r["throughput_rps"] for r in results if r["workers"] == 1), None)
+    failed = False
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'speedup':>8} {'efficiency':>10}")
+    for result in results:
+        if base:
+            result["speedup"] = round(result["throughput_rps"] / base, 2)
+            result["efficiency"] = round(result["speedup"] / result["workers"], 2)
+        print(f"{result['workers']:>8} {result['throughput_rps']:>10.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result.get('speedup', 0):>8.2f} {result.get('efficiency', 0):>10.2f}")
+        if args.min_efficiency is not None and result.get("efficiency", 1.0) < args.min_efficiency:
+            failed = True
+
+    with open(args.output, "w") as f:
+        json.dump({"orders": args.orders, "cores": cores, "paths": paths, "results": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if failed:
+        print(f"Scaling efficiency below {args.min_efficiency}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
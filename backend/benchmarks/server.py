@@ -0,0 +1,63 @@
+"""Run ``serve.py`` as a subprocess for the HTTP benchmarks."""
+
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Generator, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 30.0) -> None:
+    """Wait until the server on ``port`` answers ``GET /health``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not become ready")
+
+
+@contextmanager
+def running(path: str, workers: int = 1, env: Optional[Dict[str, str]] = None) -> Generator[int, None, None]:
+    """Serve the database at ``path`` with ``workers`` processes; yields the port.
+
+    Metrics are merged through a temporary METRICS_DIR and profiling is off.
+    ``env`` adds to or overrides the server's environment.
+    """
+    port = free_port()
+    metrics_dir = tempfile.mkdtemp(prefix="orders-metrics-")
+    server_env = dict(os.environ, DATABASE_PATH=path, METRICS_DIR=metrics_dir, PROFILING_ENABLED="0")
+    server_env.update(env or {})
+    server = subprocess.Popen(
+        [
+            sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env=server_env,
+    )
+    try:
+        wait_ready(port)
+        yield port
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,187 @@
+"""
+Startup Benchmark
+
+Starts the server the way the container does against a seeded database
+whose pages have been dropped from the OS page cache, and measures:
+
+- ready: time from spawning the process to the first 200 from /health;
+- first: latency of each dashboard request the first time it is served;
+- warm: latency of the same request once everything has been served once.
+
+Each mode is started ``--trials`` times and the medians are reported:
+
+- ``two-step``: ``migrate.py upgrade`` then ``serve.py``, without warmup
+  (the container command before ``serve.py --migrate``);
+- ``no-warmup``: ``serve.py --migrate`` with WARMUP_ENABLED=0;
+- ``warmup``: ``serve.py --migrate`` with the startup warmup.
+
+Usage:
+    python -m benchmarks.startup --orders 1000000 --trials 5
+    python -m benchmarks.startup --modes no-warmup,warmup --output startup.json
+
+Dropping the page cache uses ``posix_fadvise`` and needs no privileges; where
+it is unavailable every start after the first finds the pages cached.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import SHARD_COUNT, shard_path  # noqa: E402
+from benchmarks import datasets, server  # noqa: E402
+
+# What the dashboard requests on load, then a page flip and a tab switch
+DEFAULT_PATHS = (
+    "/orders?page=1&limit=10",
+    "/orders/stats",
+    "/orders?page=2&limit=10",
+    "/orders?page=1&limit=10&status=Completed",
+)
+
+MODES = {
+    "two-step": (["migrate.py upgrade", "serve.py"], "0"),
+    "no-warmup": (["serve.py --migrate"], "0"),
+    "warmup": (["serve.py --migrate"], "1"),
+}
+
+
+def drop_page_cache(path: str) -> None:
+    """Evict the database files at ``path`` (every shard, WAL and index) from the OS page cache."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for shard in range(SHARD_COUNT):
+        for suffix in ("", "-wal", "-shm"):
+            name = shard_path(shard, path) + suffix
+            if not os.path.exists(name):
+                continue
+            fd = os.open(name, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def _get(conn: http.client.HTTPConnection, path: str) -> float:
+    start = time.perf_counter()
+    conn.request("GET", path)
+    response = conn.getresponse()
+    response.read()
+    elapsed = time.perf_counter() - start
+    if response.status != 200:
+        raise RuntimeError(f"GET {path} returned {response.status}")
+    return elapsed
+
+
+def start_once(path: str, mode: str, paths: List[str], timeout: float = 60.0) -> Dict[str, object]:
+    """Cold-start the server once in ``mode`` and time readiness and requests."""
+    commands, warmup = MODES[mode]
+    port = server.free_port()
+    server_args = f"--host 127.0.0.1 --port {port} --log-level warning --no-access-log"
+    # exec, so that terminating the shell's PID stops the server itself
+    script = " && ".join(
+        f"exec {sys.executable} {command} {server_args}" if command.startswith("serve.py")
+        else f"{sys.executable} {command} > /dev/null"
+        for command in commands
+    )
+    metrics_dir = tempfile.mkdtemp(prefix="orders-metrics-")
+    env = dict(
+        os.environ, DATABASE_PATH=path, METRICS_DIR=metrics_dir, PROFILING_ENABLED="0",
+        MAINTENANCE_ENABLED="0", WARMUP_ENABLED=warmup,
+    )
+
+    drop_page_cache(path)
+    start = time.perf_counter()
+    process = subprocess.Popen(["sh", "-c", script], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        while True:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+                _get(conn, "/health")
+                break
+            except OSError:
+                if time.perf_counter() > deadline or process.poll() is not None:
+                    raise RuntimeError(f"server in mode {mode} did not become ready")
+                time.sleep(0.005)
+        ready = time.perf_counter() - start
+        first = {p: _get(conn, p) for p in paths}
+        warm = {p: _get(conn, p) for p in paths}
+        conn.request("GET", "/health")
+        report = json.loads(conn.getresponse().read())["startup"]
+        conn.close()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    return {"ready": ready, "first": first, "warm": warm, "warmup_ms": report["warmup_ms"]}
+
+
+def run_mode(path: str, mode: str, trials: int, paths: List[str]) -> Dict[str, object]:
+    """Start the server ``trials`` times in ``mode`` and return the medians."""
+    runs = [start_once(path, mode, paths) for _ in range(trials)]
+    steps = sorted({step for run in runs for step in run["warmup_ms"]})
+    return {
+        "mode": mode,
+        "trials": trials,
+        "ready_ms": round(statistics.median(run["ready"] for run in runs) * 1000, 1),
+        "warmup_ms": {
+            step: round(statistics.median(run["warmup_ms"].get(step, 0.0) for run in runs), 1) for step in steps
+        },
+        "first_request_ms": {
+            p: round(statistics.median(run["first"][p] for run in runs) * 1000, 2) for p in paths
+        },
+        "warm_request_ms": {
+            p: round(statistics.median(run["warm"][p] for run in runs) * 1000, 2) for p in paths
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure server startup time and first-request latency")
+    parser.add_argument("--orders", type=int, default=100000, help="Dataset size")
+    parser.add_argument("--seed", type=int, default=42, help="Dataset seed")
+    parser.add_argument("--trials", type=int, default=5, help="Starts per mode")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated modes: {', '.join(MODES)}")
+    parser.add_argument("--path", action="append", help="Request path to time after startup (repeatable)")
+    parser.add_argument("--output", default="startup-results.json", help="Where to write results")
+    args = parser.parse_args(argv)
+
+    modes = args.modes.split(",")
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+    paths = args.path or list(DEFAULT_PATHS)
+
+    with tempfile.TemporaryDirectory(prefix="orders-startup-") as workdir:
+        path = datasets.prepare(args.orders, args.seed, workdir)
+        results = [run_mode(path, mode, args.trials, paths) for mode in modes]
+
+    width = max(len(p) for p in paths)
+    print(f"{'mode':<10} {'ready ms':>9}  {'path':<{width}} {'first ms':>9} {'warm ms':>8}")
+    for result in results:
+        for i, p in enumerate(paths):
+            label = f"{result['mode']:<10} {result['ready_ms']:>9.1f}" if i == 0 else " " * 20
+            print(f"{label}  {p:<{width}} {result['first_request_ms'][p]:>9.2f} {result['warm_request_ms'][p]:>8.2f}")
+        if result["warmup_ms"]:
+            steps = ", ".join(f"{step} {ms:.1f} ms" for step, ms in result["warmup_ms"].items())
+            print(f"{'':20}  warmup: {steps}")
+
+    with open(args.output, "w") as f:
+        json.dump({"orders": args.orders, "paths": paths, "results": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,19 @@
 """
 Database Migration Runner
 
-This script runs all pending migrations in order or reverts them.
+This script runs all pending migrations in order or reverts them, on a
+single shared connection. ``PRAGMA user_version`` records the number of the
+last migration applied, so an up-to-date database is recognised at startup
+without loading any migration module.
 """
 
 import os
 import glob
 import importlib.util
 import argparse
-import sqlite3
 
-from app.database import DATABASE_PATH
+import migrations
+from app.database import ensure_shards
 
 
 def get_migration_files():
@@ -30,38 +33,65 @@ def load_migration_module(filepath):
     return module
 
 
-def run_migrations(action="upgrade"):
-    """Run all migrations."""
-    migration_files = get_migration_files()
-    
-    if action == "downgrade":
-        migration_files = reversed(list(migration_files))
-    
-    for filepath in migration_files:
-        module = load_migration_module(filepath)
-        if action == "upgrade":
-            module.upgrade()
-        elif action == "downgrade":
-            module.downgrade()
+def migration_version(filepath):
+    """Version number of a migration file (``004_...`` -> 4)."""
+    return int(os.path.basename(filepath)[:3])
 
 
-def list_migrations():
-    """List all migrations and their status."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Ensure migrations table exists
-    cursor.execute("""
+def schema_version(conn):
+    """Version of the last migration applied to the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def applied_migrations(conn):
+    """Names and application times of the migrations recorded as applied."""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS _migrations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL UNIQUE,
             applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
-    
-    # Get applied migrations
-    cursor.execute("SELECT name, applied_at FROM _migrations ORDER BY id")
-    applied = {row[0]: row[1] for row in cursor.fetchall()}
+    conn.commit()
+    return dict(conn.execute("SELECT name, applied_at FROM _migrations ORDER BY id").fetchall())
+
+
+def run_migrations(action="upgrade"):
+    """Run all pending migrations, or revert all of them."""
+    migration_files = get_migration_files()
+    latest = migration_version(migration_files[-1]) if migration_files else 0
+
+    conn = migrations.connect()
+    try:
+        if action == "upgrade" and schema_version(conn) >= latest:
+            print(f"Schema is up to date (version {latest}).")
+        elif action == "upgrade":
+            applied = applied_migrations(conn)
+            for filepath in migration_files:
+                name = os.path.basename(filepath).replace(".py", "")
+                if name not in applied:
+                    load_migration_module(filepath).upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {migration_version(filepath)}")
+                conn.commit()
+        elif action == "downgrade":
+            for filepath in reversed(migration_files):
+                load_migration_module(filepath).downgrade(conn)
+                conn.execute(f"PRAGMA user_version = {migration_version(filepath) - 1}")
+                conn.commit()
+    finally:
+        conn.close()
+
+    # Shards other than DATABASE_PATH only hold orders, created from the
+    # migrated schema
+    if action == "upgrade":
+        ensure_shards()
+
+
+def list_migrations():
+    """List all migrations and their status."""
+    conn = migrations.connect()
+    applied = applied_migrations(conn)
+    version = schema_version(conn)
     conn.close()
     
     # Get all migration files
@@ -78,6 +108,7 @@ def list_migrations():
             print(f"[PENDING] {name}")
     
     print("-" * 60)
+    print(f"Schema version: {version}")
 
 
 if __name__ == "__main__":
@@ -87,8 +118,22 @@ if __name__ == "__main__":
         choices=["upgrade", "downgrade", "list"],
         help="Migration action: upgrade (apply all), downgrade (revert all), list (show status)"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=migrations.BATCH_SIZE,
+        help="Rows updated per transaction by online backfills",
+    )
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=migrations.PAUSE,
+        help="Seconds to sleep between backfill batches, leaving room for live traffic",
+    )
     
     args = parser.parse_args()
+    migrations.BATCH_SIZE = args.batch_size
+    migrations.PAUSE = args.pause
     
     if args.action == "list":
         list_migrations()
@@ -0,0 +1,241 @@
+"""
+Migration: Compact typed order storage
+Version: 003
+Description: Rebuilds the orders table with integer columns: order dates as days
+since 1970-01-01, amounts as integer cents, and status / payment status as small
+integer codes backed by the order_statuses and payment_statuses lookup tables.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import connection
+
+
+MIGRATION_NAME = "003_compact_order_storage"
+
+# Julian day number of 1970-01-01, used to convert between dates and day counts.
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+# Non-ISO formats found in order_date before it was validated, tried in order
+# (month first, as the dashboard displays dates)
+DATE_FORMATS = ("%m/%d/%Y", "%Y/%m/%d", "%d.%m.%Y", "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y")
+
+
+def _parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date().isoformat()
+        except (AttributeError, ValueError):
+            continue
+    return None
+
+
+def _normalize_dates(cursor):
+    """Rewrite order dates SQLite cannot read as YYYY-MM-DD.
+
+    order_date used to be an unvalidated string. Dates in a known format are
+    converted; if any remain, the migration stops before changing anything
+    and lists the offending orders.
+    """
+    cursor.execute("SELECT id, order_date FROM orders WHERE julianday(order_date) IS NULL")
+    rows = cursor.fetchall()
+    fixed = [(_parse_date(value), order_id) for order_id, value in rows]
+    invalid = [(order_id, value) for (day, order_id), (_, value) in zip(fixed, rows) if day is None]
+    if invalid:
+        listed = ", ".join(f"{order_id} ({value!r})" for order_id, value in invalid[:20])
+        more = f" and {len(invalid) - 20} more" if len(invalid) > 20 else ""
+        raise RuntimeError(
+            f"Migration {MIGRATION_NAME}: orders with an unrecognized order_date: {listed}{more}. "
+            "Set them to YYYY-MM-DD and run the migration again."
+        )
+    cursor.executemany("UPDATE orders SET order_date = ? WHERE id = ?", fixed)
+    if fixed:
+        print(f"  {MIGRATION_NAME}: converted {len(fixed)} order dates to YYYY-MM-DD")
+
+
+def _copy_sequence(cursor, table):
+    """Keep AUTOINCREMENT from reusing IDs of rows deleted before the rebuild."""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _restore_sequence(cursor, table, seq):
+    if seq is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq, table))
+
+
+def upgrade(conn=None):
+    """Apply the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Ensure migrations table exists
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _migrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+        # Check if this migration has already been applied
+        cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+        if cursor.fetchone():
+            print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+            return
+
+        _normalize_dates(cursor)
+
+        # Lookup tables; the well-known values get fixed codes
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS order_statuses (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS payment_statuses (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+            """
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO order_statuses (id, name) VALUES (?, ?)",
+            [(1, "Pending"), (2, "Completed"), (3, "Refunded")],
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO payment_statuses (id, name) VALUES (?, ?)",
+            [(1, "Paid"), (2, "Unpaid")],
+        )
+        cursor.execute("INSERT OR IGNORE INTO order_statuses (name) SELECT DISTINCT status FROM orders")
+        cursor.execute("INSERT OR IGNORE INTO payment_statuses (name) SELECT DISTINCT payment_status FROM orders")
+
+        # Rebuild orders with compact columns
+        seq = _copy_sequence(cursor, "orders")
+        cursor.execute(
+            """
+            CREATE TABLE orders_compact (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_number TEXT NOT NULL UNIQUE,
+                customer_name TEXT NOT NULL,
+                order_day INTEGER NOT NULL,
+                status_id INTEGER NOT NULL REFERENCES order_statuses (id),
+                total_cents INTEGER NOT NULL,
+                payment_status_id INTEGER NOT NULL REFERENCES payment_statuses (id)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO orders_compact
+                (id, order_number, customer_name, order_day, status_id, total_cents, payment_status_id)
+            SELECT o.id, o.order_number, o.customer_name,
+                   CAST(julianday(o.order_date) - ? AS INTEGER),
+                   s.id, CAST(ROUND(o.total_amount * 100) AS INTEGER), p.id
+            FROM orders o
+            JOIN order_statuses s ON s.name = o.status
+            JOIN payment_statuses p ON p.name = o.payment_status
+            """,
+            (UNIX_EPOCH_JULIAN_DAY,),
+        )
+        cursor.execute("DROP TABLE orders")
+        cursor.execute("ALTER TABLE orders_compact RENAME TO orders")
+        _restore_sequence(cursor, "orders", seq)
+
+        # Status lookups and the per-status page query (rowid is implied as the
+        # trailing key), and date range scans
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders (status_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_order_day ON orders (order_day)")
+
+        # Record this migration
+        cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade(conn=None):
+    """Revert the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # The table rebuild is not idempotent, so only revert if applied
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '_migrations'"
+        )
+        if cursor.fetchone():
+            cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+        if cursor.fetchone() is None:
+            print(f"Migration {MIGRATION_NAME} not applied. Skipping.")
+            return
+
+        # Rebuild orders with the original TEXT/REAL columns
+        seq = _copy_sequence(cursor, "orders")
+        cursor.execute(
+            """
+            CREATE TABLE orders_text (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_number TEXT NOT NULL UNIQUE,
+                customer_name TEXT NOT NULL,
+                order_date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total_amount REAL NOT NULL,
+                payment_status TEXT NOT NULL
+            )
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO orders_text
+                (id, order_number, customer_name, order_date, status, total_amount, payment_status)
+            SELECT o.id, o.order_number, o.customer_name,
+                   date(o.order_day + ?),
+                   s.name, o.total_cents / 100.0, p.name
+            FROM orders o
+            JOIN order_statuses s ON s.id = o.status_id
+            JOIN payment_statuses p ON p.id = o.payment_status_id
+            """,
+            (UNIX_EPOCH_JULIAN_DAY,),
+        )
+        cursor.execute("DROP TABLE orders")
+        cursor.execute("ALTER TABLE orders_text RENAME TO orders")
+        _restore_sequence(cursor, "orders", seq)
+        cursor.execute("DROP TABLE IF EXISTS order_statuses")
+        cursor.execute("DROP TABLE IF EXISTS payment_statuses")
+
+        # Remove migration record
+        cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
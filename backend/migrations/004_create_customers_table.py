@@ -0,0 +1,181 @@
+"""
+Migration: Create customers table
+Version: 004
+Description: Moves customer details out of orders into a customers table.
+Orders get a customer_id foreign key and created_at/updated_at timestamps,
+backfilled in batches that are committed individually so a large table is
+never locked for the whole migration and an interrupted run can resume.
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import backfill, connection
+
+
+MIGRATION_NAME = "004_create_customers_table"
+
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def upgrade(conn=None):
+    """Apply the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Ensure migrations table exists
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _migrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+        # Check if this migration has already been applied
+        cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+        if cursor.fetchone():
+            print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+            return
+
+        # Create customers table and the new order columns. Each step checks for
+        # itself so a previously interrupted run picks up where it stopped.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT,
+                avatar TEXT,
+                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now')),
+                updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+            )
+            """
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)")
+        columns = _columns(cursor, "orders")
+        if "customer_id" not in columns:
+            cursor.execute("ALTER TABLE orders ADD COLUMN customer_id INTEGER REFERENCES customers (id)")
+            cursor.execute("ALTER TABLE orders ADD COLUMN created_at TEXT")
+            cursor.execute("ALTER TABLE orders ADD COLUMN updated_at TEXT")
+        if "customer_name" in columns:
+            cursor.execute(
+                """
+                INSERT INTO customers (name)
+                SELECT DISTINCT customer_name FROM orders
+                WHERE customer_name NOT IN (SELECT name FROM customers)
+                """
+            )
+        conn.commit()
+
+        # Online backfill: resumable rowid batches, one transaction each
+        if "customer_name" in columns:
+            backfill(
+                conn,
+                MIGRATION_NAME,
+                "orders",
+                """
+                customer_id = (
+                    SELECT id FROM customers WHERE name = orders.customer_name ORDER BY id LIMIT 1
+                ),
+                created_at = date(order_day + ?) || 'T00:00:00',
+                updated_at = date(order_day + ?) || 'T00:00:00'
+                """,
+                (UNIX_EPOCH_JULIAN_DAY, UNIX_EPOCH_JULIAN_DAY),
+                where="customer_id IS NULL",
+            )
+
+            # Drop the duplicated name now that every order points at a customer
+            cursor.execute("ALTER TABLE orders DROP COLUMN customer_name")
+
+        # Serves GET /customers/{id}/orders, newest first
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_customer_day ON orders (customer_id, order_day)"
+        )
+
+        # Record this migration
+        cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade(conn=None):
+    """Revert the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # The table rebuild is not idempotent, so only revert if applied
+        if "customer_id" not in _columns(cursor, "orders"):
+            print(f"Migration {MIGRATION_NAME} not applied. Skipping.")
+            return
+
+        # Rebuild orders with customer_name inlined again
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'")
+        row = cursor.fetchone()
+        seq = row[0] if row else None
+        cursor.execute(
+            """
+            CREATE TABLE orders_inline (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_number TEXT NOT NULL UNIQUE,
+                customer_name TEXT NOT NULL,
+                order_day INTEGER NOT NULL,
+                status_id INTEGER NOT NULL REFERENCES order_statuses (id),
+                total_cents INTEGER NOT NULL,
+                payment_status_id INTEGER NOT NULL REFERENCES payment_statuses (id)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO orders_inline
+                (id, order_number, customer_name, order_day, status_id, total_cents, payment_status_id)
+            SELECT o.id, o.order_number, c.name, o.order_day, o.status_id, o.total_cents, o.payment_status_id
+            FROM orders o
+            JOIN customers c ON c.id = o.customer_id
+            """
+        )
+        cursor.execute("DROP TABLE orders")
+        cursor.execute("ALTER TABLE orders_inline RENAME TO orders")
+        if seq is not None:
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'orders'", (seq,))
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders (status_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_order_day ON orders (order_day)")
+
+        # Drop customers table
+        cursor.execute("DROP TABLE IF EXISTS customers")
+
+        # Remove migration record
+        cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,104 @@
+"""
+Migration: Create sequences table
+Version: 005
+Description: Adds the _sequences table the server reserves blocks of order
+numbers from, starting the order_number sequence after the highest
+generated-style number already in use on any shard.
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.sequences import FIRST_ORDER_NUMBER, ORDER_NUMBER_PREFIX
+from migrations import connection, order_databases
+
+
+MIGRATION_NAME = "005_create_sequences_table"
+
+
+def _highest_number(conn):
+    pattern = ORDER_NUMBER_PREFIX.replace("[", "[[]").replace("*", "[*]").replace("?", "[?]") + "[0-9]*"
+    row = conn.execute(
+        "SELECT MAX(CAST(SUBSTR(order_number, ?) AS INTEGER)) FROM orders WHERE order_number GLOB ?",
+        (len(ORDER_NUMBER_PREFIX) + 1, pattern),
+    ).fetchone()
+    return row[0] or 0
+
+
+def upgrade(conn=None):
+    """Apply the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Ensure migrations table exists
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _migrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+        # Check if this migration has already been applied
+        cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+        if cursor.fetchone():
+            print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+            return
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _sequences (
+                name TEXT PRIMARY KEY,
+                next_value INTEGER NOT NULL
+            )
+            """
+        )
+        highest = max(_highest_number(db) for db in order_databases(conn))
+        cursor.execute(
+            "INSERT OR IGNORE INTO _sequences (name, next_value) VALUES ('order_number', ?)",
+            (max(highest + 1, FIRST_ORDER_NUMBER),),
+        )
+
+        # Record this migration
+        cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade(conn=None):
+    """Revert the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Drop sequences table
+        cursor.execute("DROP TABLE IF EXISTS _sequences")
+
+        # Remove migration record
+        cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
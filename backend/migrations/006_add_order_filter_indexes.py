@@ -0,0 +1,112 @@
+"""
+Migration: Add order filter indexes
+Version: 006
+Description: Adds partial covering indexes for the incomplete (Pending) and
+finished (Completed, Refunded) listing tabs on every orders database. They
+are in ID order and hold every column the filters test (status_id too, as
+SQLite does not infer it from the index's WHERE clause), so each tab's
+page and count are answered from the index alone.
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import connection, order_databases
+
+
+MIGRATION_NAME = "006_add_order_filter_indexes"
+
+# The WHERE clauses must match the literal predicates in
+# app/routes/orders/filters.py for SQLite to use the indexes.
+INDEXES = {
+    "idx_orders_incomplete": "status_id = 1",
+    "idx_orders_finished": "status_id IN (2, 3)",
+}
+INDEX_COLUMNS = "id, order_day, total_cents, payment_status_id, status_id"
+
+# Codes the predicates above (and filters.PENDING, COMPLETED, REFUNDED)
+# assume; migration 003 seeds them
+STATUS_CODES = {1: "Pending", 2: "Completed", 3: "Refunded"}
+
+
+def _check_status_codes(cursor):
+    cursor.execute("SELECT id, name FROM order_statuses WHERE id IN (1, 2, 3)")
+    codes = dict(cursor.fetchall())
+    if codes != STATUS_CODES:
+        raise RuntimeError(
+            f"Migration {MIGRATION_NAME}: order_statuses codes {codes} differ from {STATUS_CODES}, "
+            "which the tab indexes and filters rely on"
+        )
+
+
+def upgrade(conn=None):
+    """Apply the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Ensure migrations table exists
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _migrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+        # Check if this migration has already been applied
+        cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+        if cursor.fetchone():
+            print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+            return
+
+        _check_status_codes(cursor)
+
+        for db in order_databases(conn):
+            for name, where in INDEXES.items():
+                db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON orders ({INDEX_COLUMNS}) WHERE {where}")
+
+        # Record this migration
+        cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade(conn=None):
+    """Revert the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Drop filter indexes
+        for db in order_databases(conn):
+            for name in INDEXES:
+                db.execute(f"DROP INDEX IF EXISTS {name}")
+
+        # Remove migration record
+        cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,98 @@
+"""
+Migration: Enable incremental vacuum
+Version: 007
+Description: Switches the main database and every shard file to
+auto_vacuum=INCREMENTAL, so the maintenance scheduler (app/maintenance.py)
+can hand pages freed by deletes back to the filesystem in small slices.
+Changing the mode of an existing database needs a full VACUUM, which
+rewrites the file and holds the write lock until it is done: run this
+migration during a quiet period. It is a one-off; later vacuuming is
+incremental.
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import connection, order_databases
+
+
+MIGRATION_NAME = "007_enable_incremental_vacuum"
+
+NONE, INCREMENTAL = 0, 2
+
+
+def _set_auto_vacuum(db, mode):
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] == mode:
+        return
+    # VACUUM cannot run inside a transaction
+    db.commit()
+    db.execute(f"PRAGMA auto_vacuum = {mode}")
+    db.execute("VACUUM")
+
+
+def upgrade(conn=None):
+    """Apply the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Ensure migrations table exists
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _migrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+        # Check if this migration has already been applied
+        cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+        if cursor.fetchone():
+            print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+            return
+
+        for db in order_databases(conn):
+            _set_auto_vacuum(db, INCREMENTAL)
+
+        # Record this migration
+        cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade(conn=None):
+    """Revert the migration."""
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        for db in order_databases(conn):
+            _set_auto_vacuum(db, NONE)
+
+        # Remove migration record
+        cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+        conn.commit()
+        print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
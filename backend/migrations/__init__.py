@@ -1 +1,133 @@
-"""Package for database migration scripts."""
+"""Package for database migration scripts.
+
+Helpers shared by the migrations. ``migrate.py`` runs every pending
+migration on one connection; each migration also runs on its own when
+called without one.
+
+Online migrations avoid holding the write lock for long on large tables:
+quick DDL (``ALTER TABLE ... ADD COLUMN`` is constant time in SQLite) is
+followed by a ``backfill`` in small, individually committed, resumable
+batches with a pause in between, so live traffic keeps flowing while
+existing rows are updated.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Generator, Iterator, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import database  # noqa: E402
+
+# Rows updated per backfill transaction, and seconds slept between batches.
+# migrate.py --batch-size / --pause override these.
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "10000"))
+PAUSE = float(os.getenv("MIGRATION_PAUSE_MS", "0")) / 1000
+
+# Seconds a statement waits for the application's writers to finish.
+BUSY_TIMEOUT = 30.0
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open a connection for running migrations."""
+    return sqlite3.connect(path or database.DATABASE_PATH, timeout=BUSY_TIMEOUT)
+
+
+@contextmanager
+def connection(conn: Optional[sqlite3.Connection] = None) -> Generator[sqlite3.Connection, None, None]:
+    """Yield ``conn``, or a new connection to DATABASE_PATH that is closed afterwards."""
+    if conn is not None:
+        yield conn
+        return
+    conn = connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def order_databases(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Connections to every database holding an orders table.
+
+    Yields ``conn`` (DATABASE_PATH) and then one connection per existing
+    shard file, committed and closed once the caller moves on. Migrations
+    that change the orders table apply the change to each of them.
+    """
+    yield conn
+    for shard in range(1, database.SHARD_COUNT):
+        path = database.shard_path(shard)
+        if not os.path.exists(path):
+            continue  # Created later from the migrated schema
+        shard_conn = connect(path)
+        try:
+            yield shard_conn
+            shard_conn.commit()
+        finally:
+            shard_conn.close()
+
+
+def _report(name: str, done: int, position: int, high: int) -> None:
+    print(f"  {name}: backfilled {done} rows (through rowid {position} of {high})")
+
+
+def backfill(
+    conn: sqlite3.Connection,
+    name: str,
+    table: str,
+    assignments: str,
+    params: Sequence[object] = (),
+    where: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    progress: Optional[Callable[[str, int, int, int], None]] = _report,
+) -> int:
+    """Run ``UPDATE table SET assignments [WHERE where]`` in rowid batches.
+
+    Every batch is committed together with its position in
+    ``_migration_progress``, so an interrupted backfill resumes after the
+    last committed batch. Rows added while the backfill runs are picked up
+    before it finishes. Returns the number of rows updated.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    pause = PAUSE if pause is None else pause
+    condition = f" AND ({where})" if where else ""
+    cursor = conn.cursor()
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS _migration_progress (name TEXT PRIMARY KEY, position INTEGER NOT NULL)"
+    )
+    conn.commit()
+    cursor.execute("SELECT position FROM _migration_progress WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    position = row[0] if row else None
+
+    done = 0
+    while True:
+        cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        high = cursor.fetchone()[0]
+        if high is None or (position is not None and position >= high):
+            break
+        low = -1 if position is None else position
+        # Batches hold batch_size rows however sparse the rowids are
+        cursor.execute(
+            f"SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?", (low, batch_size - 1)
+        )
+        row = cursor.fetchone()
+        upper = row[0] if row else high
+        cursor.execute(
+            f"UPDATE {table} SET {assignments} WHERE rowid > ? AND rowid <= ?{condition}", (*params, low, upper)
+        )
+        done += cursor.rowcount
+        cursor.execute("INSERT OR REPLACE INTO _migration_progress (name, position) VALUES (?, ?)", (name, upper))
+        conn.commit()
+        position = upper
+        if progress:
+            progress(name, done, position, high)
+        if pause:
+            time.sleep(pause)
+
+    cursor.execute("DELETE FROM _migration_progress WHERE name = ?", (name,))
+    conn.commit()
+    return done
@@ -0,0 +1,283 @@
+"""
+Synthetic Data Generator
+
+Fills the customers and orders tables with large, realistic and reproducible
+datasets for local testing and benchmarks. Rows are generated in batches and loaded with
+prepared ``executemany`` calls inside large transactions, with the orders
+table's secondary indexes and triggers dropped during the load and rebuilt
+afterwards.
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.database import DATABASE_PATH, SHARD_COUNT, shard_for_key, shard_path
+from app.routes.orders.storage import EPOCH_ORDINAL, day_to_date, order_statuses, payment_statuses
+from app.sequences import ORDER_NUMBER_PREFIX, reserve
+
+DEFAULT_STATUS_WEIGHTS = {"Pending": 3.0, "Completed": 6.0, "Refunded": 1.0}
+DEFAULT_PAYMENT_WEIGHTS = {"Paid": 7.0, "Unpaid": 3.0}
+
+FIRST_NAMES = (
+    "Esther", "Denise", "Clint", "Darin", "Jacquelyn", "Erin", "Gretchen", "Stewart", "John", "Jane",
+    "Bob", "Alice", "Maria", "David", "Sofia", "Liam", "Noah", "Emma", "Olivia", "Mateo",
+    "Aisha", "Chen", "Yuki", "Ravi", "Fatima", "Omar", "Ingrid", "Pablo", "Zara", "Kwame",
+)
+LAST_NAMES = (
+    "Kiehn", "Kuhn", "Hoppe", "Deckow", "Robel", "Bins", "Quitzon", "Kulas", "Doe", "Smith",
+    "Johnson", "Garcia", "Okafor", "Nakamura", "Patel", "Haddad", "Larsen", "Silva", "Novak", "Mensah",
+)
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse ``Name=weight,Name=weight`` into a dict."""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def customer_pool(cardinality: int) -> List[str]:
+    """Return ``cardinality`` distinct, human-looking customer names."""
+    names = []
+    combos = len(FIRST_NAMES) * len(LAST_NAMES)
+    for i in range(cardinality):
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        suffix = i // combos
+        names.append(f"{first} {last}" if suffix == 0 else f"{first} {last} {suffix + 1}")
+    return names
+
+
+def ensure_customers(conn: sqlite3.Connection, cardinality: int) -> List[int]:
+    """Make sure the customer pool exists and return its IDs in popularity order."""
+    names = customer_pool(cardinality)
+    existing = dict(conn.execute("SELECT name, MIN(id) FROM customers GROUP BY name").fetchall())
+    missing = [name for name in names if name not in existing]
+    conn.executemany(
+        "INSERT INTO customers (name, email) VALUES (?, ?)",
+        ((name, name.lower().replace(" ", ".") + "@example.com") for name in missing),
+    )
+    if missing:
+        existing = dict(conn.execute("SELECT name, MIN(id) FROM customers GROUP BY name").fetchall())
+    return [existing[name] for name in names]
+
+
+def generate_rows(
+    count: int,
+    rng: random.Random,
+    first_number: int,
+    customer_ids: Sequence[int],
+    status_codes: Dict[str, int],
+    payment_codes: Dict[str, int],
+    prefix: str = ORDER_NUMBER_PREFIX,
+    customer_skew: float = 1.0,
+    status_weights: Optional[Dict[str, float]] = None,
+    payment_weights: Optional[Dict[str, float]] = None,
+    start_date: date = date(2023, 1, 1),
+    end_date: date = date(2024, 12, 31),
+    amount_mu: float = 4.0,
+    amount_sigma: float = 1.0,
+    batch_size: int = 50000,
+) -> Iterator[List[Tuple]]:
+    """Yield batches of order rows, in storage form, ready for ``executemany``.
+
+    Categorical columns are drawn a whole batch at a time with precomputed
+    cumulative weights. Customer popularity follows a Zipf-like curve over
+    ``customer_ids`` controlled by ``customer_skew`` (0 gives a uniform
+    distribution). ``status_codes`` and ``payment_codes`` map names to
+    lookup table codes.
+    """
+    status_weights = status_weights or DEFAULT_STATUS_WEIGHTS
+    payment_weights = payment_weights or DEFAULT_PAYMENT_WEIGHTS
+
+    customer_cum = list(accumulate(1.0 / (rank + 1) ** customer_skew for rank in range(len(customer_ids))))
+    statuses: Sequence[int] = [status_codes[name] for name in status_weights]
+    status_cum = list(accumulate(status_weights.values()))
+    payments: Sequence[int] = [payment_codes[name] for name in payment_weights]
+    payment_cum = list(accumulate(payment_weights.values()))
+    days = range(start_date.toordinal() - EPOCH_ORDINAL, end_date.toordinal() - EPOCH_ORDINAL + 1)
+    timestamps = {day: day_to_date(day) + "T00:00:00" for day in days}
+
+    number = first_number
+    remaining = count
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        batch_customers = rng.choices(customer_ids, cum_weights=customer_cum, k=n)
+        batch_days = rng.choices(days, k=n)
+        batch_statuses = rng.choices(statuses, cum_weights=status_cum, k=n)
+        batch_payments = rng.choices(payments, cum_weights=payment_cum, k=n)
+        lognormvariate = rng.lognormvariate
+        yield [
+            (
+                f"{prefix}{number + i}",
+                batch_customers[i],
+                batch_days[i],
+                batch_statuses[i],
+                int(round(lognormvariate(amount_mu, amount_sigma) * 100)),
+                batch_payments[i],
+                timestamps[batch_days[i]],
+                timestamps[batch_days[i]],
+            )
+            for i in range(n)
+        ]
+        number += n
+        remaining -= n
+
+
+def _first_order_id(conn: sqlite3.Connection, shard: int) -> int:
+    """First ID after the table's AUTOINCREMENT high-water mark that belongs to ``shard``."""
+    row = conn.execute("SELECT MAX(seq) FROM sqlite_sequence WHERE name = 'orders'").fetchone()
+    seq = row[0] or 0
+    return (seq + SHARD_COUNT - shard) // SHARD_COUNT * SHARD_COUNT + shard
+
+
+def seed_orders(
+    path: str,
+    count: int,
+    seed: int = 42,
+    truncate: bool = False,
+    prefix: str = ORDER_NUMBER_PREFIX,
+    customers: int = 5000,
+    **options,
+) -> int:
+    """Insert ``count`` generated orders into the database at ``path``.
+
+    With ``SHARD_COUNT`` > 1 each order goes to the shard its order number
+    hashes to, with an ID from that shard's ID sequence. Returns the number
+    of rows inserted. The same ``seed`` and options always produce the same
+    rows.
+    """
+    rng = random.Random(seed)
+    conns = [sqlite3.connect(shard_path(shard, path), isolation_level=None) for shard in range(SHARD_COUNT)]
+    conn = conns[0]
+    try:
+        deferred = []
+        for shard_conn in conns:
+            shard_conn.execute("PRAGMA synchronous = OFF")
+            shard_conn.execute("PRAGMA temp_store = MEMORY")
+            shard_conn.execute("PRAGMA cache_size = -262144")  # 256 MiB
+
+            shard_conn.execute("BEGIN")
+            if truncate:
+                shard_conn.execute("DELETE FROM orders")
+            # Secondary indexes and triggers are rebuilt once at the end instead of
+            # being maintained row by row.
+            shard_deferred = shard_conn.execute(
+                "SELECT type, name, sql FROM sqlite_master "
+                "WHERE tbl_name = 'orders' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+            ).fetchall()
+            for kind, name, _ in shard_deferred:
+                shard_conn.execute(f'DROP {kind.upper()} "{name}"')
+            deferred.append(shard_deferred)
+
+        cursor = conn.cursor()
+        status_codes = {
+            name: order_statuses.code(cursor, name, create=True)
+            for name in options.get("status_weights") or DEFAULT_STATUS_WEIGHTS
+        }
+        payment_codes = {
+            name: payment_statuses.code(cursor, name, create=True)
+            for name in options.get("payment_weights") or DEFAULT_PAYMENT_WEIGHTS
+        }
+
+        customer_ids = ensure_customers(conn, customers)
+
+        # Numbers come from the server's order number sequence, so the
+        # application never generates one of them again
+        first_number = reserve(conn, "order_number", count)
+        next_ids = [_first_order_id(shard_conn, shard) for shard, shard_conn in enumerate(conns)]
+        inserted = 0
+        batches = generate_rows(
+            count, rng, first_number, customer_ids, status_codes, payment_codes, prefix=prefix, **options
+        )
+        for batch in batches:
+            if SHARD_COUNT == 1:
+                conn.executemany(
+                    "INSERT INTO orders (order_number, customer_id, order_day, status_id, total_cents, "
+                    "payment_status_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    batch,
+                )
+            else:
+                parts: List[List[Tuple]] = [[] for _ in conns]
+                for row in batch:
+                    shard = shard_for_key(row[0])
+                    parts[shard].append((next_ids[shard], *row))
+                    next_ids[shard] += SHARD_COUNT
+                for shard_conn, part in zip(conns, parts):
+                    shard_conn.executemany(
+                        "INSERT INTO orders (id, order_number, customer_id, order_day, status_id, total_cents, "
+                        "payment_status_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        part,
+                    )
+            inserted += len(batch)
+
+        for shard_conn, shard_deferred in zip(conns, deferred):
+            for _, _, sql in sorted(shard_deferred, key=lambda d: d[0] != "index"):
+                shard_conn.execute(sql)
+        for shard_conn in conns:
+            shard_conn.execute("COMMIT")
+        return inserted
+    except Exception:
+        for shard_conn in conns:
+            if shard_conn.in_transaction:
+                shard_conn.execute("ROLLBACK")
+        raise
+    finally:
+        for shard_conn in conns:
+            shard_conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic orders")
+    parser.add_argument("--orders", type=int, default=100000, help="Number of orders to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data")
+    parser.add_argument("--customers", type=int, default=5000, help="Number of distinct customers")
+    parser.add_argument("--customer-skew", type=float, default=1.0, help="Zipf exponent for customer popularity")
+    parser.add_argument(
+        "--status-weights",
+        type=parse_weights,
+        default=DEFAULT_STATUS_WEIGHTS,
+        help="Relative status frequencies, e.g. Pending=3,Completed=6,Refunded=1",
+    )
+    parser.add_argument(
+        "--payment-weights",
+        type=parse_weights,
+        default=DEFAULT_PAYMENT_WEIGHTS,
+        help="Relative payment status frequencies, e.g. Paid=7,Unpaid=3",
+    )
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2023, 1, 1), help="Earliest order date")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date(2024, 12, 31), help="Latest order date")
+    parser.add_argument("--amount-mu", type=float, default=4.0, help="Mean of log(total_amount)")
+    parser.add_argument("--amount-sigma", type=float, default=1.0, help="Std deviation of log(total_amount)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per executemany batch")
+    parser.add_argument("--prefix", default=ORDER_NUMBER_PREFIX, help="Order number prefix")
+    parser.add_argument("--truncate", action="store_true", help="Delete existing orders first")
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    inserted = seed_orders(
+        DATABASE_PATH,
+        args.orders,
+        seed=args.seed,
+        truncate=args.truncate,
+        prefix=args.prefix,
+        customers=args.customers,
+        customer_skew=args.customer_skew,
+        status_weights=args.status_weights,
+        payment_weights=args.payment_weights,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        amount_mu=args.amount_mu,
+        amount_sigma=args.amount_sigma,
+        batch_size=args.batch_size,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {inserted} orders in {elapsed:.2f}s ({inserted / elapsed:,.0f} rows/s).")
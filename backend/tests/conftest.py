@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from app import database
+import migrate
+from migrate import run_migrations
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    """A new, empty database that the app uses as DATABASE_PATH."""
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    return path
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A migrated database that the app uses as DATABASE_PATH."""
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    run_migrations("upgrade")
+    return path
+
+
+def query(path, sql, params=()):
+    """Rows of ``sql`` run on its own connection to ``path``."""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def apply(path, through):
+    """Apply the migrations numbered up to ``through`` the way migrate.py does."""
+    conn = sqlite3.connect(path)
+    try:
+        for filepath in migrate.get_migration_files():
+            if migrate.migration_version(filepath) <= through:
+                migrate.load_migration_module(filepath).upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {migrate.migration_version(filepath)}")
+                conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, Rejected, classify
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_classify():
+    assert classify("GET", "/orders") is None
+    assert classify("POST", "/orders/print") is None
+    assert classify("POST", "/orders") == "interactive"
+    assert classify("POST", "/orders/bulk/delete") == "bulk"
+    assert classify("POST", "/admin/backups") == "bulk"
+
+
+def test_freed_slot_goes_to_interactive_before_bulk():
+    async def scenario():
+        controller = AdmissionController(total=1, bulk=1, interactive_budget=5, bulk_budget=5)
+        await controller.acquire("interactive")
+        order = []
+
+        async def wait(name):
+            await controller.acquire(name)
+            order.append(name)
+            controller.release(name)
+
+        # The bulk request queues first, but the interactive one is served first
+        bulk = asyncio.create_task(wait("bulk"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(wait("interactive"))
+        await asyncio.sleep(0)
+        assert controller.stats()["bulk"]["queued"] == 1
+        assert controller.stats()["interactive"]["queued"] == 1
+
+        controller.release("interactive")
+        await asyncio.gather(bulk, interactive)
+        return order, controller
+
+    order, controller = run(scenario())
+    assert order == ["interactive", "bulk"]
+    assert controller.active == 0
+
+
+def test_bulk_is_held_to_its_own_limit():
+    async def scenario():
+        controller = AdmissionController(total=4, bulk=1, bulk_budget=0.05)
+        await controller.acquire("bulk")
+        await controller.acquire("interactive")
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire("bulk")
+        return rejected.value
+
+    assert run(scenario()).reason == "timeout"
+
+
+def test_waiter_past_its_budget_is_rejected():
+    async def scenario():
+        controller = AdmissionController(total=1, interactive_budget=0.05)
+        await controller.acquire("interactive")
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire("interactive")
+        return rejected.value, controller
+
+    rejected, controller = run(scenario())
+    assert rejected.reason == "timeout"
+    assert rejected.retry_after >= 1
+    assert controller.stats()["interactive"] == {"active": 1, "queued": 0, "limit": 1}
+
+
+def test_full_queue_rejects_at_once():
+    async def scenario():
+        controller = AdmissionController(total=1, queue_limit=1, interactive_budget=5)
+        await controller.acquire("interactive")
+        waiting = asyncio.create_task(controller.acquire("interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire("interactive")
+        waiting.cancel()
+        return rejected.value
+
+    assert run(scenario()).reason == "queue_full"
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(total=1, interactive_budget=5)
+        await controller.acquire("interactive")
+        waiting = asyncio.create_task(controller.acquire("interactive"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        controller.release("interactive")
+        return controller
+
+    controller = run(scenario())
+    assert controller.active == 0
+    assert controller.stats()["interactive"] == {"active": 0, "queued": 0, "limit": 1}
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_handed_back():
+    async def scenario():
+        controller = AdmissionController(total=1, interactive_budget=5)
+        await controller.acquire("interactive")
+        waiting = asyncio.create_task(controller.acquire("interactive"))
+        await asyncio.sleep(0)
+        # The slot is granted, then the client goes away before the task resumes
+        controller.release("interactive")
+        waiting.cancel()
+        try:
+            await waiting
+        except asyncio.CancelledError:
+            return controller, 0
+        # Some Python versions let wait_for return a result that beat the
+        # cancellation; the caller then holds the slot
+        return controller, 1
+
+    controller, held = run(scenario())
+    assert controller.active == held
+    assert controller.stats()["interactive"] == {"active": held, "queued": 0, "limit": 1}
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+import pytest
+
+from app import archive, backup
+from conftest import query
+
+
+@pytest.fixture
+def files(db_path):
+    """The main database and a shard-0 archive, each with one row to restore."""
+    archive_path = archive.default_archive_path(0)
+    for path in (db_path, archive_path):
+        _set(path, "snapshot")
+    return [archive_path, db_path]
+
+
+def _set(path, value):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS marker (value TEXT)")
+        conn.execute("DELETE FROM marker")
+        conn.execute("INSERT INTO marker (value) VALUES (?)", (value,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _value(path):
+    return query(path, "SELECT value FROM marker")[0][0]
+
+
+def test_restore_puts_back_every_file(files, tmp_path):
+    snap = backup.snapshot(str(tmp_path / "backups"), pause=0)
+    assert [entry["name"] for entry in snap["files"]] == [os.path.basename(p) for p in files]
+    for path in files:
+        _set(path, "changed")
+
+    assert backup.restore(snap["path"]) == files
+    for path in files:
+        assert _value(path) == "snapshot"
+        assert _value(path + ".pre-restore") == "changed"
+        assert not os.path.exists(path + ".restoring")
+
+
+def test_restore_checks_the_copy_before_renaming(files, tmp_path, monkeypatch):
+    snap = backup.snapshot(str(tmp_path / "backups"), pause=0)
+    for path in files:
+        _set(path, "changed")
+    monkeypatch.setattr(backup, "_sha256", lambda path: "0" * 64 if path.endswith(".restoring") else "")
+    monkeypatch.setattr(backup, "verify", lambda path: snap)
+
+    with pytest.raises(backup.BackupError, match="copy does not match"):
+        backup.restore(snap["path"])
+    for path in files:
+        assert _value(path) == "changed"
+        assert not os.path.exists(path + ".restoring")
+        assert not os.path.exists(path + ".pre-restore")
+
+
+def test_failed_rename_rolls_back_files_already_swapped(files, tmp_path, monkeypatch):
+    snap = backup.snapshot(str(tmp_path / "backups"), pause=0)
+    for path in files:
+        _set(path, "changed")
+    replace = os.replace
+    calls = []
+
+    def failing_replace(src, dst):
+        calls.append(dst)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        replace(src, dst)
+
+    monkeypatch.setattr(backup.os, "replace", failing_replace)
+    with pytest.raises(backup.BackupError, match="rolled back"):
+        backup.restore(snap["path"])
+    # The archive was swapped before the failure, then put back
+    assert calls == files + [files[0]]
+    for path in files:
+        assert _value(path) == "changed"
+        assert not os.path.exists(path + ".restoring")
+
+
+def test_restore_refuses_a_damaged_snapshot(files, tmp_path):
+    snap = backup.snapshot(str(tmp_path / "backups"), pause=0)
+    with open(os.path.join(snap["path"], os.path.basename(files[0])), "ab") as f:
+        f.write(b"x")
+    _set(files[0], "changed")
+
+    with pytest.raises(backup.BackupError, match="checksum mismatch"):
+        backup.restore(snap["path"])
+    assert _value(files[0]) == "changed"
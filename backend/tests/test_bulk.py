@@ -0,0 +1,52 @@
+import pytest
+from fastapi import HTTPException
+
+from app.routes.orders import crud
+from app.routes.orders.models import BulkIds
+from app.routes.orders.selectors import IN_LIST_IDS, Selection
+from seed import seed_orders
+
+from conftest import query
+
+
+@pytest.fixture
+def ids(db_path):
+    """IDs of more orders than fit an IN list."""
+    seed_orders(db_path, IN_LIST_IDS + 100)
+    ids = [row[0] for row in query(db_path, "SELECT id FROM orders ORDER BY id")]
+    assert len(ids) > IN_LIST_IDS
+    return ids
+
+
+def test_duplicate_more_orders_than_fit_an_in_list(db_path, ids):
+    # Larger selections are loaded into a temp table, which must not leave
+    # the connection on a snapshot older than the order number reservation.
+    duplicated = crud.bulk_duplicate(Selection.from_request(BulkIds(order_ids=ids)))
+
+    assert len(duplicated) == len(ids)
+    assert query(db_path, "SELECT COUNT(*) FROM orders")[0][0] == 2 * len(ids)
+
+
+def test_status_of_more_orders_than_fit_an_in_list(db_path, ids):
+    selection = Selection.from_request(BulkIds(order_ids=ids[1:]))
+
+    assert crud.bulk_update_status(selection, "Refunded") == len(ids) - 1
+
+    counts = dict(query(db_path, "SELECT o.id = ?, COUNT(*) FROM orders o JOIN order_statuses s "
+                                 "ON s.id = o.status_id WHERE s.name = 'Refunded' GROUP BY 1", (ids[0],)))
+    assert counts[0] == len(ids) - 1
+
+
+def test_delete_range_with_more_exclusions_than_fit_an_in_list(db_path, ids):
+    kept = ids[::2][:IN_LIST_IDS + 1]
+    selection = Selection.from_request(BulkIds(ranges=[[ids[0], ids[-1]]], exclude=kept))
+
+    crud.bulk_delete(selection)
+
+    assert [row[0] for row in query(db_path, "SELECT id FROM orders ORDER BY id")] == kept
+
+
+def test_empty_selection_is_rejected(db_path):
+    with pytest.raises(HTTPException) as e:
+        crud.bulk_delete(Selection.from_request(BulkIds(order_ids=[])))
+    assert e.value.status_code == 400
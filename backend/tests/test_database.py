@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from app import database
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    """Statements reported to the query hooks, as (sql, seconds)."""
+    reported = []
+    monkeypatch.setattr(database, "_query_hooks", [lambda conn, sql, params, seconds, many: reported.append((sql, seconds))])
+    return reported
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"), factory=database.InstrumentedConnection)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    yield conn
+    conn.close()
+
+
+def _ticking_clock(monkeypatch):
+    """Make every perf_counter() call one second later than the last."""
+    ticks = iter(range(10**6))
+    monkeypatch.setattr(database.time, "perf_counter", lambda: float(next(ticks)))
+
+
+def test_statements_without_rows_are_reported_at_once(conn, statements):
+    conn.execute("UPDATE t SET x = x + 1")
+    assert [sql for sql, _ in statements] == ["UPDATE t SET x = x + 1"]
+
+
+def test_fetch_time_is_part_of_the_statement(conn, statements, monkeypatch):
+    statements.clear()
+    _ticking_clock(monkeypatch)
+
+    assert len(conn.execute("SELECT x FROM t").fetchall()) == 10
+    cursor = conn.execute("SELECT x FROM t WHERE x < 2")
+    assert cursor.fetchone() is not None
+    assert cursor.fetchone() is not None
+    assert len(statements) == 1
+    assert cursor.fetchone() is None
+    cursor = conn.execute("SELECT x FROM t WHERE x < 3")
+    assert [len(cursor.fetchmany(2)), len(cursor.fetchmany(2))] == [2, 1]
+    assert [row[0] for row in conn.execute("SELECT x FROM t WHERE x < 2")] == [0, 1]
+
+    # One second for the execute() and one for each fetch call
+    assert statements == [
+        ("SELECT x FROM t", 2.0),
+        ("SELECT x FROM t WHERE x < 2", 4.0),
+        ("SELECT x FROM t WHERE x < 3", 3.0),
+        ("SELECT x FROM t WHERE x < 2", 4.0),
+    ]
+
+
+def test_unfinished_statement_is_reported_when_the_cursor_moves_on(conn, statements):
+    statements.clear()
+    cursor = conn.cursor()
+    cursor.execute("SELECT x FROM t").fetchone()
+    assert statements == []
+    cursor.execute("SELECT COUNT(*) FROM t").fetchone()
+    assert [sql for sql, _ in statements] == ["SELECT x FROM t"]
+    cursor.close()
+    assert [sql for sql, _ in statements] == ["SELECT x FROM t", "SELECT COUNT(*) FROM t"]
+
+    conn.execute("SELECT x FROM t").fetchone()
+    assert statements[-1][0] == "SELECT x FROM t"
@@ -0,0 +1,138 @@
+"""The memory engine must answer every order operation exactly as SQLite does."""
+
+import json
+import shutil
+
+import pytest
+from fastapi import HTTPException
+
+from app import database
+from app.routes.orders import encoding
+from app.routes.orders.analytics import DEFAULT_QUANTILES
+from app.routes.orders.filters import OrderFilter
+from app.routes.orders.models import BulkIds, OrderCreate, OrderUpdate
+from app.routes.orders.repository import MemoryOrderRepository, SQLiteOrderRepository
+from app.routes.orders.selectors import Selection
+from seed import seed_orders
+
+ORDER = dict(customer_name="Ada", order_date="2024-03-01", status="Pending", total_amount=12.5, payment_status="Unpaid")
+
+
+def _selection(**body):
+    return Selection.from_request(BulkIds(**body))
+
+
+def _result(call):
+    """The JSON a request would return, without timestamps; errors as (status, detail)."""
+    try:
+        content = call()
+    except HTTPException as e:
+        return ("error", e.status_code, e.detail)
+    if content is None:
+        return None
+    data = json.loads(encoding.respond(content, None).body)
+
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k not in ("created_at", "updated_at")}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    return strip(data)
+
+
+def _list(repo, status=None, **filters):
+    return lambda: repo.list_orders(OrderFilter(status, **filters), 1, 50)
+
+
+SCENARIOS = {
+    "list": lambda repo: [_result(lambda: repo.list_orders(OrderFilter(), page, 25)) for page in (1, 4)],
+    "tabs": lambda repo: [
+        _result(_list(repo, tab)) for tab in ("All", "Incomplete", "Overdue", "Ongoing", "Finished", "Refunded", "Nope")
+    ],
+    "filters": lambda repo: [
+        _result(_list(repo, date_from="2024-01-01", date_to="2024-06-30")),
+        _result(_list(repo, "Completed", min_amount=100, max_amount=400)),
+        _result(_list(repo, payment_status="Unpaid")),
+        _result(_list(repo, payment_status="Nope")),
+    ],
+    "stats": lambda repo: _result(repo.get_order_stats),
+    "analytics": lambda repo: _result(lambda: repo.get_order_analytics(False, DEFAULT_QUANTILES, 20, 10)),
+    "get": lambda repo: [
+        _result(lambda: repo.get_order(5)),
+        _result(lambda: repo.get_order(10 ** 9)),
+        _result(lambda: repo.get_orders(_selection(order_ids=[3, 1, 10 ** 9], ranges=[[20, 25]], exclude=[22]))),
+        _result(lambda: repo.list_customer_orders(1, 1, 10)),
+        _result(lambda: repo.list_customer_orders(10 ** 9, 1, 10)),
+    ],
+    "create": lambda repo: [
+        _result(lambda: repo.create_order(OrderCreate(**ORDER))),
+        _result(lambda: repo.create_order(OrderCreate(**ORDER, order_number="#ORD1"))),
+        _result(lambda: repo.create_order(OrderCreate(**ORDER, order_number="CUSTOM-1"))),
+        _result(lambda: repo.create_order(OrderCreate(**ORDER, order_number="CUSTOM-1"))),
+        _result(repo.get_order_stats),
+    ],
+    "put": lambda repo: [
+        _result(lambda: repo.update_order(7, OrderUpdate(status="Refunded", total_amount=1.25, customer_name="Bo"))),
+        _result(lambda: repo.update_order(7, OrderUpdate(order_number="#ORD5"))),
+        _result(lambda: repo.update_order(7, OrderUpdate())),
+        _result(lambda: repo.update_order(10 ** 9, OrderUpdate(status="Pending"))),
+        _result(lambda: repo.delete_order(8)),
+        _result(lambda: repo.delete_order(8)),
+        _result(_list(repo, "Refunded")),
+    ],
+    "bulk": lambda repo: [
+        _result(lambda: repo.bulk_update_status(_selection(ranges=[[1, 40]], exclude=[2, 3]), "Completed")),
+        _result(lambda: repo.bulk_duplicate(_selection(order_ids=[4, 5, 10 ** 9]))),
+        _result(lambda: repo.bulk_delete(_selection(ranges=[[30, 60]]))),
+        _result(lambda: repo.bulk_duplicate(_selection(order_ids=[10 ** 9]))),
+        _result(lambda: repo.bulk_delete(_selection(order_ids=[]))),
+        _result(repo.get_order_stats),
+        _result(lambda: repo.list_orders(OrderFilter(), 1, 100)),
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("engines") / "seeded.db")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(database, "DATABASE_PATH", path)
+        from migrate import run_migrations
+
+        run_migrations("upgrade")
+    seed_orders(path, 300, seed=7)
+    return path
+
+
+def _run(engine, name, dataset, tmp_path, monkeypatch):
+    path = str(tmp_path / f"{engine}.db")
+    shutil.copyfile(dataset, path)
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    if engine == "sqlite":
+        repo = SQLiteOrderRepository()
+    else:
+        repo = MemoryOrderRepository(snapshot_path=path, interval=0)
+    repo.start()
+    try:
+        return SCENARIOS[name](repo)
+    finally:
+        repo.stop()
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_engines_agree(name, dataset, tmp_path, monkeypatch):
+    expected = _run("sqlite", name, dataset, tmp_path, monkeypatch)
+    assert _run("memory", name, dataset, tmp_path, monkeypatch) == expected
+
+
+def test_memory_engine_refuses_an_unmigrated_snapshot_path(tmp_path):
+    missing = MemoryOrderRepository(snapshot_path=str(tmp_path / "missing.db"), interval=0)
+    with pytest.raises(RuntimeError, match="does not exist"):
+        missing.start()
+
+    (tmp_path / "empty.db").touch()
+    empty = MemoryOrderRepository(snapshot_path=str(tmp_path / "empty.db"), interval=0)
+    with pytest.raises(RuntimeError, match="not migrated"):
+        empty.start()
@@ -0,0 +1,118 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import migrate
+from app.routes.orders import crud
+from app.routes.orders.filters import COMPLETED, ORDER_OVERDUE_DAYS, PENDING, REFUNDED, TAB_INDEXES, OrderFilter
+from app.routes.orders.models import OrderCreate
+from app.routes.orders.storage import order_statuses
+
+from conftest import apply, query
+
+TODAY = date.today()
+RECENT = (TODAY - timedelta(days=ORDER_OVERDUE_DAYS - 1)).isoformat()
+CUTOFF = (TODAY - timedelta(days=ORDER_OVERDUE_DAYS)).isoformat()
+OLD = (TODAY - timedelta(days=ORDER_OVERDUE_DAYS + 1)).isoformat()
+
+# order number -> (order_date, status, total_amount, payment_status)
+ORDERS = {
+    "recent": (RECENT, "Pending", 10.0, "Paid"),
+    "cutoff": (CUTOFF, "Pending", 20.0, "Unpaid"),
+    "old": (OLD, "Pending", 30.0, "Paid"),
+    "done": (OLD, "Completed", 40.0, "Paid"),
+    "back": (RECENT, "Refunded", 50.0, "Unpaid"),
+}
+
+
+@pytest.fixture
+def orders(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM orders")
+    conn.commit()
+    conn.close()
+    for number, (order_date, status, amount, payment) in ORDERS.items():
+        crud.create_order(OrderCreate(
+            order_number=number, customer_name="A", order_date=order_date, status=status,
+            total_amount=amount, payment_status=payment,
+        ))
+
+
+def listed(status=None, **filters):
+    result = crud.list_orders(OrderFilter(status, **filters), 1, 10)
+    numbers = [order["order_number"] for order in result["items"].dicts()]
+    assert result["total"] == len(numbers)
+    return numbers
+
+
+@pytest.mark.parametrize(
+    "tab, expected",
+    [
+        ("All", ["recent", "cutoff", "old", "done", "back"]),
+        ("Incomplete", ["recent", "cutoff", "old"]),
+        ("Overdue", ["old"]),
+        ("Ongoing", ["recent", "cutoff"]),
+        ("Finished", ["done", "back"]),
+        ("finished", ["done", "back"]),
+        ("Completed", ["done"]),
+        ("Unknown", []),
+    ],
+)
+def test_tab(orders, tab, expected):
+    assert listed(tab) == expected
+
+
+@pytest.mark.parametrize(
+    "tab, filters, expected",
+    [
+        (None, dict(date_from=CUTOFF), ["recent", "cutoff", "back"]),
+        (None, dict(date_to=CUTOFF), ["cutoff", "old", "done"]),
+        ("Ongoing", dict(date_to=CUTOFF), ["cutoff"]),
+        ("Overdue", dict(date_from=RECENT), []),
+        (None, dict(min_amount=20, max_amount=40), ["cutoff", "old", "done"]),
+        ("Incomplete", dict(min_amount=15), ["cutoff", "old"]),
+        ("Finished", dict(payment_status="Unpaid"), ["back"]),
+        (None, dict(payment_status="Nope"), []),
+    ],
+)
+def test_filters_narrow_tabs(orders, tab, filters, expected):
+    assert listed(tab, **filters) == expected
+
+
+def test_invalid_date_is_a_400(orders):
+    with pytest.raises(HTTPException) as e:
+        listed(date_from="01/02/2024")
+    assert e.value.status_code == 400
+
+
+def test_stats_count_each_status(orders):
+    assert crud.get_order_stats() == {"Pending": 3, "Completed": 1, "Refunded": 1}
+
+
+@pytest.mark.parametrize("tab", ["Incomplete", "Overdue", "Ongoing", "Finished"])
+def test_tab_query_uses_its_partial_index(db_path, tab):
+    criteria = OrderFilter(tab, min_amount=1, payment_status="Paid").resolve(lambda name: None, lambda name: 1)
+    where, params = criteria.where()
+    # INDEXED BY fails to prepare unless the predicate implies the index's WHERE clause
+    plan = query(db_path, f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM orders o{criteria.index_hint()}{where}", params)
+    assert any(f"COVERING INDEX {TAB_INDEXES[criteria.statuses]}" in row[-1] for row in plan)
+
+
+def test_status_codes_match_the_lookup_table(db_path):
+    cursor = sqlite3.connect(db_path).cursor()
+    assert [order_statuses.code(cursor, name) for name in ("Pending", "Completed", "Refunded")] == [
+        PENDING, COMPLETED, REFUNDED,
+    ]
+
+
+def test_filter_indexes_refuse_unexpected_status_codes(path):
+    apply(path, 5)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE order_statuses SET name = 'Done' WHERE id = 2")
+    conn.commit()
+    conn.close()
+
+    with pytest.raises(RuntimeError, match="order_statuses codes"):
+        migrate.run_migrations("upgrade")
@@ -0,0 +1,125 @@
+import sqlite3
+
+import pytest
+
+import migrate
+from migrations import backfill
+
+from conftest import apply
+
+
+def add_baseline_order(path, order_number, order_date):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO orders (order_number, customer_name, order_date, status, total_amount, payment_status) "
+        "VALUES (?, 'A', ?, 'Pending', 1.5, 'Paid')",
+        (order_number, order_date),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_compact_storage_converts_known_date_formats(path):
+    apply(path, 2)
+    add_baseline_order(path, "X-1", "12/01/2024")
+
+    migrate.run_migrations("upgrade")
+
+    conn = sqlite3.connect(path)
+    day = conn.execute("SELECT order_day FROM orders WHERE order_number = 'X-1'").fetchone()[0]
+    assert conn.execute("SELECT date(?, 'unixepoch')", (day * 86400,)).fetchone()[0] == "2024-12-01"
+    conn.close()
+
+
+def test_compact_storage_lists_unreadable_dates_and_changes_nothing(path):
+    apply(path, 2)
+    add_baseline_order(path, "X-1", "someday")
+
+    with pytest.raises(RuntimeError, match=r"unrecognized order_date: \d+ \('someday'\)"):
+        migrate.run_migrations("upgrade")
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert "order_date" in [row[1] for row in conn.execute("PRAGMA table_info(orders)")]
+    conn.close()
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def table(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, x INTEGER NOT NULL, y INTEGER NOT NULL DEFAULT 0)")
+    conn.executemany("INSERT INTO t (x) VALUES (?)", [(i,) for i in range(100)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_backfill_resumes_after_the_last_committed_batch(table):
+    batches = []
+
+    def interrupt(name, done, position, high):
+        batches.append(position)
+        if len(batches) == 3:
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        backfill(table, "t_y", "t", "y = y + 1", batch_size=10, pause=0, progress=interrupt)
+    assert table.execute("SELECT position FROM _migration_progress WHERE name = 't_y'").fetchone() == (30,)
+
+    assert backfill(table, "t_y", "t", "y = y + 1", batch_size=10, pause=0, progress=None) == 70
+    # Every row was updated exactly once, and the progress row is gone
+    assert table.execute("SELECT MIN(y), MAX(y) FROM t").fetchone() == (1, 1)
+    assert table.execute("SELECT COUNT(*) FROM _migration_progress").fetchone() == (0,)
+
+
+def test_backfill_picks_up_rows_added_while_it_runs(table):
+    def insert(name, done, position, high):
+        if position == 10:
+            table.execute("INSERT INTO t (x) VALUES (-1)")
+            table.commit()
+
+    assert backfill(table, "t_y", "t", "y = x", where="x >= 0", batch_size=10, pause=0, progress=insert) == 100
+    assert table.execute("SELECT COUNT(*) FROM t WHERE y != x").fetchone() == (1,)
+
+
+def test_upgrade_at_head_loads_no_migration(path, monkeypatch, capsys):
+    migrate.run_migrations("upgrade")
+    head = migrate.migration_version(migrate.get_migration_files()[-1])
+
+    def fail(filepath):
+        raise AssertionError(f"loaded {filepath}")
+
+    monkeypatch.setattr(migrate, "load_migration_module", fail)
+    capsys.readouterr()
+    migrate.run_migrations("upgrade")
+
+    assert f"Schema is up to date (version {head})" in capsys.readouterr().out
+    assert sqlite3.connect(path).execute("PRAGMA user_version").fetchone()[0] == head
+
+
+def test_failed_migration_leaves_the_version_unchanged(path, tmp_path, monkeypatch):
+    migrate.run_migrations("upgrade")
+    files = migrate.get_migration_files()
+    head = migrate.migration_version(files[-1])
+    failing = tmp_path / f"{head + 1:03d}_failing.py"
+    failing.write_text(
+        "def upgrade(conn):\n"
+        "    conn.execute(\"INSERT INTO _migrations (name) VALUES ('" + failing.stem + "')\")\n"
+        "    conn.execute('CREATE TABLE half_done (x)')\n"
+        "    conn.execute('INSERT INTO half_done VALUES (1)')\n"
+        "    raise RuntimeError('halfway')\n"
+    )
+    monkeypatch.setattr(migrate, "get_migration_files", lambda: files + [str(failing)])
+
+    with pytest.raises(RuntimeError, match="halfway"):
+        migrate.run_migrations("upgrade")
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == head
+    assert conn.execute("SELECT COUNT(*) FROM _migrations WHERE name = ?", (failing.stem,)).fetchone() == (0,)
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
@@ -0,0 +1,151 @@
+import base64
+import sqlite3
+import struct
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.orders.models import BulkIds
+from app.routes.orders.selectors import IN_LIST_IDS, RANGE_TERMS, Selection, decode_bitmap
+
+
+def roaring(containers, runs=True):
+    """Serialize ``(key, kind, values)`` containers in the portable Roaring format.
+
+    ``values`` are the low 16 bits: sorted values for "array" and "bitmap"
+    containers, ``(start, end)`` pairs for "run" containers.
+    """
+    size = len(containers)
+    header, bodies = b"", []
+    for key, kind, values in containers:
+        if kind == "run":
+            cardinality = sum(end - start + 1 for start, end in values)
+            body = struct.pack("<H", len(values)) + b"".join(
+                struct.pack("<HH", start, end - start) for start, end in values
+            )
+        elif kind == "array":
+            cardinality = len(values)
+            body = struct.pack(f"<{len(values)}H", *values)
+        else:
+            cardinality = len(values)
+            bits = bytearray(8192)
+            for value in values:
+                bits[value // 8] |= 1 << value % 8
+            body = bytes(bits)
+        header += struct.pack("<HH", key, cardinality - 1)
+        bodies.append(body)
+    if runs:
+        flags = bytearray((size + 7) // 8)
+        for i, (_, kind, _) in enumerate(containers):
+            if kind == "run":
+                flags[i // 8] |= 1 << i % 8
+        data = struct.pack("<I", 12347 | (size - 1) << 16) + bytes(flags) + header
+        has_offsets = size >= 4
+    else:
+        data = struct.pack("<II", 12346, size) + header
+        has_offsets = True
+    if has_offsets:
+        position = len(data) + 4 * size
+        for body in bodies:
+            data += struct.pack("<I", position)
+            position += len(body)
+    return base64.b64encode(data + b"".join(bodies)).decode()
+
+
+def truncated(encoded, count):
+    """``encoded`` with its last ``count`` bytes cut off."""
+    return base64.b64encode(base64.b64decode(encoded)[:-count]).decode()
+
+
+def test_array_container():
+    assert decode_bitmap(roaring([(0, "array", [1, 5, 9])], runs=False)) == ([], [1, 5, 9])
+
+
+def test_containers_are_offset_by_their_key():
+    encoded = roaring([(0, "array", [7]), (2, "array", [3]), (3, "run", [(0, 9)]), (5, "array", [1])])
+    assert decode_bitmap(encoded) == ([(3 << 16, (3 << 16) + 9)], [7, (2 << 16) + 3, (5 << 16) + 1])
+
+
+def test_run_container_stays_ranges():
+    assert decode_bitmap(roaring([(1, "run", [(10, 19), (100, 65535)])])) == (
+        [(65546, 65555), (65636, 131071)], [],
+    )
+
+
+def test_bitmap_container_turns_full_bytes_into_ranges():
+    values = list(range(0, 4096)) + [5000, 5002] + list(range(8000, 8016))
+    ranges, ids = decode_bitmap(roaring([(0, "bitmap", values)], runs=False))
+    assert ranges == [(0, 4095), (8000, 8015)]
+    assert ids == [5000, 5002]
+
+
+@pytest.mark.parametrize(
+    "encoded",
+    [
+        "not base64!",
+        base64.b64encode(b"\x00\x01").decode(),
+        base64.b64encode(struct.pack("<I", 99)).decode(),
+        truncated(roaring([(0, "array", [1, 2, 3])], runs=False), 2),
+        truncated(roaring([(0, "bitmap", list(range(5000)))]), 100),
+        truncated(roaring([(0, "run", [(1, 5)])]), 2),
+    ],
+    ids=["base64", "short", "cookie", "array", "bitmap", "run"],
+)
+def test_malformed_bitmap_is_a_400(encoded):
+    with pytest.raises(HTTPException) as e:
+        decode_bitmap(encoded)
+    assert e.value.status_code == 400
+
+
+def test_ranges_with_exclusions():
+    selection = Selection(ids=[5, 50, 60], ranges=[(1, 10), (8, 20)], exclude=[3, 50, 99])
+    assert selection.ranges == [(1, 20)]
+    assert selection.ids == [50, 60]
+    assert selection.exclude == [3, 50]
+    assert selection.count() == 20
+
+
+def test_reversed_range_is_a_400():
+    with pytest.raises(HTTPException) as e:
+        Selection.from_request(BulkIds(ranges=[[5, 1]]))
+    assert e.value.status_code == 400
+
+
+def test_request_combines_ids_ranges_and_bitmap():
+    payload = BulkIds(order_ids=[100], ranges=[[1, 3]], bitmap=roaring([(0, "array", [2, 7])]), exclude=[2])
+    selection = Selection.from_request(payload)
+    assert (selection.ranges, selection.ids, selection.exclude) == ([(1, 3)], [7, 100], [2])
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO orders VALUES (?)", [(i,) for i in range(1, 5001)])
+    yield conn
+    conn.close()
+
+
+def selected(conn, selection):
+    cursor = conn.cursor()
+    where, params = selection.where(cursor)
+    return [row[0] for row in cursor.execute(f"SELECT id FROM orders WHERE {where} ORDER BY id", params)]
+
+
+@pytest.mark.parametrize("count", [10, IN_LIST_IDS + 1], ids=["in list", "temp table"])
+def test_where_ids_and_exclusions(conn, count):
+    ids = list(range(1, 2 * count + 1, 2))
+    exclude = ids[::2]
+    assert selected(conn, Selection(ids=ids, exclude=exclude)) == ids[1::2]
+
+
+@pytest.mark.parametrize("count", [3, RANGE_TERMS + 1], ids=["between", "temp table"])
+def test_where_ranges_and_exclusions(conn, count):
+    ranges = [(i * 10 + 1, i * 10 + 5) for i in range(count)]
+    exclude = list(range(1, count * 10, 20))[:IN_LIST_IDS + 1]
+    expected = [i for lo, hi in ranges for i in range(lo, hi + 1) if i not in set(exclude)]
+    assert selected(conn, Selection(ranges=ranges, exclude=exclude)) == expected
+
+
+def test_where_matches_nothing_when_empty(conn):
+    assert selected(conn, Selection()) == []
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from app import database
+from app.singleflight import coalesce, reads
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _start(fn, results):
+    thread = threading.Thread(target=lambda: results.append(fn("key")))
+    thread.start()
+    return thread
+
+
+def _reader(release):
+    calls = []
+
+    @coalesce
+    def read(key):
+        calls.append(key)
+        call = len(calls)
+        release.wait(5)
+        return call
+
+    return read, calls
+
+
+def test_follower_joins_leader_without_write():
+    release = threading.Event()
+    read, calls = _reader(release)
+    results = []
+    collapsed = reads.collapsed
+
+    leader = _start(read, results)
+    _wait_for(lambda: len(calls) == 1)
+    follower = _start(read, results)
+    _wait_for(lambda: reads.collapsed == collapsed + 1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(calls) == 1
+    assert results == [1, 1]
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "test.db"))
+    with database.get_db() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+
+def _interleave(between):
+    """Start a leader, run ``between``, then start a follower; return the calls made."""
+    release = threading.Event()
+    read, calls = _reader(release)
+    results = []
+
+    leader = _start(read, results)
+    _wait_for(lambda: len(calls) == 1)
+    collapsed = reads.collapsed
+    between()
+    follower = _start(read, results)
+    _wait_for(lambda: len(calls) == 2 or reads.collapsed == collapsed + 1)
+    release.set()
+    leader.join()
+    follower.join()
+    return calls, results
+
+
+def test_follower_after_commit_does_not_join_leader(table):
+    def write():
+        with database.get_db() as conn:
+            conn.execute("INSERT INTO t (x) VALUES (1)")
+
+    calls, results = _interleave(write)
+
+    assert len(calls) == 2
+    assert sorted(results) == [1, 2]
+
+
+def test_follower_after_read_joins_leader(table):
+    def read():
+        with database.get_db() as conn:
+            conn.execute("SELECT COUNT(*) FROM t").fetchone()
+
+    calls, results = _interleave(read)
+
+    assert len(calls) == 1
+    assert results == [1, 1]
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from app import database
+from app.slow_queries import SlowQueryLog, param_shape
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    """A slow-query log that records every statement on an instrumented connection."""
+    log = SlowQueryLog(0, 10)
+    monkeypatch.setattr(database, "_query_hooks", [log.record])
+    conn = sqlite3.connect(str(tmp_path / "test.db"), factory=database.InstrumentedConnection)
+    conn.execute("CREATE TABLE t (x INTEGER, y TEXT)")
+    log.reset()
+    yield log, conn
+    conn.close()
+
+
+def test_param_shape():
+    assert param_shape(("a", 1, 2, 3)) == "(str, int x3)"
+    assert param_shape({"x": 1}) == "{x: int}"
+    assert param_shape([(1, "a"), (2, "b")], many=True) == "executemany"
+
+
+def test_executemany_is_logged_without_a_plan(log):
+    log, conn = log
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(1, "a"), (2, "b")])
+    conn.executemany("UPDATE t SET y = ? WHERE x = ?", (("c", i) for i in range(3)))
+
+    entries = {entry["sql"]: entry for entry in log.top()}
+    for sql in ("INSERT INTO t VALUES (?, ...)", "UPDATE t SET y = ? WHERE x = ?"):
+        assert entries[sql]["param_shape"] == "executemany"
+        assert entries[sql]["plan"] == []
+
+
+def test_single_statement_gets_its_plan(log):
+    log, conn = log
+    conn.execute("SELECT y FROM t WHERE x = ?", [1]).fetchall()
+
+    [entry] = log.top()
+    assert entry["param_shape"] == "(int)"
+    assert entry["plan"] and not entry["plan"][0].startswith("EXPLAIN failed")
+    assert entry["warnings"] == entry["plan"]
@@ -250,9 +250,8 @@ export default function OrdersPage() {
   const handleAddOrder = async () => {
     try {
       const now = new Date();
-      const randomNum = Math.floor(Math.random() * 9000) + 1000;
+      // The server assigns the next order number
       const newOrder = {
-        order_number: `#ORD${randomNum}`,
         customer_name: 'New Customer',
         order_date: now.toISOString().substring(0, 10),
         status: 'Pending',